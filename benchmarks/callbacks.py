@@ -0,0 +1,121 @@
+# benchmarks/callbacks.py
+"""
+callback_data: اندازه payloadها و هزینه رسیدن callback به handler در aiogram
+
+قبلی: یک handler با فیلتر lambda/startswith برای هر نوع callback (یکی‌یکی امتحان می‌شوند)
+      و split('_') در handler
+جدید: یک handler با فیلتر callback_routes (trie پیشوندها در keyboards/callbacks.py)
+
+قبل از زمان‌گیری بررسی می‌شود که هر دو قالب به همان payload برسند و callbackی که payload
+پیشوند طولانی‌تر برایش معتبر نیست به پیشوند کوتاه‌تر برسد.
+
+اجرا:
+    python -m benchmarks.callbacks --number 20000
+"""
+import argparse
+import asyncio
+import time
+
+from aiogram import F, Router
+from aiogram.types import CallbackQuery, User
+
+from dataclasses import dataclass
+
+from keyboards.callbacks import (
+    BackToUsersList, CallbackRoutes, LanguageChoice, Payload, UsersPage, ViewUser,
+)
+
+# شناسه‌های کاربر تلگرام در ۵۲ بیت جا می‌شوند
+LARGE_ID = 2 ** 52 - 1
+
+@dataclass(frozen=True)
+class ViewSection(Payload, prefix='vs', legacy='view_'):
+    """payload آزمایشی با پیشوند قدیمی کوتاه‌تر از view_user_ (برای بررسی برگشت به پیشوند کوتاه‌تر)"""
+    section: str
+
+    @classmethod
+    def from_legacy(cls, rest):
+        return cls(rest)
+
+async def handled(*args, **kwargs):
+    return True
+
+def build_legacy_router():
+    """همان handlerهای قبلی: main.py (lang_) و بعد handlers/user_management.py"""
+    router = Router()
+    router.callback_query.register(handled, lambda c: c.data.startswith("lang_"))
+    router.callback_query.register(handled, lambda c: c.data.startswith("users_page_"))
+    router.callback_query.register(handled, lambda c: c.data.startswith("view_user_"))
+    router.callback_query.register(handled, F.data == "back_to_users_list")
+    return router
+
+def build_trie_router():
+    routes = CallbackRoutes()
+    for payload in (LanguageChoice, UsersPage, ViewUser, BackToUsersList):
+        routes.route(payload)(handled)
+    router = Router()
+    router.callback_query.register(routes.dispatch, routes.filter)
+    return router, routes
+
+def check_overlapping_prefixes():
+    """callbackی که از پیشوند طولانی‌تر می‌گذرد ولی payloadش معتبر نیست به پیشوند کوتاه‌تر می‌رسد"""
+    routes = CallbackRoutes()
+    for payload in (ViewUser, ViewSection):
+        routes.route(payload)(handled)
+    cases = [
+        ("view_user_42", ViewUser(42)),
+        ("view_user_list", ViewSection("user_list")),
+        ("view_settings", ViewSection("settings")),
+    ]
+    for data, expected in cases:
+        resolved = routes.resolve(data)
+        assert resolved is not None and resolved[1] == expected, (data, resolved)
+    print(f"✅ overlapping prefixes: {len(cases)} callbacks resolved to the longest prefix that parses")
+
+def make_callback(data):
+    return CallbackQuery(
+        id='1', chat_instance='1', data=data,
+        from_user=User(id=1, is_bot=False, first_name='Bench'),
+    )
+
+async def bench(router, callback, number):
+    """میکروثانیه برای هر callback"""
+    best = None
+    for _ in range(5):
+        started = time.perf_counter()
+        for _ in range(number):
+            await router.propagate_event(update_type='callback_query', event=callback)
+        elapsed = (time.perf_counter() - started) / number * 1e6
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+async def run(number):
+    check_overlapping_prefixes()
+    legacy_router = build_legacy_router()
+    trie_router, routes = build_trie_router()
+    cases = [
+        ("language", "lang_fa", LanguageChoice("fa")),
+        ("users page", f"users_page_12_n_{LARGE_ID}", UsersPage(12, "n", LARGE_ID)),
+        ("view user", f"view_user_{LARGE_ID}", ViewUser(LARGE_ID)),
+        ("back to list", "back_to_users_list", BackToUsersList()),
+    ]
+
+    print(f"{'payload':<14} {'legacy B':>9} {'packed B':>9} {'legacy µs':>10} {'trie µs':>8}")
+    for name, legacy_data, payload in cases:
+        packed = payload.pack()
+        # هم قالب جدید و هم دکمه‌های پیام‌های قبلی به همان payload می‌رسند
+        assert routes.resolve(packed)[1] == payload, packed
+        assert routes.resolve(legacy_data)[1] == payload, legacy_data
+
+        legacy_us = await bench(legacy_router, make_callback(legacy_data), number)
+        trie_us = await bench(trie_router, make_callback(packed), number)
+        print(f"{name:<14} {len(legacy_data.encode()):>9} {len(packed.encode()):>9} {legacy_us:>10.2f} {trie_us:>8.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Callback routing benchmark")
+    parser.add_argument('--number', type=int, default=20000)
+    args = parser.parse_args()
+    asyncio.run(run(args.number))
+
+if __name__ == "__main__":
+    main()
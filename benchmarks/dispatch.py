@@ -0,0 +1,138 @@
+# benchmarks/dispatch.py
+"""
+پروفایل dispatch دکمه‌ها: چند فیلتر برای هر پیام امتحان می‌شود تا handler پیدا شود
+
+هر متن دکمه (keyboards/buttons.py) در همه stateهای ثبت‌شده یک بار با مسیر معمول aiogram
+(امتحان خطی فیلترها) و یک بار با ButtonDispatcher فرستاده می‌شود. handlerها اجرا نمی‌شوند؛
+فقط handler انتخاب‌شده ثبت و با مسیر معمول مقایسه می‌شود.
+
+گزارش:
+- تعداد فیلترهای امتحان‌شده برای هر پیام (میانگین و بیشترین) و زمان dispatch
+- پیام‌هایی که دو مسیر handler متفاوتی انتخاب کرده‌اند (باید صفر باشد)
+- handlerهای دکمه که هیچ‌وقت اجرا نمی‌شوند چون handler دیگری با همان متن جلوتر است
+
+اجرا:
+    python -m benchmarks.dispatch --number 20
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime
+
+from aiogram.dispatcher.event.handler import FilterObject, HandlerObject
+from aiogram.types import Chat, Message, User
+
+def handler_name(handler):
+    callback = handler.callback
+    return f"{callback.__module__}.{callback.__name__}"
+
+def make_message(text):
+    return Message(
+        message_id=1, date=datetime.now(), text=text,
+        chat=Chat(id=1, type='private'), from_user=User(id=1, is_bot=False, first_name='Bench'),
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Button dispatch profiler")
+    parser.add_argument('--number', type=int, default=20, help="repetitions of the workload for timing")
+    args = parser.parse_args()
+
+    # main.py هنگام import دیتابیس را باز می‌کند و توکن می‌خواهد؛ دیتابیس موقت و توکن ساختگی
+    workdir = tempfile.mkdtemp(prefix='dispatch_')
+    os.environ.update({'DB_NAME': os.path.join(workdir, 'bench.db'), 'BOT_TOKEN': '123456:BENCHMARK'})
+    try:
+        asyncio.run(run(args.number))
+    finally:
+        from database import close_db
+        close_db()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+async def run(number):
+    import main as bot_main
+    from keyboards.buttons import BUTTONS
+    from middlewares.button_dispatch import message_handlers
+
+    dp, bot, dispatcher = bot_main.dp, bot_main.bot, bot_main.button_dispatcher
+    entries = list(message_handlers(dp))
+    states = sorted({state for _, _, _, state, _ in entries if state is not None})
+    labels = sorted({text for texts in BUTTONS.values() for text in texts})
+    workload = [(make_message(text), state) for text in labels for state in [None] + states]
+
+    # handlerها اجرا نمی‌شوند؛ فقط انتخاب‌شدن‌شان ثبت می‌شود
+    chosen = []
+    filters_evaluated = 0
+    original_filter_call = FilterObject.call
+    original_handler_call = HandlerObject.call
+
+    async def record_handler(self, *args, **kwargs):
+        chosen.append(self)
+
+    async def counting_filter(self, *args, **kwargs):
+        nonlocal filters_evaluated
+        filters_evaluated += 1
+        return await original_filter_call(self, *args, **kwargs)
+
+    async def dispatch(message, state):
+        return await dp.propagate_event(
+            update_type='message', event=message, bot=bot, raw_state=state, **dp.workflow_data
+        )
+
+    HandlerObject.call = record_handler
+    try:
+        results = {}
+        for enabled in (False, True):
+            dispatcher.enabled = enabled
+            dispatcher.rebuild()
+
+            # شمارش فیلترها و handler انتخاب‌شده برای هر پیام
+            FilterObject.call = counting_filter
+            counts, picks = [], []
+            for message, state in workload:
+                filters_evaluated = 0
+                chosen.clear()
+                await dispatch(message, state)
+                counts.append(filters_evaluated)
+                picks.append(chosen[0] if chosen else None)
+            FilterObject.call = original_filter_call
+
+            # زمان dispatch بدون شمارنده
+            started = time.perf_counter()
+            for _ in range(number):
+                for message, state in workload:
+                    await dispatch(message, state)
+            elapsed_us = (time.perf_counter() - started) / (number * len(workload)) * 1e6
+            results[enabled] = (counts, picks, elapsed_us)
+    finally:
+        HandlerObject.call = original_handler_call
+        FilterObject.call = original_filter_call
+
+    print(f"📨 {len(labels)} button texts × {len(states) + 1} states = {len(workload)} messages\n")
+    print(f"{'path':<18} {'filters/msg':>12} {'max':>5} {'dispatch µs':>12}")
+    for enabled, title in ((False, "linear filters"), (True, "button table")):
+        counts, _, elapsed_us = results[enabled]
+        print(f"{title:<18} {sum(counts) / len(counts):>12.1f} {max(counts):>5} {elapsed_us:>12.2f}")
+
+    linear_picks, table_picks = results[False][1], results[True][1]
+    mismatches = [
+        (message.text, state, linear, table)
+        for (message, state), linear, table in zip(workload, linear_picks, table_picks)
+        if linear is not table
+    ]
+    print(f"\n{'✅' if not mismatches else '❌'} handler mismatches: {len(mismatches)}")
+    for text, state, linear, table in mismatches[:20]:
+        print(f"   {text!r} in {state}: linear={linear and handler_name(linear)} table={table and handler_name(table)}")
+
+    # handlerهای دکمه که برای هیچ متن و stateی انتخاب نشدند
+    picked = Counter(id(handler) for handler in linear_picks if handler is not None)
+    shadowed = [handler for _, handler, texts, _, _ in entries if texts is not None and id(handler) not in picked]
+    if shadowed:
+        print("\n⚠️ button handlers that never run (an earlier handler takes the same text):")
+        for handler in shadowed:
+            print(f"   {handler_name(handler)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# benchmarks/fsm_storage.py
+"""
+هزینه SQLiteStorage نسبت به MemoryStorage برای هر آپدیت
+
+هر آپدیت شبیه‌سازی‌شده مثل FSMContextMiddleware وضعیت را می‌خواند و بخشی از آن‌ها
+مثل مراحل ثبت‌نام یا سرمایه‌گذاری داده و وضعیت را تغییر می‌دهند.
+
+اجرا:
+    python -m benchmarks.fsm_storage --users 2000 --updates 20000 --writes 0.3
+"""
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from database import AsyncDatabase
+from utils.fsm_storage import SQLiteStorage
+
+STATES = ['RegistrationStates:waiting_for_email', 'InvestmentStates:waiting_for_amount', None]
+
+async def simulate_update(storage, key, write):
+    await storage.get_state(key)
+    if write:
+        await storage.update_data(key, {'amount': random.randint(500, 5000), 'annual_percentage': 24.0})
+        await storage.set_state(key, random.choice(STATES))
+
+async def bench_storage(storage, users, updates, write_ratio):
+    """زمان هر آپدیت (میلی‌ثانیه)"""
+    timings = []
+    for _ in range(updates):
+        user_id = random.randint(1, users)
+        key = StorageKey(bot_id=1, chat_id=user_id, user_id=user_id)
+        started = time.perf_counter()
+        await simulate_update(storage, key, random.random() < write_ratio)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    close_started = time.perf_counter()
+    await storage.close()
+    return sorted(timings), (time.perf_counter() - close_started) * 1000
+
+def percentile(timings, p):
+    return timings[min(len(timings) - 1, int(len(timings) * p))]
+
+def main():
+    parser = argparse.ArgumentParser(description="FSM storage latency benchmark")
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--updates', type=int, default=20000)
+    parser.add_argument('--writes', type=float, default=0.3, help='share of updates that change state')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='fsm_storage_')
+    db = AsyncDatabase(os.path.join(workdir, 'fsm.db'))
+    results = []
+
+    try:
+        for name, make_storage in (
+            ('memory', MemoryStorage),
+            ('sqlite', lambda: SQLiteStorage(db)),
+            # بعد از ری‌استارت: کش خالی است و وضعیت‌ها از دیتابیس خوانده می‌شوند
+            ('sqlite-restart', lambda: SQLiteStorage(db)),
+        ):
+            random.seed(42)
+            print(f"🔄 {name}: {args.updates} updates...")
+            timings, close_ms = asyncio.run(bench_storage(make_storage(), args.users, args.updates, args.writes))
+            results.append((name, timings, close_ms))
+    finally:
+        db.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print()
+    print(f"{'storage':<15} {'mean ms':>8} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'close ms':>9}")
+    for name, timings, close_ms in results:
+        mean = sum(timings) / len(timings)
+        print(f"{name:<15} {mean:>8.3f} {percentile(timings, 0.5):>8.3f} {percentile(timings, 0.99):>8.3f} "
+              f"{timings[-1]:>8.3f} {close_ms:>9.1f}")
+
+if __name__ == "__main__":
+    main()
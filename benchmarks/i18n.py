@@ -0,0 +1,65 @@
+# benchmarks/i18n.py
+"""
+هزینه گرفتن و ساختن متن: روش قبلی (ساخت dict همه زبان‌ها در هر فراخوانی) در برابر کاتالوگ utils/i18n.py
+
+روش قبلی از روی همان متن‌های کاتالوگ به شکل یک تابع با dict ثابت ساخته می‌شود
+(مثل get_investment_texts قبلی) تا فقط روش دسترسی مقایسه شود.
+
+اجرا:
+    python -m benchmarks.i18n --number 200000
+"""
+import argparse
+import timeit
+
+from utils.i18n import CATALOG, LANGUAGES, get_texts
+
+SAMPLE_VALUES = {
+    'amount': 1500.0, 'annual_percentage': 50, 'monthly_percentage': 4.17, 'monthly_profit': 62.5,
+}
+
+def build_legacy_getter(namespace):
+    """تابعی مثل get_investment_texts قبلی: dict همه زبان‌ها در هر فراخوانی ساخته می‌شود"""
+    texts = {language: dict(CATALOG[language][namespace]) for language in LANGUAGES}
+    source = (
+        "def get_legacy_texts(language):\n"
+        f"    texts = {texts!r}\n"
+        "    return texts.get(language, texts['en'])\n"
+    )
+    scope = {}
+    exec(source, scope)
+    return scope['get_legacy_texts']
+
+def bench(statement, number, scope):
+    """میکروثانیه برای هر بار اجرا (بهترین از ۵ تکرار)"""
+    return min(timeit.repeat(statement, number=number, repeat=5, globals=scope)) / number * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description="i18n catalog microbenchmark")
+    parser.add_argument('--number', type=int, default=200000)
+    args = parser.parse_args()
+
+    scope = {
+        'legacy': build_legacy_getter('investment'),
+        'get_texts': get_texts,
+        'values': SAMPLE_VALUES,
+    }
+    cases = [
+        ("lookup static text",
+         "legacy('fa')['min_amount']",
+         "get_texts('investment', 'fa')['min_amount']"),
+        ("render static text",
+         "legacy('fa')['menu']",
+         "get_texts('investment', 'fa')['menu'].render()"),
+        ("render template",
+         "legacy('fa')['details'].format(**values)",
+         "get_texts('investment', 'fa')['details'].render(**values)"),
+    ]
+
+    print(f"{'case':<20} {'legacy µs':>10} {'catalog µs':>11} {'speedup':>8}")
+    for name, legacy, catalog in cases:
+        legacy_us = bench(legacy, args.number, scope)
+        catalog_us = bench(catalog, args.number, scope)
+        print(f"{name:<20} {legacy_us:>10.3f} {catalog_us:>11.3f} {legacy_us / catalog_us:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# benchmarks/keyboards.py
+"""
+هزینه ساخت و سریال‌سازی کیبورد در مسیرهای پرتکرار منو
+
+قبلی: ساخت کیبورد در هر بار + model_dump و json.dumps در AiohttpSession
+جدید: کیبورد ساخته‌شده از keyboards/registry.py + JSON آماده در StaticMarkupSession
+
+اجرا:
+    python -m benchmarks.keyboards --number 20000
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import timeit
+
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.methods import SendMessage
+
+def bench(function, number):
+    """میکروثانیه برای هر بار اجرا (بهترین از ۵ تکرار)"""
+    return min(timeit.repeat(function, number=number, repeat=5)) / number * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description="Keyboard registry benchmark")
+    parser.add_argument('--number', type=int, default=20000)
+    args = parser.parse_args()
+
+    # main.py هنگام import دیتابیس را باز می‌کند و توکن می‌خواهد؛ دیتابیس موقت و توکن ساختگی
+    # (درخواستی به تلگرام فرستاده نمی‌شود)
+    workdir = tempfile.mkdtemp(prefix='keyboards_')
+    os.environ.update({'DB_NAME': os.path.join(workdir, 'bench.db'), 'BOT_TOKEN': '123456:BENCHMARK'})
+    try:
+        run(args.number)
+    finally:
+        from database import close_db
+        close_db()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def run(number):
+    import main as bot_main
+    from handlers.investment import get_investment_keyboard
+    from keyboards.main_menu import get_main_menu_keyboard
+    from keyboards.registry import StaticMarkupSession
+
+    bot = bot_main.bot
+    legacy_session = AiohttpSession()
+    static_session = StaticMarkupSession()
+    paths = [
+        ("main menu", get_main_menu_keyboard, ('fa',)),
+        ("investment menu", get_investment_keyboard, ('en',)),
+        ("language picker", bot_main.language_keyboard, ()),
+    ]
+
+    print(f"{'path':<16} {'build+send µs':>14} {'registry µs':>12} {'speedup':>8}")
+    for name, get_keyboard, arguments in paths:
+        build = get_keyboard.__wrapped__
+
+        def legacy():
+            message = SendMessage(chat_id=1, text="menu", reply_markup=build(*arguments))
+            legacy_session.build_form_data(bot, message)
+
+        def cached():
+            message = SendMessage(chat_id=1, text="menu", reply_markup=get_keyboard(*arguments))
+            static_session.build_form_data(bot, message)
+
+        legacy_us = bench(legacy, number)
+        cached_us = bench(cached, number)
+        print(f"{name:<16} {legacy_us:>14.2f} {cached_us:>12.2f} {legacy_us / cached_us:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
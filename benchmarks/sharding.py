@@ -0,0 +1,130 @@
+# benchmarks/sharding.py
+"""
+تعداد آپدیت در ثانیه بر حسب تعداد workerهای cluster.py
+
+آپدیت‌های ساختگی (start، پروفایل، سرمایه‌گذاری‌ها، موجودی) روی یک دیتابیس نمونه موقت پردازش می‌شوند.
+درخواست‌های Bot API به تلگرام نمی‌روند؛ --latency تاخیر شبکه هر درخواست را شبیه‌سازی می‌کند.
+
+اجرا:
+    python -m benchmarks.sharding --workers 1,2,4 --updates 3000 --latency 20
+"""
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import tempfile
+import time
+from datetime import datetime
+
+from aiogram.client.session.base import BaseSession
+from aiogram.types import Chat, Message
+
+WORKLOAD = ["/start", "👤 Profile", "📊 My Investments", "💵 Balance & Profit", "/myid"]
+
+class FakeSession(BaseSession):
+    """جواب ساختگی به همه متدهای Bot API با تاخیر ثابت"""
+
+    def __init__(self, latency=0.0):
+        super().__init__()
+        self.latency = latency
+
+    async def make_request(self, bot, method, timeout=None):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if method.__returning__ is bool:
+            return True
+        if method.__returning__ is Message:
+            return Message(message_id=1, date=datetime.now(), chat=Chat(id=getattr(method, 'chat_id', 0), type='private'))
+        return None
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        yield b''
+
+    async def close(self):
+        pass
+
+def install_fake_session(bot, dp):
+    """setup پردازه worker: به جای تلگرام از FakeSession استفاده می‌شود"""
+    bot.session = FakeSession(float(os.getenv("BENCH_LATENCY_MS", "0")) / 1000)
+
+def make_update(update_id, user_id):
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': {'id': user_id, 'is_bot': False, 'first_name': f'User {user_id}'},
+            'text': random.choice(WORKLOAD),
+        },
+    }
+
+def wait_done(ack, count):
+    done = 0
+    while done < count:
+        kind, _ = ack.get()
+        if kind == 'done':
+            done += 1
+
+async def bench_workers(workers, updates, users):
+    import cluster
+
+    ack = cluster._mp.Queue()
+    pool = cluster.WorkerPool(workers, ack=ack, setup=install_fake_session)
+    pool.start()
+    loop = asyncio.get_running_loop()
+    try:
+        for _ in range(workers):
+            await loop.run_in_executor(None, ack.get)
+
+        started = time.perf_counter()
+        collector = loop.run_in_executor(None, wait_done, ack, updates)
+        for update_id in range(1, updates + 1):
+            await pool.dispatch(make_update(update_id, random.randint(1, users)))
+        await collector
+        elapsed = time.perf_counter() - started
+    finally:
+        await pool.stop()
+
+    return updates / elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Sharded worker throughput benchmark")
+    parser.add_argument('--workers', default='1,2,4')
+    parser.add_argument('--updates', type=int, default=3000)
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--latency', type=float, default=0.0, help='simulated Bot API latency (ms)')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='sharding_')
+    # قبل از import ماژول‌های دیتابیس و بات تنظیم می‌شوند تا workerها (spawn) همین مقادیر را ببینند
+    # و دیتابیس اصلی یا توکن واقعی استفاده نشود
+    os.environ.update({
+        'DB_NAME': os.path.join(workdir, 'bench.db'),
+        'BOT_TOKEN': '123456:BENCHMARK',
+        'ADMIN_IDS': '',
+        'BENCH_LATENCY_MS': str(args.latency),
+    })
+    from database import CONNECTION_PROFILE
+    from benchmarks.sqlite_profile import seed_database
+
+    results = []
+    try:
+        random.seed(42)
+        print(f"🔄 Seeding {args.users} users...")
+        seed_database(os.environ['DB_NAME'], args.users, CONNECTION_PROFILE)
+
+        for workers in [int(n) for n in args.workers.split(',')]:
+            print(f"🔄 {workers} workers: {args.updates} updates...")
+            results.append((workers, asyncio.run(bench_workers(workers, args.updates, args.users))))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print()
+    print(f"{'workers':>7} {'updates/s':>10} {'speedup':>8}")
+    for workers, rate in results:
+        print(f"{workers:>7} {rate:>10.0f} {rate / results[0][1]:>7.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+# benchmarks/sqlite_profile.py
+"""
+مقایسه پروفایل پیش‌فرض قدیمی sqlite با CONNECTION_PROFILE روی یک دیتابیس نمونه
+
+اجرا:
+    python -m benchmarks.sqlite_profile --users 5000 --writes 2000 --seconds 5
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+
+from database import CONNECTION_PROFILE, Database, is_busy_error
+
+# رفتار قبلی: rollback journal با تنظیمات پیش‌فرض sqlite3.connect
+LEGACY_PROFILE = {
+    'busy_timeout': 5000,
+    'journal_mode': 'DELETE',
+    'synchronous': 'FULL',
+}
+
+def seed_database(path, users, profile):
+    """ساخت دیتابیس نمونه با کاربر و سرمایه‌گذاری"""
+    db = Database(path, profile=profile)
+    cursor = db.conn.cursor()
+
+    cursor.executemany(
+        'INSERT INTO users (user_id, language, full_name, email, phone, wallet_address) VALUES (?, ?, ?, ?, ?, ?)',
+        [(user_id, random.choice(['fa', 'en', 'ar']), f'User {user_id}', f'user{user_id}@example.com',
+          f'+98912{user_id:07d}', f'0x{user_id:040x}') for user_id in range(1, users + 1)]
+    )
+    cursor.executemany(
+        '''INSERT INTO investments (user_id, package, amount, duration, start_date, end_date, status, monthly_profit_percent)
+           VALUES (?, '24% Annual', ?, 999, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP, ?, 2.0)''',
+        [(random.randint(1, users), random.randint(50, 5000), random.choice(['active', 'pending']))
+         for _ in range(users * 2)]
+    )
+    db.conn.commit()
+    db.close()
+
+def bench_writes(path, users, writes, profile):
+    """تعداد commitهای تکی در ثانیه (مثل ویرایش پروفایل توسط کاربر)"""
+    db = Database(path, init_schema=False, profile=profile)
+    started = time.perf_counter()
+
+    for i in range(writes):
+        db.update_user_field(random.randint(1, users), 'email', f'changed{i}@example.com')
+
+    elapsed = time.perf_counter() - started
+    db.close()
+    return writes / elapsed
+
+def bench_mixed(path, users, readers, seconds, profile):
+    """یک نویسنده و چند خواننده هم‌زمان؛ تعداد عملیات و خطاهای قفل را می‌شمارد"""
+    counters = {'reads': 0, 'writes': 0, 'busy': 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def count(key):
+        with lock:
+            counters[key] += 1
+
+    def reader():
+        db = Database(path, init_schema=False, profile=profile)
+        while time.perf_counter() < deadline:
+            try:
+                user_id = random.randint(1, users)
+                db.get_user(user_id)
+                db.get_user_portfolio(user_id)
+                count('reads')
+            except Exception as e:
+                if not is_busy_error(e):
+                    raise
+                count('busy')
+        db.close()
+
+    def writer():
+        db = Database(path, init_schema=False, profile=profile)
+        while time.perf_counter() < deadline:
+            try:
+                db.update_user_field(random.randint(1, users), 'phone', str(random.randint(10**9, 10**10)))
+                count('writes')
+            except Exception as e:
+                if not is_busy_error(e):
+                    raise
+                count('busy')
+        db.close()
+
+    threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return counters['reads'] / seconds, counters['writes'] / seconds, counters['busy']
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite connection profile benchmark")
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--writes', type=int, default=2000)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='sqlite_profile_')
+    results = []
+
+    try:
+        for name, profile in (('legacy', LEGACY_PROFILE), ('tuned', CONNECTION_PROFILE)):
+            random.seed(42)
+            path = os.path.join(workdir, f'{name}.db')
+
+            print(f"🔄 {name}: seeding {args.users} users...")
+            seed_database(path, args.users, profile)
+
+            write_rate = bench_writes(path, args.users, args.writes, profile)
+            read_rate, mixed_write_rate, busy = bench_mixed(path, args.users, args.readers, args.seconds, profile)
+            results.append((name, write_rate, read_rate, mixed_write_rate, busy))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print()
+    print(f"{'profile':<8} {'commits/s':>10} {'mixed reads/s':>14} {'mixed writes/s':>15} {'busy errors':>12}")
+    for name, write_rate, read_rate, mixed_write_rate, busy in results:
+        print(f"{name:<8} {write_rate:>10.0f} {read_rate:>14.0f} {mixed_write_rate:>15.0f} {busy:>12}")
+
+if __name__ == "__main__":
+    main()
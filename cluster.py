@@ -0,0 +1,278 @@
+# cluster.py
+"""
+اجرای بات با چند پردازه.
+
+پردازه اصلی آپدیت‌ها را (webhook یا polling) دریافت می‌کند و بر اساس chat_id بین BOT_WORKERS پردازه پخش می‌کند.
+هر worker همان routerهای main.py را اجرا می‌کند؛ چون آپدیت‌های هر چت همیشه به یک worker می‌رسند
+و آنجا به ترتیب پردازش می‌شوند، کش FSM هر worker و ترتیب پیام‌های هر کاربر درست می‌ماند.
+
+- ساخت جداول، migrationها و برگرداندن پیام‌های نیمه‌کاره outbox فقط یک بار در پردازه اصلی انجام می‌شود
+- سقف ارسال (SEND_RATE) بین workerها تقسیم می‌شود تا مجموع از محدودیت تلگرام بیشتر نشود
+- اطلاعیه‌های نیمه‌کاره فقط در worker شماره ۰ ادامه پیدا می‌کنند
+
+اجرا:
+    BOT_WORKERS=4 python cluster.py
+
+متغیرها:
+    BOT_WORKERS          تعداد پردازه‌های worker (پیش‌فرض: تعداد هسته‌ها)
+    WORKER_QUEUE_SIZE    حداکثر آپدیت در صف هر worker؛ اگر پر باشد پردازه اصلی منتظر می‌ماند
+    WORKER_MAX_UPDATES   حداکثر آپدیت در حال پردازش در هر worker
+    و متغیرهای BOT_MODE / WEBHOOK_* در server.py
+"""
+import asyncio
+import multiprocessing
+import os
+import queue
+import signal
+
+from aiohttp import web
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BOT_WORKERS = int(os.getenv("BOT_WORKERS", str(os.cpu_count() or 1)))
+WORKER_QUEUE_SIZE = int(os.getenv("WORKER_QUEUE_SIZE", "1000"))
+WORKER_MAX_UPDATES = int(os.getenv("WORKER_MAX_UPDATES", "100"))
+
+# پردازه‌ها با spawn ساخته می‌شوند؛ fork از پردازه‌ای که thread دارد (دیتابیس) امن نیست
+_mp = multiprocessing.get_context("spawn")
+
+def shard_key(update: dict) -> int:
+    """chat_id آپدیت (یا شناسه کاربر برای آپدیت‌های بدون چت مثل inline_query)"""
+    for key, event in update.items():
+        if key == 'update_id' or not isinstance(event, dict):
+            continue
+        chat = event.get('chat') or (event.get('message') or {}).get('chat')
+        if chat:
+            return chat['id']
+        user = event.get('from') or event.get('user')
+        if user:
+            return user['id']
+    return update.get('update_id', 0)
+
+# ===== worker =====
+
+class ShardWorker:
+    """دریافت آپدیت‌ها از صف پردازه اصلی و پردازش آن‌ها؛ آپدیت‌های هر چت به ترتیب اجرا می‌شوند"""
+
+    def __init__(self, index, bot, dp, updates, ack=None):
+        self.index = index
+        self.bot = bot
+        self.dp = dp
+        self.updates = updates
+        self.ack = ack
+        self._slots = asyncio.Semaphore(WORKER_MAX_UPDATES)
+        self._tails = {}  # chat_id → آخرین task آن چت
+        self._tasks = set()
+
+    async def run(self):
+        await self.dp.emit_startup(bot=self.bot, shard=self.index)
+        if self.ack is not None:
+            self.ack.put(('ready', self.index))
+        try:
+            await self._consume()
+            # آپدیت‌های دریافت‌شده قبل از خاموش شدن کامل پردازش می‌شوند
+            if self._tasks:
+                await asyncio.wait(list(self._tasks))
+        finally:
+            await self.dp.emit_shutdown(bot=self.bot, shard=self.index)
+            await self.bot.session.close()
+
+    async def _consume(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            # یک get در thread (منتظر ماندن) و بقیه صف بدون انتظار
+            batch = [await loop.run_in_executor(None, self.updates.get)]
+            try:
+                while len(batch) < 100:
+                    batch.append(self.updates.get_nowait())
+            except queue.Empty:
+                pass
+
+            for update in batch:
+                if update is None:
+                    return
+                await self._slots.acquire()
+                self._schedule(update)
+
+    def _schedule(self, update):
+        chat_id = shard_key(update)
+        previous = self._tails.get(chat_id)
+        task = asyncio.create_task(self._process(previous, update))
+        self._tails[chat_id] = task
+        self._tasks.add(task)
+
+        def _done(task):
+            self._tasks.discard(task)
+            self._slots.release()
+            if self._tails.get(chat_id) is task:
+                del self._tails[chat_id]
+
+        task.add_done_callback(_done)
+
+    async def _process(self, previous, update):
+        if previous is not None:
+            await asyncio.wait([previous])
+        try:
+            await self.dp.feed_raw_update(self.bot, update)
+        except Exception as e:
+            print(f"❌ Worker {self.index}: update {update.get('update_id')} failed: {type(e).__name__}: {e}")
+        if self.ack is not None:
+            self.ack.put(('done', update.get('update_id')))
+
+def worker_main(index, count, updates, ack=None, setup=None):
+    """نقطه شروع پردازه worker"""
+    # Ctrl+C فقط به پردازه اصلی می‌رسد که workerها را با تخلیه صف متوقف می‌کند
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    # سهم این پردازه از سقف ارسال؛ باید قبل از ساخته شدن محدودکننده تنظیم شود
+    import utils.rate_limit
+    utils.rate_limit.SEND_RATE /= count
+
+    from main import bot, dp
+    # handlerها (مثل /resetdb) می‌فهمند که چند پردازه روی همین دیتابیس کار می‌کنند
+    dp["cluster_workers"] = count
+    if setup is not None:
+        setup(bot, dp)
+
+    asyncio.run(ShardWorker(index, bot, dp, updates, ack).run())
+
+# ===== پردازه اصلی =====
+
+class WorkerPool:
+    """شروع workerها و پخش آپدیت‌ها بین آن‌ها بر اساس chat_id"""
+
+    def __init__(self, workers=BOT_WORKERS, queue_size=WORKER_QUEUE_SIZE, ack=None, setup=None):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.ack = ack
+        self.setup = setup
+        self._processes = []
+        self._queues = []
+
+    def start(self):
+        prepare_database()
+        for index in range(self.workers):
+            updates = _mp.Queue(self.queue_size)
+            process = _mp.Process(
+                target=worker_main,
+                args=(index, self.workers, updates, self.ack, self.setup),
+                name=f"bot-worker-{index}",
+                daemon=True,
+            )
+            process.start()
+            self._queues.append(updates)
+            self._processes.append(process)
+        print(f"🧩 Started {self.workers} bot workers")
+
+    async def dispatch(self, update: dict):
+        updates = self._queues[shard_key(update) % self.workers]
+        try:
+            updates.put_nowait(update)
+        except queue.Full:
+            # worker عقب است؛ دریافت آپدیت‌های بعدی هم صبر می‌کند
+            await asyncio.get_running_loop().run_in_executor(None, updates.put, update)
+
+    async def stop(self, timeout=30):
+        loop = asyncio.get_running_loop()
+        for updates in self._queues:
+            await loop.run_in_executor(None, updates.put, None)
+        for process in self._processes:
+            await loop.run_in_executor(None, process.join, timeout)
+            if process.is_alive():
+                print(f"⚠️ {process.name} did not stop in {timeout}s, terminating")
+                process.terminate()
+        self._processes = []
+        self._queues = []
+
+def prepare_database():
+    """ساخت جداول و migrationها و برگرداندن پیام‌های نیمه‌کاره صف، یک بار قبل از شروع workerها"""
+    from database import Database
+    from utils.outbox import OUTBOX_RETENTION_DAYS
+
+    db = Database()
+    try:
+        recovered = db.recover_outbox()
+        purged = db.purge_outbox(OUTBOX_RETENTION_DAYS)
+        if recovered or purged:
+            print(f"📮 Outbox: {recovered} messages requeued, {purged} old messages purged")
+    finally:
+        db.close()
+
+def used_update_types():
+    """نوع آپدیت‌هایی که routerهای main.py handler دارند (برای allowed_updates تلگرام)"""
+    # dispatcher فقط برای همین در پردازه اصلی ساخته می‌شود؛ دیتابیسی که main باز می‌کند بسته می‌شود
+    from database import close_db
+    from main import dp
+    try:
+        return dp.resolve_used_update_types()
+    finally:
+        close_db()
+
+def create_app(mode=None, workers=BOT_WORKERS):
+    from aiogram import Bot
+    from aiogram.exceptions import TelegramNetworkError, TelegramServerError
+    from server import BOT_MODE, WEBHOOK_DRAIN_TIMEOUT, WEBHOOK_PATH, WEBHOOK_SECRET, health_check, set_webhook
+
+    mode = mode or BOT_MODE
+    pool = WorkerPool(workers)
+    bot = Bot(token=os.getenv("BOT_TOKEN"))
+    # همان نوع آپدیت‌هایی که server.py ثبت می‌کند؛ وگرنه تلگرام فهرست قبلی را نگه می‌دارد
+    allowed_updates = used_update_types()
+
+    app = web.Application()
+    app.router.add_get('/', health_check)
+
+    async def start_pool(app):
+        pool.start()
+
+    async def stop_pool(app):
+        await pool.stop(WEBHOOK_DRAIN_TIMEOUT)
+        await bot.session.close()
+
+    if mode == 'webhook':
+        async def handle_update(request):
+            if WEBHOOK_SECRET and request.headers.get('X-Telegram-Bot-Api-Secret-Token') != WEBHOOK_SECRET:
+                return web.Response(status=401, text='Unauthorized')
+            await pool.dispatch(await request.json())
+            return web.json_response({})
+
+        async def register_webhook(app):
+            await set_webhook(bot, allowed_updates)
+
+        app.router.add_post(WEBHOOK_PATH, handle_update)
+        app.on_startup.extend([start_pool, register_webhook])
+        app.on_shutdown.append(stop_pool)
+    else:
+        async def poll():
+            offset = None
+            while True:
+                try:
+                    updates = await bot.get_updates(offset=offset, timeout=30, allowed_updates=allowed_updates)
+                except (TelegramNetworkError, TelegramServerError) as e:
+                    print(f"⚠️ Polling error: {e}")
+                    await asyncio.sleep(5)
+                    continue
+                for update in updates:
+                    await pool.dispatch(update.model_dump(mode='json', by_alias=True, exclude_unset=True))
+                    offset = update.update_id + 1
+
+        async def start_polling(app):
+            await bot.delete_webhook()
+            app['polling'] = asyncio.create_task(poll())
+
+        async def stop_polling(app):
+            app['polling'].cancel()
+            await asyncio.gather(app['polling'], return_exceptions=True)
+
+        app.on_startup.extend([start_pool, start_polling])
+        app.on_shutdown.extend([stop_polling, stop_pool])
+
+    print(f"🤖 Bot mode: {mode}, {workers} workers")
+    return app
+
+if __name__ == "__main__":
+    from server import WEBHOOK_DRAIN_TIMEOUT
+
+    port = int(os.environ.get("PORT", 10000))
+    web.run_app(create_app(), host='0.0.0.0', port=port, shutdown_timeout=WEBHOOK_DRAIN_TIMEOUT + 5)
@@ -0,0 +1,227 @@
+# config.py
+"""
+تنظیمات زمان اجرا: ادمین‌ها، کیف پول شرکت و پله‌های سود سرمایه‌گذاری.
+
+تنظیمات یک بار parse و اعتبارسنجی می‌شوند و در یک شیء فقط‌خواندنی نگه داشته می‌شوند؛
+is_admin فقط یک جستجو در frozenset است (نه خواندن و split کردن ADMIN_IDS در هر پیام).
+
+منابع (هر کلید):
+    CONFIG_FILE (پیش‌فرض config.json، اختیاری) → متغیر محیطی / .env → مقدار پیش‌فرض
+
+بارگذاری مجدد بدون ری‌استارت (فقط فایل؛ متغیرهای محیطی با ری‌استارت عوض می‌شوند):
+- تغییر فایل هر CONFIG_POLL_INTERVAL ثانیه بررسی می‌شود
+- kill -HUP <pid>
+اگر تنظیمات جدید نامعتبر باشد خطا چاپ می‌شود و تنظیمات قبلی می‌ماند.
+
+نمونه config.json:
+    {
+        "admin_ids": [123456789],
+        "company_wallet": "0x...",
+        "min_investment": 500,
+        "profit_tiers": [[5000, 50], [10000, 60], [null, 70]]
+    }
+
+متغیرهای محیطی معادل:
+    ADMIN_IDS=123,456   COMPANY_WALLET=0x...   MIN_INVESTMENT=500   PROFIT_TIERS=5000:50,10000:60,*:70
+
+بررسی دستی:
+    python -m config
+"""
+import asyncio
+import json
+import os
+import re
+import signal
+from dataclasses import dataclass
+from typing import FrozenSet, Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+CONFIG_FILE = os.getenv("CONFIG_FILE", "config.json")
+CONFIG_POLL_INTERVAL = float(os.getenv("CONFIG_POLL_INTERVAL", "5"))  # ثانیه
+
+DEFAULT_COMPANY_WALLET = "0x1234567890abcdef1234567890abcdef12345678"
+DEFAULT_MIN_INVESTMENT = 500.0
+DEFAULT_PROFIT_TIERS = "5000:50,10000:60,*:70"
+
+# آدرس BEP20 / ERC20
+WALLET_PATTERN = re.compile(r'^0x[0-9a-fA-F]{40}$')
+
+class ConfigError(ValueError):
+    """مقدار نامعتبر در تنظیمات"""
+
+@dataclass(frozen=True)
+class ProfitTier:
+    """سود سالانه برای مبلغ تا max_amount (None یعنی بدون سقف)"""
+    max_amount: Optional[float]
+    annual_percentage: float
+
+@dataclass(frozen=True)
+class RuntimeConfig:
+    admin_ids: FrozenSet[int]
+    company_wallet: str
+    min_investment: float
+    profit_tiers: Tuple[ProfitTier, ...]
+
+    def annual_percentage(self, amount: float) -> float:
+        """درصد سود سالانه برای یک مبلغ (زیر حداقل سرمایه‌گذاری: صفر)"""
+        if amount < self.min_investment:
+            return 0
+        for tier in self.profit_tiers:
+            if tier.max_amount is None or amount <= tier.max_amount:
+                return tier.annual_percentage
+        return 0
+
+def parse_admin_ids(value) -> FrozenSet[int]:
+    """'1, 2' یا [1, 2] → frozenset"""
+    items = value.split(",") if isinstance(value, str) else value
+    try:
+        return frozenset(int(str(item).strip()) for item in items if str(item).strip())
+    except ValueError:
+        raise ConfigError(f"admin_ids: not a list of integers: {value!r}") from None
+
+def parse_wallet(value) -> str:
+    wallet = str(value).strip()
+    if not WALLET_PATTERN.match(wallet):
+        raise ConfigError(f"company_wallet: not a 0x-prefixed 40 hex digit address: {wallet!r}")
+    return wallet
+
+def parse_amount(name, value) -> float:
+    """عدد نامنفی؛ عدد صحیح به صورت int می‌ماند (در متن‌ها 50% نه 50.0%)"""
+    try:
+        amount = float(value)
+    except (TypeError, ValueError):
+        raise ConfigError(f"{name}: not a number: {value!r}") from None
+    if amount < 0:
+        raise ConfigError(f"{name}: must not be negative: {value!r}")
+    return int(amount) if amount.is_integer() else amount
+
+def parse_profit_tiers(value) -> Tuple[ProfitTier, ...]:
+    """'5000:50,10000:60,*:70' یا [[5000, 50], [10000, 60], [null, 70]]"""
+    if isinstance(value, str):
+        value = [item.split(":") for item in value.split(",") if item.strip()]
+    tiers = []
+    for item in value:
+        if len(item) != 2:
+            raise ConfigError(f"profit_tiers: expected [max_amount, annual_percentage]: {item!r}")
+        max_amount, percentage = item
+        unbounded = max_amount is None or str(max_amount).strip() in ("*", "")
+        tiers.append(ProfitTier(
+            None if unbounded else parse_amount("profit_tiers max_amount", max_amount),
+            parse_amount("profit_tiers annual_percentage", percentage),
+        ))
+    if not tiers:
+        raise ConfigError("profit_tiers: at least one tier is required")
+    bounds = [tier.max_amount for tier in tiers]
+    if None in bounds[:-1]:
+        raise ConfigError("profit_tiers: only the last tier may be unbounded")
+    limited = [bound for bound in bounds if bound is not None]
+    if any(lower >= upper for lower, upper in zip(limited, limited[1:])):
+        raise ConfigError("profit_tiers: max_amount must increase from tier to tier")
+    return tuple(tiers)
+
+def read_config_file(path=None) -> dict:
+    """محتوای CONFIG_FILE (اگر وجود نداشته باشد: dict خالی)"""
+    path = path or CONFIG_FILE
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        try:
+            data = json.load(f)
+        except json.JSONDecodeError as e:
+            raise ConfigError(f"{path}: invalid JSON: {e}") from None
+    if not isinstance(data, dict):
+        raise ConfigError(f"{path}: expected a JSON object")
+    return data
+
+def load_config(path=None) -> RuntimeConfig:
+    """ساخت تنظیمات از فایل و متغیرهای محیطی؛ ConfigError اگر مقداری نامعتبر باشد"""
+    data = read_config_file(path)
+
+    def value(key, env, default):
+        if key in data:
+            return data[key]
+        return os.getenv(env, default)
+
+    return RuntimeConfig(
+        admin_ids=parse_admin_ids(value("admin_ids", "ADMIN_IDS", "")),
+        company_wallet=parse_wallet(value("company_wallet", "COMPANY_WALLET", DEFAULT_COMPANY_WALLET)),
+        min_investment=parse_amount("min_investment", value("min_investment", "MIN_INVESTMENT", DEFAULT_MIN_INVESTMENT)),
+        profit_tiers=parse_profit_tiers(value("profit_tiers", "PROFIT_TIERS", DEFAULT_PROFIT_TIERS)),
+    )
+
+def _file_mtime(path=None):
+    try:
+        return os.stat(path or CONFIG_FILE).st_mtime_ns
+    except OSError:
+        return None
+
+# تنظیمات فعلی؛ با بارگذاری مجدد کل شیء عوض می‌شود (خواننده‌ها هیچ‌وقت نیمه‌کاره نمی‌بینند)
+_config = load_config()
+_config_mtime = _file_mtime()
+_watcher = None
+
+def get_config() -> RuntimeConfig:
+    return _config
+
+def is_admin(user_id: int) -> bool:
+    """بررسی اینکه کاربر ادمین هست یا نه"""
+    return user_id in _config.admin_ids
+
+def reload_config() -> bool:
+    """خواندن دوباره تنظیمات؛ اگر نامعتبر باشد تنظیمات قبلی می‌ماند"""
+    global _config, _config_mtime
+    mtime = _file_mtime()
+    try:
+        config = load_config()
+    except (ValueError, OSError) as e:
+        print(f"❌ Config reload failed, keeping previous settings: {e}")
+        return False
+    finally:
+        _config_mtime = mtime
+    if config != _config:
+        _config = config
+        print(f"🔧 Config reloaded: {len(config.admin_ids)} admins, {len(config.profit_tiers)} profit tiers")
+    return True
+
+async def _watch_config_file():
+    while True:
+        await asyncio.sleep(CONFIG_POLL_INTERVAL)
+        if _file_mtime() != _config_mtime:
+            reload_config()
+
+async def start_config_watcher():
+    """startup: بارگذاری مجدد با تغییر فایل و SIGHUP"""
+    global _watcher
+    if _watcher is None:
+        _watcher = asyncio.create_task(_watch_config_file())
+    if hasattr(signal, "SIGHUP"):
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, reload_config)
+        except (NotImplementedError, RuntimeError):
+            # ویندوز یا loop غیر اصلی
+            pass
+
+async def stop_config_watcher():
+    global _watcher
+    if _watcher is not None:
+        _watcher.cancel()
+        _watcher = None
+    if hasattr(signal, "SIGHUP"):
+        try:
+            asyncio.get_running_loop().remove_signal_handler(signal.SIGHUP)
+        except (NotImplementedError, RuntimeError):
+            pass
+
+if __name__ == "__main__":
+    config = get_config()
+    source = CONFIG_FILE if os.path.exists(CONFIG_FILE) else "environment"
+    print(f"✅ Config from {source}")
+    print(f"   admins: {len(config.admin_ids)}")
+    print(f"   company wallet: {config.company_wallet[:6]}...{config.company_wallet[-4:]}")
+    print(f"   min investment: ${config.min_investment:,.0f}")
+    for tier in config.profit_tiers:
+        limit = f"up to ${tier.max_amount:,.0f}" if tier.max_amount is not None else "above"
+        print(f"   {tier.annual_percentage:g}% annually {limit}")
@@ -1,172 +1,132 @@
 # database.py
+import asyncio
+import functools
+import os
+import re
 import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-import random
-import string
+
+from migrations import get_schema_version, run_migrations
+from utils.referral_codes import decode_referral_code, make_referral_code
+
+DB_NAME = os.getenv("DB_NAME", "finance_bot.db")
+
+# تعداد دستورات آماده‌شده‌ای که sqlite برای هر اتصال نگه می‌دارد
+STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE", "256"))
+
+# تعداد threadهای خواننده در لایه async
+DB_READERS = int(os.getenv("DB_READERS", "4"))
+
+# حداکثر تعداد کاربرانی که ردیف و زبانشان در حافظه نگه داشته می‌شود (0 یعنی غیرفعال)
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+
+# پروفایل اتصال sqlite؛ هر مقدار با متغیر محیطی قابل تغییر است
+# WAL باعث می‌شود خواننده‌ها و نویسنده همدیگر را قفل نکنند
+CONNECTION_PROFILE = {
+    'journal_mode': os.getenv("DB_JOURNAL_MODE", "WAL"),
+    'synchronous': os.getenv("DB_SYNCHRONOUS", "NORMAL"),
+    'mmap_size': int(os.getenv("DB_MMAP_SIZE", str(256 * 1024 * 1024))),
+    'cache_size': int(os.getenv("DB_CACHE_SIZE", "-20000")),  # عدد منفی یعنی کیلوبایت
+    'temp_store': os.getenv("DB_TEMP_STORE", "MEMORY"),
+    'busy_timeout': int(os.getenv("DB_BUSY_TIMEOUT", "5000")),  # میلی‌ثانیه
+}
+
+# اگر بعد از busy_timeout هنوز قفل بود، کل عملیات چند بار دیگر تکرار می‌شود
+BUSY_RETRIES = int(os.getenv("DB_BUSY_RETRIES", "5"))
+BUSY_RETRY_DELAY = float(os.getenv("DB_BUSY_RETRY_DELAY", "0.05"))
+
+# ترتیب اعمال pragmaها مهم است (journal_mode باید اول باشد)
+_PROFILE_PRAGMAS = ('busy_timeout', 'journal_mode', 'synchronous', 'mmap_size', 'cache_size', 'temp_store')
+
+def connect(db_name=DB_NAME, cached_statements=STATEMENT_CACHE_SIZE, profile=None):
+    """باز کردن اتصال sqlite با پروفایل تنظیمات (پیش‌فرض: CONNECTION_PROFILE)"""
+    if profile is None:
+        profile = CONNECTION_PROFILE
+    
+    conn = sqlite3.connect(
+        db_name,
+        timeout=profile.get('busy_timeout', 5000) / 1000,
+        check_same_thread=False,
+        cached_statements=cached_statements
+    )
+    
+    for pragma in _PROFILE_PRAGMAS:
+        value = profile.get(pragma)
+        if value is not None:
+            conn.execute(f"PRAGMA {pragma} = {value}")
+    
+    return conn
+
+def is_busy_error(error):
+    """خطای SQLITE_BUSY / SQLITE_LOCKED"""
+    if not isinstance(error, sqlite3.OperationalError):
+        return False
+    message = str(error).lower()
+    return 'locked' in message or 'busy' in message
+
+def run_with_busy_retry(func, database, *args, **kwargs):
+    """اجرای func(database, ...) و تکرار آن با تاخیر افزایشی وقتی دیتابیس قفل است"""
+    for attempt in range(BUSY_RETRIES + 1):
+        try:
+            return func(database, *args, **kwargs)
+        except sqlite3.OperationalError as e:
+            if attempt == BUSY_RETRIES or not is_busy_error(e):
+                raise
+            
+            # تراکنش نیمه‌کاره را برگردان تا تکرار از اول شروع شود
+            if database.conn is not None and database.conn.in_transaction:
+                database.conn.rollback()
+            
+            delay = BUSY_RETRY_DELAY * (2 ** attempt)
+            print(f"⏳ Database busy ({func.__name__}), retry {attempt + 1}/{BUSY_RETRIES} in {delay:.2f}s")
+            time.sleep(delay)
+
+def fts_match_query(search_term, columns=None):
+    """تبدیل عبارت جستجو به query امن FTS5: هر کلمه به صورت پیشوندی و همه با هم (AND)"""
+    tokens = re.findall(r'\w+', search_term)
+    if not tokens:
+        return None
+    
+    query = ' '.join(f'"{token}"*' for token in tokens)
+    if columns:
+        query = '{' + ' '.join(columns) + '} : (' + query + ')'
+    return query
 
 class Database:
-    def __init__(self, db_name="finance_bot.db"):
-        self.conn = sqlite3.connect(db_name, check_same_thread=False)
-        self.create_tables()
-    
-    def create_tables(self):
-        cursor = self.conn.cursor()
-        
-        # جدول کاربران
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                user_id INTEGER PRIMARY KEY,
-                language TEXT DEFAULT 'en',
-                full_name TEXT,
-                email TEXT,
-                phone TEXT,
-                wallet_address TEXT,
-                balance REAL DEFAULT 0.0,
-                registered_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                is_active INTEGER DEFAULT 1,
-                last_login TIMESTAMP,
-                referral_code TEXT UNIQUE,
-                referred_by INTEGER,
-                total_invested REAL DEFAULT 0.0,
-                total_withdrawn REAL DEFAULT 0.0
-            )
-        ''')
-        
-        # جدول سرمایه‌گذاری‌ها
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS investments (
-                investment_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                package TEXT,
-                amount REAL,
-                duration INTEGER,
-                start_date TIMESTAMP,
-                end_date TIMESTAMP,
-                status TEXT DEFAULT 'pending',
-                monthly_profit_percent REAL,
-                transaction_receipt TEXT,
-                receipt_type TEXT DEFAULT 'none',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                confirmed_by INTEGER,
-                confirmed_at TIMESTAMP,
-                notes TEXT,
-                FOREIGN KEY (user_id) REFERENCES users (user_id),
-                FOREIGN KEY (confirmed_by) REFERENCES users (user_id)
-            )
-        ''')
-        
-        # جدول تیکت‌ها
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS tickets (
-                ticket_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                subject TEXT,
-                message TEXT,
-                status TEXT DEFAULT 'open',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                admin_response TEXT,
-                responded_at TIMESTAMP,
-                responded_by INTEGER,
-                priority TEXT DEFAULT 'normal',
-                category TEXT,
-                FOREIGN KEY (user_id) REFERENCES users (user_id),
-                FOREIGN KEY (responded_by) REFERENCES users (user_id)
-            )
-        ''')
-        
-        # جدول تراکنش‌ها
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS transactions (
-                transaction_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                type TEXT,
-                amount REAL,
-                description TEXT,
-                status TEXT DEFAULT 'pending',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                completed_at TIMESTAMP,
-                wallet_address TEXT,
-                transaction_hash TEXT,
-                admin_notes TEXT,
-                processed_by INTEGER,
-                FOREIGN KEY (user_id) REFERENCES users (user_id),
-                FOREIGN KEY (processed_by) REFERENCES users (user_id)
-            )
-        ''')
-        
-        # جدول پرداخت سود ماهانه
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS profit_payments (
-                payment_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                investment_id INTEGER,
-                amount REAL,
-                payment_date TIMESTAMP,
-                status TEXT DEFAULT 'pending',
-                wallet_address TEXT,
-                transaction_hash TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (user_id),
-                FOREIGN KEY (investment_id) REFERENCES investments (investment_id)
-            )
-        ''')
-        
-        # جدول اعلان‌ها
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS notifications (
-                notification_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                type TEXT,
-                title TEXT,
-                message TEXT,
-                is_read INTEGER DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                related_id INTEGER,
-                FOREIGN KEY (user_id) REFERENCES users (user_id)
-            )
-        ''')
-        
-        # جدول لاگ‌های سیستم
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS system_logs (
-                log_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                action TEXT,
-                details TEXT,
-                ip_address TEXT,
-                user_agent TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (user_id)
-            )
-        ''')
-        
-        # جدول رفرال‌ها (جدید)
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS referrals (
-                referral_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                referrer_id INTEGER,
-                referred_id INTEGER,
-                registered_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                status TEXT DEFAULT 'completed',
-                reward_amount REAL DEFAULT 0.0,
-                reward_paid INTEGER DEFAULT 0,
-                FOREIGN KEY (referrer_id) REFERENCES users (user_id),
-                FOREIGN KEY (referred_id) REFERENCES users (user_id),
-                UNIQUE(referred_id)
-            )
-        ''')
-        
-        self.conn.commit()
+    # فیلدهایی از پروفایل که کاربر می‌تواند ویرایش کند
+    EDITABLE_USER_FIELDS = ('full_name', 'email', 'phone', 'wallet_address')
+    
+    def __init__(self, db_name=DB_NAME, cached_statements=STATEMENT_CACHE_SIZE, init_schema=True, profile=None):
+        self.db_name = db_name
+        self.cached_statements = cached_statements
+        self.profile = profile
+        self._has_fts = None
+        self.conn = self._connect()
+        if init_schema:
+            self.migrate()
+    
+    def _connect(self):
+        return connect(self.db_name, self.cached_statements, self.profile)
+    
+    def migrate(self):
+        """اجرای migrationهای باقی‌مانده (اگر دیتابیس به‌روز باشد فقط یک PRAGMA خوانده می‌شود)"""
+        return run_migrations(self.conn)
+    
+    def get_schema_version(self):
+        return get_schema_version(self.conn)
     
     # ===== توابع کاربران =====
     
     def add_user(self, user_id, language='en'):
         cursor = self.conn.cursor()
         cursor.execute('''
-            INSERT OR IGNORE INTO users (user_id, language) 
-            VALUES (?, ?)
-        ''', (user_id, language))
+            INSERT OR IGNORE INTO users (user_id, language, referral_code) 
+            VALUES (?, ?, ?)
+        ''', (user_id, language, make_referral_code(user_id)))
         self.conn.commit()
     
     def update_user_language(self, user_id, language):
@@ -185,6 +145,22 @@ class Database:
         ''', (full_name, email, phone, wallet_address, user_id))
         self.conn.commit()
     
+    def update_user_field(self, user_id, field, value):
+        """به‌روزرسانی یک فیلد از پروفایل (نام، ایمیل، تلفن یا کیف پول)"""
+        if field not in self.EDITABLE_USER_FIELDS:
+            raise ValueError(f"Field {field} is not editable")
+        
+        cursor = self.conn.cursor()
+        cursor.execute(f'UPDATE users SET {field} = ? WHERE user_id = ?', (value, user_id))
+        self.conn.commit()
+        return cursor.rowcount > 0
+    
+    def delete_user(self, user_id):
+        cursor = self.conn.cursor()
+        cursor.execute('DELETE FROM users WHERE user_id = ?', (user_id,))
+        self.conn.commit()
+        return cursor.rowcount > 0
+    
     def update_user_balance(self, user_id, amount, operation='add'):
         cursor = self.conn.cursor()
         
@@ -211,7 +187,13 @@ class Database:
     
     def get_user(self, user_id):
         cursor = self.conn.cursor()
-        cursor.execute('SELECT * FROM users WHERE user_id = ?', (user_id,))
+        # ستون‌ها به ترتیب ساختار جدید؛ در دیتابیس‌های migrate‌شده ترتیب SELECT * فرق دارد
+        cursor.execute('''
+            SELECT user_id, language, full_name, email, phone, wallet_address, balance,
+                   registered_at, is_active, last_login, referral_code, referred_by,
+                   total_invested, total_withdrawn
+            FROM users WHERE user_id = ?
+        ''', (user_id,))
         return cursor.fetchone()
     
     def get_user_language(self, user_id):
@@ -220,31 +202,176 @@ class Database:
         result = cursor.fetchone()
         return result[0] if result else 'en'
     
-    def get_all_users(self, limit=100, offset=0):
+    def get_users_languages(self, user_ids):
+        """زبان چند کاربر با یک query: {user_id: language}؛ کاربران ناموجود در نتیجه نیستند"""
+        user_ids = list(user_ids)
+        if not user_ids:
+            return {}
+        cursor = self.conn.cursor()
+        placeholders = ','.join('?' * len(user_ids))
+        cursor.execute(f'SELECT user_id, language FROM users WHERE user_id IN ({placeholders})', user_ids)
+        return dict(cursor.fetchall())
+    
+    def get_user_details(self, user_id):
+        """اطلاعات کامل یک کاربر برای پنل ادمین"""
         cursor = self.conn.cursor()
         cursor.execute('''
             SELECT user_id, language, full_name, email, phone, wallet_address, balance, registered_at 
             FROM users 
-            ORDER BY registered_at DESC 
-            LIMIT ? OFFSET ?
-        ''', (limit, offset))
-        return cursor.fetchall()
+            WHERE user_id = ?
+        ''', (user_id,))
+        return cursor.fetchone()
+    
+    def get_all_user_ids(self):
+        """کاربرانی که هنوز به بات دسترسی دارند (بات را مسدود نکرده‌اند)"""
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT user_id FROM users WHERE is_active = 1')
+        return [row[0] for row in cursor.fetchall()]
+    
+    def set_users_active(self, user_ids, active=True):
+        """علامت‌گذاری دسته‌ای کاربران فعال/غیرفعال؛ تعداد ردیف‌های تغییرکرده را برمی‌گرداند"""
+        cursor = self.conn.cursor()
+        value = 1 if active else 0
+        cursor.executemany(
+            'UPDATE users SET is_active = ? WHERE user_id = ? AND is_active IS NOT ?',
+            [(value, user_id, value) for user_id in user_ids]
+        )
+        self.conn.commit()
+        return cursor.rowcount
+    
+    def get_all_users(self, limit=100):
+        """جدیدترین کاربران (صفحه اول get_users_page)"""
+        return self.get_users_page(limit)
+    
+    def get_users_page(self, limit=6, anchor_id=None, direction='next'):
+        """
+        صفحه‌بندی keyset کاربران به ترتیب جدیدترین؛ هزینه هر صفحه به شماره صفحه بستگی ندارد.
+        anchor_id برای 'next' آخرین کاربر صفحه فعلی و برای 'prev' اولین کاربر آن است.
+        """
+        cursor = self.conn.cursor()
+        
+        if anchor_id is None:
+            cursor.execute('''
+                SELECT user_id, language, full_name, email, phone, wallet_address, balance, registered_at 
+                FROM users 
+                ORDER BY registered_at DESC, user_id DESC 
+                LIMIT ?
+            ''', (limit,))
+            return cursor.fetchall()
+        
+        if direction == 'next':
+            cursor.execute('''
+                SELECT user_id, language, full_name, email, phone, wallet_address, balance, registered_at 
+                FROM users 
+                WHERE (registered_at, user_id) < (SELECT registered_at, user_id FROM users WHERE user_id = ?)
+                ORDER BY registered_at DESC, user_id DESC 
+                LIMIT ?
+            ''', (anchor_id, limit))
+            return cursor.fetchall()
+        
+        # صفحه قبل: به ترتیب صعودی می‌خوانیم و برعکس برمی‌گردانیم
+        cursor.execute('''
+            SELECT user_id, language, full_name, email, phone, wallet_address, balance, registered_at 
+            FROM users 
+            WHERE (registered_at, user_id) > (SELECT registered_at, user_id FROM users WHERE user_id = ?)
+            ORDER BY registered_at ASC, user_id ASC 
+            LIMIT ?
+        ''', (anchor_id, limit))
+        return cursor.fetchall()[::-1]
     
     def get_users_count(self):
+        """تعداد کاربران از شمارنده‌ای که triggerها نگه می‌دارند (بدون اسکن جدول)"""
         cursor = self.conn.cursor()
-        cursor.execute('SELECT COUNT(*) FROM users')
-        return cursor.fetchone()[0]
+        cursor.execute("SELECT value FROM counters WHERE name = 'users'")
+        result = cursor.fetchone()
+        return result[0] if result else 0
+    
+    def _fts_enabled(self):
+        """آیا جدول users_fts ساخته شده است (sqlite با FTS5)"""
+        if self._has_fts is None:
+            cursor = self.conn.cursor()
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'users_fts'")
+            self._has_fts = cursor.fetchone() is not None
+        return self._has_fts
     
-    def search_users(self, search_term):
+    def search_users(self, search_term, limit=50):
+        """
+        جستجو در نام، ایمیل، تلفن و کیف پول.
+        با FTS5 بر اساس ابتدای کلمات و مرتب‌شده با bm25؛ اگر FTS5 نباشد با LIKE.
+        """
         cursor = self.conn.cursor()
+        match = fts_match_query(search_term)
+        
+        if match and self._fts_enabled():
+            cursor.execute('''
+                SELECT u.user_id, u.full_name, u.email, u.phone, u.wallet_address, u.registered_at 
+                FROM users_fts 
+                JOIN users u ON u.user_id = users_fts.rowid 
+                WHERE users_fts MATCH ? 
+                ORDER BY rank 
+                LIMIT ?
+            ''', (match, limit))
+            return cursor.fetchall()
+        
         cursor.execute('''
             SELECT user_id, full_name, email, phone, wallet_address, registered_at 
             FROM users 
             WHERE full_name LIKE ? OR email LIKE ? OR phone LIKE ? OR wallet_address LIKE ?
-            LIMIT 50
-        ''', (f'%{search_term}%', f'%{search_term}%', f'%{search_term}%', f'%{search_term}%'))
+            LIMIT ?
+        ''', (f'%{search_term}%', f'%{search_term}%', f'%{search_term}%', f'%{search_term}%', limit))
         return cursor.fetchall()
     
+    def search_users_basic(self, search_term, limit=20):
+        """جستجوی ادمین: با شناسه اگر عدد باشد، وگرنه در نام و ایمیل"""
+        cursor = self.conn.cursor()
+        
+        if search_term.isdigit():
+            cursor.execute('''
+                SELECT user_id, full_name, email, registered_at 
+                FROM users 
+                WHERE user_id = ?
+            ''', (int(search_term),))
+        else:
+            match = fts_match_query(search_term, columns=('full_name', 'email'))
+            
+            if match and self._fts_enabled():
+                cursor.execute('''
+                    SELECT u.user_id, u.full_name, u.email, u.registered_at 
+                    FROM users_fts 
+                    JOIN users u ON u.user_id = users_fts.rowid 
+                    WHERE users_fts MATCH ? 
+                    ORDER BY rank 
+                    LIMIT ?
+                ''', (match, limit))
+            else:
+                cursor.execute('''
+                    SELECT user_id, full_name, email, registered_at 
+                    FROM users 
+                    WHERE full_name LIKE ? OR email LIKE ?
+                    LIMIT ?
+                ''', (f'%{search_term}%', f'%{search_term}%', limit))
+        
+        return cursor.fetchall()
+    
+    def get_wallet_overview(self, limit=10):
+        """تعداد کل کاربران، تعداد دارای کیف پول و چند نمونه از کیف پول‌ها"""
+        cursor = self.conn.cursor()
+        
+        cursor.execute("SELECT COUNT(*) FROM users WHERE wallet_address IS NOT NULL AND wallet_address != ''")
+        with_wallet = cursor.fetchone()[0]
+        
+        cursor.execute("SELECT COUNT(*) FROM users")
+        total_users = cursor.fetchone()[0]
+        
+        cursor.execute('''
+            SELECT user_id, full_name, wallet_address 
+            FROM users 
+            WHERE wallet_address IS NOT NULL AND wallet_address != ''
+            LIMIT ?
+        ''', (limit,))
+        
+        return total_users, with_wallet, cursor.fetchall()
+    
     # ===== توابع سرمایه‌گذاری =====
     
     def create_investment(self, user_id, package, amount, duration, monthly_profit_percent, 
@@ -268,6 +395,34 @@ class Database:
         self.conn.commit()
         return cursor.lastrowid
     
+    def create_pending_investment(self, user_id, package, amount, monthly_profit_percent,
+                                  transaction_receipt, receipt_type):
+        """ثبت درخواست سرمایه‌گذاری نامحدود (duration=999) در انتظار تایید"""
+        cursor = self.conn.cursor()
+        
+        start_date = datetime.now()
+        end_date = start_date + timedelta(days=365*10)
+        
+        cursor.execute('''
+            INSERT INTO investments 
+            (user_id, package, amount, duration, start_date, end_date, status, monthly_profit_percent, transaction_receipt, receipt_type)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            user_id,
+            package,
+            amount,
+            999,
+            start_date.strftime('%Y-%m-%d %H:%M:%S'),
+            end_date.strftime('%Y-%m-%d %H:%M:%S'),
+            'pending',
+            monthly_profit_percent,
+            transaction_receipt,
+            receipt_type
+        ))
+        
+        self.conn.commit()
+        return cursor.lastrowid
+    
     def get_user_investments(self, user_id, limit=20):
         cursor = self.conn.cursor()
         cursor.execute('''
@@ -280,6 +435,28 @@ class Database:
         ''', (user_id, limit))
         return cursor.fetchall()
     
+    def get_user_recent_investments(self, user_id, limit=10):
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT investment_id, package, amount, start_date, status, monthly_profit_percent
+            FROM investments 
+            WHERE user_id = ?
+            ORDER BY start_date DESC
+            LIMIT ?
+        ''', (user_id, limit))
+        return cursor.fetchall()
+    
+    def get_user_portfolio(self, user_id):
+        """تعداد، مجموع مبلغ و سود ماهانه سرمایه‌گذاری‌های فعال کاربر در یک کوئری"""
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT COUNT(*), SUM(amount), SUM(amount * monthly_profit_percent / 100)
+            FROM investments 
+            WHERE user_id = ? AND status = 'active'
+        ''', (user_id,))
+        count, total, monthly_profit = cursor.fetchone()
+        return count or 0, total or 0, monthly_profit or 0
+    
     def get_investment(self, investment_id):
         cursor = self.conn.cursor()
         cursor.execute('''
@@ -310,6 +487,63 @@ class Database:
         self.conn.commit()
         return cursor.rowcount > 0
     
+    def _investment_status(self, investment_id):
+        """وضعیت فعلی یک سرمایه‌گذاری (None اگر وجود نداشته باشد)"""
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT status FROM investments WHERE investment_id = ?", (investment_id,))
+        result = cursor.fetchone()
+        return result[0] if result else None
+    
+    def activate_investment(self, investment_id):
+        """
+        تایید سرمایه‌گذاری در انتظار توسط ادمین؛ اطلاعات لازم برای اطلاع‌رسانی به کاربر را برمی‌گرداند.
+        اگر قبلاً تایید یا رد شده باشد وضعیت فعلی (str) و اگر وجود نداشته باشد None.
+        """
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            UPDATE investments 
+            SET status = 'active', start_date = CURRENT_TIMESTAMP
+            WHERE investment_id = ? AND status = 'pending'
+        ''', (investment_id,))
+        if cursor.rowcount == 0:
+            return self._investment_status(investment_id)
+        
+        cursor.execute('''
+            SELECT i.user_id, i.amount, i.monthly_profit_percent, u.full_name, u.wallet_address, u.language
+            FROM investments i
+            JOIN users u ON i.user_id = u.user_id
+            WHERE i.investment_id = ?
+        ''', (investment_id,))
+        
+        invest_data = cursor.fetchone()
+        self.conn.commit()
+        return invest_data
+    
+    def reject_investment(self, investment_id):
+        """
+        رد سرمایه‌گذاری در انتظار توسط ادمین؛ اطلاعات لازم برای اطلاع‌رسانی به کاربر را برمی‌گرداند.
+        اگر قبلاً تایید یا رد شده باشد وضعیت فعلی (str) و اگر وجود نداشته باشد None.
+        """
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            UPDATE investments 
+            SET status = 'rejected'
+            WHERE investment_id = ? AND status = 'pending'
+        ''', (investment_id,))
+        if cursor.rowcount == 0:
+            return self._investment_status(investment_id)
+        
+        cursor.execute('''
+            SELECT i.user_id, i.amount, u.full_name, u.language
+            FROM investments i
+            JOIN users u ON i.user_id = u.user_id
+            WHERE i.investment_id = ?
+        ''', (investment_id,))
+        
+        invest_data = cursor.fetchone()
+        self.conn.commit()
+        return invest_data
+    
     def get_active_investments(self):
         cursor = self.conn.cursor()
         cursor.execute('''
@@ -349,6 +583,26 @@ class Database:
         result = cursor.fetchone()[0]
         return result if result else 0
     
+    def get_investment_overview(self, limit=10):
+        """آمار کلی سرمایه‌گذاری‌ها و آخرین سرمایه‌گذاری‌های فعال برای پنل ادمین"""
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM investments")
+        total_investments = cursor.fetchone()[0] or 0
+        
+        cursor.execute("SELECT SUM(amount) FROM investments WHERE status = 'active'")
+        total_active_amount = cursor.fetchone()[0] or 0
+        
+        cursor.execute('''
+            SELECT i.amount, i.package, u.full_name, i.start_date
+            FROM investments i
+            JOIN users u ON i.user_id = u.user_id
+            WHERE i.status = 'active'
+            ORDER BY i.start_date DESC
+            LIMIT ?
+        ''', (limit,))
+        
+        return total_investments, total_active_amount, cursor.fetchall()
+    
     def get_user_total_investment(self, user_id, status='active'):
         cursor = self.conn.cursor()
         cursor.execute('''
@@ -391,10 +645,17 @@ class Database:
         ''', (user_id, limit))
         return cursor.fetchall()
     
+    def get_user_tickets_count(self, user_id):
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT COUNT(*) FROM tickets WHERE user_id = ?', (user_id,))
+        return cursor.fetchone()[0] or 0
+    
     def get_ticket(self, ticket_id):
+        # ستون‌ها صریح انتخاب می‌شوند؛ t.* ستون‌های priority/category/responded_by را هم می‌آورد و unpack هندلرها را می‌شکند
         cursor = self.conn.cursor()
         cursor.execute('''
-            SELECT t.*, u.full_name, u.email
+            SELECT t.ticket_id, t.user_id, t.subject, t.message, t.status, t.created_at,
+                   t.admin_response, t.responded_at, u.full_name, u.email
             FROM tickets t
             JOIN users u ON t.user_id = u.user_id
             WHERE t.ticket_id = ?
@@ -614,7 +875,7 @@ class Database:
         cursor.execute("SELECT SUM(amount) FROM investments WHERE status = 'active'")
         stats['total_active_amount'] = cursor.fetchone()[0] or 0
         
-        cursor.execute("SELECT SUM(amount) FROM investments WHERE DATE(created_at) = DATE('now')")
+        cursor.execute("SELECT SUM(amount) FROM investments WHERE DATE(start_date) = DATE('now')")
         stats['today_investments'] = cursor.fetchone()[0] or 0
         
         cursor.execute("SELECT SUM(amount * monthly_profit_percent / 100) FROM investments WHERE status = 'active'")
@@ -645,20 +906,8 @@ class Database:
     # ===== توابع رفرال (جدید) =====
     
     def generate_referral_code(self, user_id: int) -> str:
-        """تولید کد رفرال یکتا برای کاربر"""
-        # ترکیبی از user_id و کاراکترهای تصادفی
-        random_part = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
-        code = f"RAMO{user_id}{random_part}"
-        
-        # اطمینان از یکتا بودن
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT user_id FROM users WHERE referral_code = ?", (code,))
-        while cursor.fetchone():
-            random_part = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
-            code = f"RAMO{user_id}{random_part}"
-            cursor.execute("SELECT user_id FROM users WHERE referral_code = ?", (code,))
-        
-        return code
+        """کد رفرال امضاشده کاربر (شناسه داخل کد است، پس همیشه یکتاست)"""
+        return make_referral_code(user_id)
 
     def set_user_referral_code(self, user_id: int, code: str = None):
         """تنظیم کد رفرال برای کاربر"""
@@ -671,21 +920,33 @@ class Database:
         return code
 
     def get_user_referral_code(self, user_id: int) -> str:
-        """دریافت کد رفرال کاربر"""
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT referral_code FROM users WHERE user_id = ?", (user_id,))
-        result = cursor.fetchone()
-        
-        if result and result[0]:
-            return result[0]
-        else:
-            # اگر کد نداشت، براش بساز
-            return self.set_user_referral_code(user_id)
+        """دریافت کد رفرال کاربر (فقط محاسبه؛ نه خواندن و نه نوشتن در دیتابیس)"""
+        return make_referral_code(user_id)
 
+    def get_referral_overview(self):
+        """تعداد کل کاربران، کاربران دارای کد رفرال و رفرال‌های ثبت شده"""
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT 
+                (SELECT COUNT(*) FROM users),
+                (SELECT COUNT(*) FROM users WHERE referral_code IS NOT NULL),
+                (SELECT COUNT(*) FROM referrals)
+        ''')
+        return cursor.fetchone()
+    
     def get_user_by_referral_code(self, code: str):
-        """یافتن کاربر بر اساس کد رفرال"""
+        """یافتن کاربر بر اساس کد رفرال؛ کدهای جدید بدون دیتابیس، کدهای قدیمی RAMO با جستجو"""
+        user_id = decode_referral_code(code)
+        if user_id is not None:
+            return user_id
+        
         cursor = self.conn.cursor()
-        cursor.execute("SELECT user_id FROM users WHERE referral_code = ?", (code,))
+        cursor.execute('''
+            SELECT user_id FROM users WHERE referral_code = ?
+            UNION ALL
+            SELECT user_id FROM legacy_referral_codes WHERE code = ?
+            LIMIT 1
+        ''', (code, code))
         result = cursor.fetchone()
         return result[0] if result else None
 
@@ -703,9 +964,7 @@ class Database:
             VALUES (?, ?, 'completed')
         ''', (referrer_id, referred_id))
         
-        self.conn.commit()
-        
-        # به‌روزرسانی کاربر دعوت‌شده
+        # به‌روزرسانی کاربر دعوت‌شده در همان تراکنش (تکرار بعد از قفل از اول شروع می‌شود)
         cursor.execute("UPDATE users SET referred_by = ? WHERE user_id = ?", (referrer_id, referred_id))
         self.conn.commit()
         
@@ -752,6 +1011,271 @@ class Database:
             'total_invested': total_invested
         }
     
+    # ===== توابع اطلاعیه همگانی =====
+    
+    def create_broadcast(self, admin_id, from_chat_id, message_id, language='fa'):
+        """ثبت اطلاعیه و همه گیرندگان آن در یک تراکنش؛ (شناسه، تعداد گیرندگان) را برمی‌گرداند"""
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            INSERT INTO broadcasts (admin_id, from_chat_id, message_id, language)
+            VALUES (?, ?, ?, ?)
+        ''', (admin_id, from_chat_id, message_id, language))
+        broadcast_id = cursor.lastrowid
+        
+        # کاربرانی که بات را مسدود کرده‌اند یا حسابشان حذف شده کنار گذاشته می‌شوند
+        cursor.execute('''
+            INSERT INTO broadcast_recipients (broadcast_id, user_id)
+            SELECT ?, user_id FROM users WHERE is_active = 1
+        ''', (broadcast_id,))
+        total = cursor.rowcount
+        
+        cursor.execute("UPDATE broadcasts SET total = ? WHERE broadcast_id = ?", (total, broadcast_id))
+        self.conn.commit()
+        return broadcast_id, total
+    
+    def get_broadcast(self, broadcast_id):
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT broadcast_id, admin_id, from_chat_id, message_id, language, status,
+                   total, sent, failed, progress_message_id, created_at, finished_at
+            FROM broadcasts
+            WHERE broadcast_id = ?
+        ''', (broadcast_id,))
+        return cursor.fetchone()
+    
+    def get_running_broadcasts(self):
+        """اطلاعیه‌هایی که تمام نشده‌اند (برای ادامه بعد از ری‌استارت)"""
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT broadcast_id FROM broadcasts WHERE status = 'running' ORDER BY broadcast_id")
+        return [row[0] for row in cursor.fetchall()]
+    
+    def get_broadcast_pending(self, broadcast_id, after_user_id=0, limit=500):
+        """دسته بعدی گیرندگانی که هنوز پیام را نگرفته‌اند"""
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT user_id FROM broadcast_recipients
+            WHERE broadcast_id = ? AND status = 'pending' AND user_id > ?
+            ORDER BY user_id
+            LIMIT ?
+        ''', (broadcast_id, after_user_id, limit))
+        return [row[0] for row in cursor.fetchall()]
+    
+    def set_broadcast_progress_message(self, broadcast_id, message_id):
+        cursor = self.conn.cursor()
+        cursor.execute("UPDATE broadcasts SET progress_message_id = ? WHERE broadcast_id = ?", (message_id, broadcast_id))
+        self.conn.commit()
+    
+    def record_broadcast_results(self, broadcast_id, results):
+        """ذخیره دسته‌ای نتیجه ارسال: results لیست (user_id، وضعیت، تعداد تلاش، خطا)"""
+        if not results:
+            return
+        
+        cursor = self.conn.cursor()
+        cursor.executemany('''
+            UPDATE broadcast_recipients
+            SET status = ?, attempts = ?, error = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE broadcast_id = ? AND user_id = ?
+        ''', [(status, attempts, error, broadcast_id, user_id) for user_id, status, attempts, error in results])
+        
+        sent = sum(1 for _, status, _, _ in results if status in ('sent', 'retried'))
+        cursor.execute('''
+            UPDATE broadcasts SET sent = sent + ?, failed = failed + ?
+            WHERE broadcast_id = ?
+        ''', (sent, len(results) - sent, broadcast_id))
+        self.conn.commit()
+    
+    def get_broadcast_breakdown(self, broadcast_id):
+        """تعداد گیرندگان به تفکیک وضعیت (sent، retried، blocked، not_found، failed، pending)"""
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT status, COUNT(*) FROM broadcast_recipients
+            WHERE broadcast_id = ?
+            GROUP BY status
+        ''', (broadcast_id,))
+        return dict(cursor.fetchall())
+    
+    def get_recent_broadcasts(self, limit=10):
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT broadcast_id, status, total, sent, failed, created_at
+            FROM broadcasts
+            ORDER BY broadcast_id DESC
+            LIMIT ?
+        ''', (limit,))
+        return cursor.fetchall()
+    
+    def retry_failed_broadcast(self, broadcast_id):
+        """برگرداندن گیرندگان با خطای موقت به صف؛ مسدودشده‌ها و چت‌های ناموجود دوباره ارسال نمی‌شوند"""
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            UPDATE broadcast_recipients SET status = 'pending', error = NULL
+            WHERE broadcast_id = ? AND status = 'failed'
+        ''', (broadcast_id,))
+        count = cursor.rowcount
+        
+        if count:
+            cursor.execute('''
+                UPDATE broadcasts SET status = 'running', failed = failed - ?, finished_at = NULL
+                WHERE broadcast_id = ?
+            ''', (count, broadcast_id))
+        self.conn.commit()
+        return count
+    
+    def finish_broadcast(self, broadcast_id, status='completed'):
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            UPDATE broadcasts SET status = ?, finished_at = CURRENT_TIMESTAMP
+            WHERE broadcast_id = ?
+        ''', (status, broadcast_id))
+        self.conn.commit()
+    
+    # ===== صف پیام‌های خروجی (outbox) =====
+    
+    def enqueue_outbox(self, messages):
+        """
+        ثبت دسته‌ای پیام‌ها در یک تراکنش
+        messages: لیست (chat_id، method، payload json، اولویت، زمان ارسال)؛ زمان ارسال ۰ یعنی فوری
+        """
+        cursor = self.conn.cursor()
+        ids = []
+        for chat_id, method, payload, priority, send_at in messages:
+            cursor.execute('''
+                INSERT INTO outbox (chat_id, method, payload, priority, next_attempt_at)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (chat_id, method, payload, priority, send_at))
+            ids.append(cursor.lastrowid)
+        self.conn.commit()
+        return ids
+    
+    def claim_outbox(self, limit=50, now=None):
+        """
+        برداشتن پیام‌های آماده ارسال و علامت sending روی آن‌ها.
+        از هر چت فقط قدیمی‌ترین پیام باز برداشته می‌شود تا ترتیب پیام‌های هر چت حفظ شود.
+        """
+        now = time.time() if now is None else now
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT o.outbox_id, o.chat_id, o.method, o.payload, o.attempts
+            FROM outbox o
+            WHERE o.status = 'pending' AND o.next_attempt_at <= ?
+              AND NOT EXISTS (
+                  SELECT 1 FROM outbox p
+                  WHERE p.chat_id = o.chat_id AND p.outbox_id < o.outbox_id
+                    AND p.status IN ('pending', 'sending')
+              )
+            ORDER BY o.priority, o.outbox_id
+            LIMIT ?
+        ''', (now, limit))
+        
+        claimed = []
+        for row in cursor.fetchall():
+            # پردازه دیگری ممکن است همین پیام را برداشته باشد
+            cursor.execute("UPDATE outbox SET status = 'sending' WHERE outbox_id = ? AND status = 'pending'", (row[0],))
+            if cursor.rowcount:
+                claimed.append(row)
+        self.conn.commit()
+        return claimed
+    
+    def complete_outbox(self, outbox_ids):
+        cursor = self.conn.cursor()
+        cursor.executemany('''
+            UPDATE outbox SET status = 'sent', sent_at = CURRENT_TIMESTAMP
+            WHERE outbox_id = ?
+        ''', [(outbox_id,) for outbox_id in outbox_ids])
+        self.conn.commit()
+    
+    def reschedule_outbox(self, outbox_id, attempts, next_attempt_at, error):
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            UPDATE outbox SET status = 'pending', attempts = ?, next_attempt_at = ?, last_error = ?
+            WHERE outbox_id = ?
+        ''', (attempts, next_attempt_at, error, outbox_id))
+        self.conn.commit()
+    
+    def dead_letter_outbox(self, outbox_id, attempts, error):
+        """پیامی که دیگر تلاش نمی‌شود (برای بررسی دستی نگه داشته می‌شود)"""
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            UPDATE outbox SET status = 'dead', attempts = ?, last_error = ?
+            WHERE outbox_id = ?
+        ''', (attempts, error, outbox_id))
+        self.conn.commit()
+    
+    def cancel_outbox(self, outbox_ids):
+        """لغو پیام‌هایی که هنوز ارسال نشده‌اند؛ تعداد لغوشده‌ها را برمی‌گرداند"""
+        cursor = self.conn.cursor()
+        cursor.executemany(
+            "UPDATE outbox SET status = 'cancelled' WHERE outbox_id = ? AND status = 'pending'",
+            [(outbox_id,) for outbox_id in outbox_ids]
+        )
+        self.conn.commit()
+        return cursor.rowcount
+    
+    def recover_outbox(self):
+        """پیام‌هایی که هنگام خاموش شدن در حال ارسال بودند دوباره در صف قرار می‌گیرند"""
+        cursor = self.conn.cursor()
+        cursor.execute("UPDATE outbox SET status = 'pending' WHERE status = 'sending'")
+        self.conn.commit()
+        return cursor.rowcount
+    
+    def purge_outbox(self, days=7):
+        """حذف پیام‌های ارسال‌شده و لغوشده قدیمی"""
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            DELETE FROM outbox
+            WHERE status IN ('sent', 'cancelled') AND COALESCE(sent_at, created_at) < datetime('now', ?)
+        ''', (f'-{int(days)} days',))
+        self.conn.commit()
+        return cursor.rowcount
+    
+    def get_outbox_stats(self):
+        """تعداد پیام‌های صف به تفکیک وضعیت"""
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status")
+        return dict(cursor.fetchall())
+    
+    # ===== وضعیت FSM =====
+    
+    def get_fsm_record(self, storage_key):
+        """(state، data به صورت JSON، زمان آخرین تغییر) یا None"""
+        cursor = self.conn.cursor()
+        cursor.execute(
+            'SELECT state, data, updated_at FROM fsm_states WHERE storage_key = ?',
+            (storage_key,)
+        )
+        return cursor.fetchone()
+    
+    def save_fsm_records(self, records, deleted_keys=()):
+        """
+        ذخیره چند وضعیت در یک تراکنش.
+        records: لیست (storage_key، chat_id، user_id، state، data، updated_at)
+        deleted_keys: کلیدهایی که وضعیت و داده‌شان خالی شده است
+        """
+        cursor = self.conn.cursor()
+        cursor.executemany('''
+            INSERT INTO fsm_states (storage_key, chat_id, user_id, state, data, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(storage_key) DO UPDATE SET
+                state = excluded.state, data = excluded.data, updated_at = excluded.updated_at
+        ''', records)
+        cursor.executemany(
+            'DELETE FROM fsm_states WHERE storage_key = ?',
+            [(storage_key,) for storage_key in deleted_keys]
+        )
+        self.conn.commit()
+    
+    def get_idle_fsm_records(self, before, after=0.0, limit=500):
+        """وضعیت‌هایی که بین after و before تغییر نکرده‌اند، به ترتیب زمان (صفحه‌بندی با after)"""
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT storage_key, chat_id, user_id, state, updated_at
+            FROM fsm_states
+            WHERE updated_at < ? AND updated_at > ?
+            ORDER BY updated_at
+            LIMIT ?
+        ''', (before, after, limit))
+        return cursor.fetchall()
+    
     # ===== توابع عمومی =====
     
     def execute_query(self, query, params=()):
@@ -770,17 +1294,286 @@ class Database:
         cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
         return cursor.fetchall()
     
+    def get_schema_overview(self):
+        """لیست جدول‌ها به همراه ستون‌ها و تعداد رکوردهای هر جدول"""
+        cursor = self.conn.cursor()
+        overview = []
+        
+        for (table_name,) in self.get_all_tables():
+            cursor.execute(f"PRAGMA table_info({table_name})")
+            columns = cursor.fetchall()
+            cursor.execute(f"SELECT COUNT(*) FROM {table_name}")
+            row_count = cursor.fetchone()[0]
+            overview.append((table_name, columns, row_count))
+        
+        return overview
+    
     def backup_database(self, backup_name=None):
         """ایجاد بک‌آپ از دیتابیس"""
-        import shutil
-        import os
-        
         if backup_name is None:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             backup_name = f"finance_bot_backup_{timestamp}.db"
         
-        shutil.copy2("finance_bot.db", backup_name)
+        # در حالت WAL کپی فایل کافی نیست؛ از backup API خود sqlite استفاده می‌کنیم
+        backup_conn = sqlite3.connect(backup_name)
+        try:
+            self.conn.backup(backup_conn)
+        finally:
+            backup_conn.close()
         return backup_name
     
+    def reset(self):
+        """حذف فایل دیتابیس و ساخت مجدد جداول روی همین نمونه"""
+        self.close()
+        self._has_fts = None
+        for path in (self.db_name, self.db_name + '-wal', self.db_name + '-shm'):
+            if os.path.exists(path):
+                os.remove(path)
+        self.conn = self._connect()
+        self.migrate()
+    
     def close(self):
-        self.conn.close()
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+# ===== کش کاربران =====
+
+class UserCache:
+    """
+    کش LRU نتیجه get_user و get_user_language به ازای user_id.
+    هر نوشتن روی ردیف کاربر آن را حذف می‌کند؛ شمارنده version جلوی ذخیره نتیجه
+    خواندنی را می‌گیرد که هم‌زمان با یک نوشتن اجرا شده و ممکن است کهنه باشد.
+    """
+    
+    def __init__(self, max_size=USER_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+    
+    def get(self, user_id, field):
+        """(پیدا شد، مقدار)"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and field in entry:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return True, entry[field]
+            self.misses += 1
+            return False, None
+    
+    def put(self, user_id, field, value, version):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            # بین شروع خواندن و الان چیزی نوشته شده؛ نتیجه را ذخیره نکن
+            if version != self.version:
+                return
+            self._entries.setdefault(user_id, {})[field] = value
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+    
+    def invalidate(self, user_id):
+        with self._lock:
+            self.version += 1
+            self.invalidations += 1
+            self._entries.pop(user_id, None)
+    
+    def clear(self):
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+    
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+
+# ===== لایه async =====
+
+class AsyncDatabase:
+    """
+    نسخه async همه متدهای Database برای handlerها (await db.get_user(...)).
+    نوشتن‌ها به ترتیب روی یک thread اختصاصی و با یک اتصال اجرا می‌شوند،
+    خواندن‌ها به صورت موازی روی چند thread که هرکدام اتصال جداگانه دارند.
+    """
+    
+    # متدهایی که فقط می‌خوانند و می‌توانند هم‌زمان اجرا شوند؛ بقیه روی thread نویسنده می‌روند
+    READ_METHODS = frozenset({
+        'get_user', 'get_user_language', 'get_users_languages', 'get_user_details', 'get_all_user_ids',
+        'get_all_users', 'get_users_page', 'get_users_count', 'search_users', 'search_users_basic',
+        'get_wallet_overview', 'get_user_investments', 'get_user_recent_investments',
+        'get_user_portfolio', 'get_investment', 'get_active_investments',
+        'get_pending_investments', 'get_investments_count', 'get_total_invested_amount',
+        'get_investment_overview', 'get_user_total_investment', 'get_user_monthly_profit',
+        'get_user_tickets', 'get_user_tickets_count', 'get_ticket', 'get_open_tickets',
+        'get_tickets_count', 'get_user_transactions', 'get_pending_profit_payments',
+        'get_user_notifications', 'get_system_logs', 'get_system_statistics',
+        'get_user_by_referral_code', 'get_user_referral_code', 'get_user_referrals', 'get_referral_stats', 'get_referral_overview',
+        'get_broadcast', 'get_running_broadcasts', 'get_broadcast_pending',
+        'get_broadcast_breakdown', 'get_recent_broadcasts', 'get_outbox_stats', 'get_fsm_record', 'get_idle_fsm_records',
+        'get_table_info', 'get_all_tables', 'get_schema_overview', 'get_schema_version',
+    })
+    
+    # خواندن‌هایی که از UserCache جواب داده می‌شوند (تنها آرگومانشان user_id است)
+    CACHED_METHODS = frozenset({'get_user', 'get_user_language'})
+    
+    # نوشتن‌هایی که ردیف users را تغییر می‌دهند: نام متد -> نام آرگومان شناسه کاربر
+    USER_WRITE_METHODS = {
+        'add_user': 'user_id',
+        'update_user_language': 'user_id',
+        'update_user_profile': 'user_id',
+        'update_user_field': 'user_id',
+        'update_user_balance': 'user_id',
+        'delete_user': 'user_id',
+        'set_user_referral_code': 'user_id',
+        'register_referral': 'referred_id',
+        'set_users_active': 'user_ids',  # لیست شناسه‌ها
+    }
+    
+    def __init__(self, db_name=DB_NAME, readers=DB_READERS, profile=None):
+        self.db_name = db_name
+        self._writer = Database(db_name, profile=profile)
+        self._write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+        self._read_executor = ThreadPoolExecutor(max_workers=readers, thread_name_prefix="db-reader")
+        self._local = threading.local()
+        self._readers = []
+        self._readers_lock = threading.Lock()
+        self.user_cache = UserCache()
+        # بعد از reset، اتصال‌های خواننده قدیمی کنار گذاشته می‌شوند
+        self._generation = 0
+    
+    def _reader(self) -> Database:
+        """اتصال خواننده مخصوص thread فعلی"""
+        local = self._local
+        if getattr(local, 'generation', None) != self._generation:
+            local.db = Database(self.db_name, self._writer.cached_statements, init_schema=False,
+                                profile=self._writer.profile)
+            local.generation = self._generation
+            with self._readers_lock:
+                self._readers.append(local.db)
+        return local.db
+    
+    def _close_readers(self):
+        with self._readers_lock:
+            readers, self._readers = self._readers, []
+        for reader in readers:
+            reader.close()
+    
+    async def run_read(self, func, *args, **kwargs):
+        """اجرای تابع func(database, ...) روی یکی از threadهای خواننده"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._read_executor,
+            lambda: run_with_busy_retry(func, self._reader(), *args, **kwargs)
+        )
+    
+    async def run_write(self, func, *args, **kwargs):
+        """اجرای تابع func(database, ...) روی thread نویسنده (به ترتیب)"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._write_executor,
+            functools.partial(run_with_busy_retry, func, self._writer, *args, **kwargs)
+        )
+    
+    def __getattr__(self, name):
+        method = getattr(Database, name, None)
+        if name.startswith('_') or not callable(method):
+            raise AttributeError(name)
+        
+        runner = self.run_read if name in self.READ_METHODS else self.run_write
+        cache = self.user_cache
+        
+        if name in self.CACHED_METHODS:
+            async def call(user_id):
+                found, value = cache.get(user_id, name)
+                if found:
+                    return value
+                version = cache.version
+                value = await runner(method, user_id)
+                cache.put(user_id, name, value, version)
+                return value
+        
+        elif name in self.USER_WRITE_METHODS:
+            param = self.USER_WRITE_METHODS[name]
+            position = method.__code__.co_varnames.index(param) - 1  # بدون self
+            
+            async def call(*args, **kwargs):
+                try:
+                    return await runner(method, *args, **kwargs)
+                finally:
+                    target = kwargs[param] if param in kwargs else args[position]
+                    for user_id in (target if isinstance(target, (list, tuple, set)) else (target,)):
+                        cache.invalidate(user_id)
+        
+        elif name == 'execute_query':
+            # SQL دلخواه ممکن است هر کاربری را تغییر دهد
+            async def call(*args, **kwargs):
+                try:
+                    return await runner(method, *args, **kwargs)
+                finally:
+                    cache.clear()
+        
+        else:
+            async def call(*args, **kwargs):
+                return await runner(method, *args, **kwargs)
+        
+        call.__name__ = name
+        call.__doc__ = method.__doc__
+        # ذخیره تا دفعه بعد __getattr__ صدا زده نشود
+        setattr(self, name, call)
+        return call
+    
+    async def reset(self):
+        """حذف و ساخت مجدد دیتابیس؛ اتصال‌های خواننده دوباره باز می‌شوند"""
+        def _reset(database):
+            self._generation += 1
+            self._close_readers()
+            database.reset()
+        
+        try:
+            await self.run_write(_reset)
+        finally:
+            self.user_cache.clear()
+    
+    def cache_stats(self):
+        """شمارنده‌های کش کاربران (برای /dbinfo)"""
+        return self.user_cache.stats()
+    
+    def close(self):
+        self._write_executor.shutdown(wait=True)
+        self._read_executor.shutdown(wait=True)
+        self._close_readers()
+        self._writer.close()
+
+
+# ===== نمونه مشترک دیتابیس =====
+
+_shared_db = None
+
+def get_db() -> AsyncDatabase:
+    """نمونه مشترک دیتابیس برای کل پردازه (یک بار ساخت جداول، یک نویسنده)"""
+    global _shared_db
+    if _shared_db is None:
+        _shared_db = AsyncDatabase()
+    return _shared_db
+
+def close_db():
+    """بستن نمونه مشترک دیتابیس هنگام خاموش شدن بات"""
+    global _shared_db
+    if _shared_db is not None:
+        _shared_db.close()
+        _shared_db = None
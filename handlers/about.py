@@ -1,19 +1,23 @@
 # handlers/about.py
-from aiogram import F, Router
+from aiogram import Router
 from aiogram.types import Message
 from aiogram.fsm.context import FSMContext
-import asyncio
 
-from database import Database
+from database import get_db
+from keyboards.buttons import Button
+from middlewares.user_context import UserContext
+from utils import outbox
 
 router = Router()
-db = Database()
+db = get_db()
 
-@router.message(F.text.in_(["ℹ️ About", "ℹ️ درباره ما", "ℹ️ من نحن"]))
-async def about_command(message: Message):
+# فاصله ارسال بخش‌های «درباره ما» (ثانیه)
+ABOUT_INTERVAL = 0.5
+
+@router.message(Button('about'))
+async def about_command(message: Message, user_ctx: UserContext):
     """دستور درباره ما"""
-    user_id = message.from_user.id
-    language = db.get_user_language(user_id)
+    language = user_ctx.language
     
     if language == "fa":
         await send_farsi_about(message)
@@ -71,10 +75,7 @@ async def send_farsi_about(message: Message):
     )
     
     await message.answer(about_part1)
-    await asyncio.sleep(0.5)
-    await message.answer(about_part2)
-    await asyncio.sleep(0.5)
-    await message.answer(about_part3)
+    await outbox.send_sequence(message.chat.id, [about_part2, about_part3], ABOUT_INTERVAL)
 
 async def send_english_about(message: Message):
     """ارسال متن درباره ما به انگلیسی"""
@@ -123,10 +124,7 @@ async def send_english_about(message: Message):
     )
     
     await message.answer(about_part1)
-    await asyncio.sleep(0.5)
-    await message.answer(about_part2)
-    await asyncio.sleep(0.5)
-    await message.answer(about_part3)
+    await outbox.send_sequence(message.chat.id, [about_part2, about_part3], ABOUT_INTERVAL)
 
 async def send_arabic_about(message: Message):
     """ارسال متن درباره ما به عربی"""
@@ -175,7 +173,4 @@ async def send_arabic_about(message: Message):
     )
     
     await message.answer(about_part1)
-    await asyncio.sleep(0.5)
-    await message.answer(about_part2)
-    await asyncio.sleep(0.5)
-    await message.answer(about_part3)
+    await outbox.send_sequence(message.chat.id, [about_part2, about_part3], ABOUT_INTERVAL)
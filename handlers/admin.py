@@ -1,16 +1,22 @@
 # handlers/admin.py
-import os
 from datetime import datetime
-from aiogram import F, Router, Bot
+from aiogram import Router, Bot
 from aiogram.filters import Command
 from aiogram.types import Message, ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 
-from database import Database
+from config import is_admin
+from database import get_db
+from keyboards.buttons import Button
+from keyboards.registry import static_keyboard
+from middlewares.user_context import UserContext
+from utils import outbox
+from utils.broadcast import is_broadcast_running, progress_text, start_broadcast
+from utils.deep_commands import DeepCommand, deep_commands
 
 router = Router()
-db = Database()
+db = get_db()
 
 class BroadcastStates(StatesGroup):
     waiting_for_broadcast_message = State()
@@ -22,14 +28,7 @@ class AdminStates(StatesGroup):
     waiting_for_user_search = State()
     viewing_user_details = State()
 
-def is_admin(user_id: int) -> bool:
-    """بررسی اینکه کاربر ادمین هست یا نه"""
-    admin_ids_str = os.getenv("ADMIN_IDS", "")
-    if admin_ids_str:
-        admin_ids = [int(id_str.strip()) for id_str in admin_ids_str.split(",") if id_str.strip()]
-        return user_id in admin_ids
-    return False
-
+@static_keyboard
 def get_admin_keyboard(language='fa'):
     """منوی ادمین - با دکمه تعمیر رفرال"""
     if language == 'fa':
@@ -67,13 +66,11 @@ def get_admin_keyboard(language='fa'):
         )
 
 @router.message(Command("admin"))
-async def admin_panel(message: Message, state: FSMContext):
+async def admin_panel(message: Message, state: FSMContext, user_ctx: UserContext):
     """پنل ادمین"""
     if not is_admin(message.from_user.id):
         # تشخیص زبان کاربر
-        user_id = message.from_user.id
-        user_data = db.get_user(user_id)
-        language = user_data[1] if user_data else 'en'
+        language = user_ctx.language if user_ctx.exists else 'en'
         
         if language == 'fa':
             await message.answer("⛔ دسترسی denied.")
@@ -86,9 +83,7 @@ async def admin_panel(message: Message, state: FSMContext):
     await state.clear()
     
     # تشخیص زبان ادمین
-    user_id = message.from_user.id
-    user_data = db.get_user(user_id)
-    language = user_data[1] if user_data else 'fa'
+    language = user_ctx.language if user_ctx.exists else 'fa'
     
     if language == 'fa':
         await message.answer(
@@ -109,48 +104,29 @@ async def admin_panel(message: Message, state: FSMContext):
             reply_markup=get_admin_keyboard(language)
         )
 
-@router.message(F.text.in_(["👥 مدیریت کاربران", "👥 User Management", "👥 إدارة المستخدمين"]))
-async def admin_users_list(message: Message):
+@router.message(Button('user_management'))
+async def admin_users_list(message: Message, user_ctx: UserContext):
     """لیست کاربران"""
     if not is_admin(message.from_user.id):
         return
     
     # تشخیص زبان ادمین
-    user_id = message.from_user.id
-    user_data = db.get_user(user_id)
-    language = user_data[1] if user_data else 'fa'
+    language = user_ctx.language if user_ctx.exists else 'fa'
     
     # استفاده از تابع show_users_page از user_management.py
     from handlers.user_management import show_users_page
     await show_users_page(message, page=0, language=language, edit_message=False)
 
-@router.message(F.text.in_(["💰 سرمایه‌گذاری‌ها", "💰 Investments", "💰 الاستثمارات"]))
-async def admin_investments(message: Message):
+@router.message(Button('admin_investments'))
+async def admin_investments(message: Message, user_ctx: UserContext):
     """لیست سرمایه‌گذاری‌ها"""
     if not is_admin(message.from_user.id):
         return
     
     # تشخیص زبان ادمین
-    user_id = message.from_user.id
-    user_data = db.get_user(user_id)
-    language = user_data[1] if user_data else 'fa'
-    
-    cursor = db.conn.cursor()
-    cursor.execute("SELECT COUNT(*) FROM investments")
-    total_investments = cursor.fetchone()[0] or 0
-    
-    cursor.execute("SELECT SUM(amount) FROM investments WHERE status = 'active'")
-    total_active_amount = cursor.fetchone()[0] or 0
-    
-    cursor.execute("""
-        SELECT i.amount, i.package, u.full_name, i.start_date
-        FROM investments i
-        JOIN users u ON i.user_id = u.user_id
-        WHERE i.status = 'active'
-        ORDER BY i.start_date DESC
-        LIMIT 10
-    """)
-    recent_investments = cursor.fetchall()
+    language = user_ctx.language if user_ctx.exists else 'fa'
+    
+    total_investments, total_active_amount, recent_investments = await db.get_investment_overview(10)
     
     if language == 'fa':
         investments_list = ""
@@ -196,63 +172,29 @@ async def admin_investments(message: Message):
     
     await message.answer(response)
 
-@router.message(F.text.in_(["📊 آمار کلی", "📊 Statistics", "📊 الإحصائيات"]))
-async def admin_stats(message: Message):
+@router.message(Button('admin_stats'))
+async def admin_stats(message: Message, user_ctx: UserContext):
     """آمار کلی"""
     if not is_admin(message.from_user.id):
         return
     
     # تشخیص زبان ادمین
-    user_id = message.from_user.id
-    user_data = db.get_user(user_id)
-    language = user_data[1] if user_data else 'fa'
-    
-    cursor = db.conn.cursor()
-    
-    # آمار کاربران
-    cursor.execute("SELECT COUNT(*) FROM users")
-    total_users = cursor.fetchone()[0]
-    
-    cursor.execute("SELECT COUNT(*) FROM users WHERE DATE(registered_at) = DATE('now')")
-    today_users = cursor.fetchone()[0]
-    
-    cursor.execute("SELECT COUNT(*) FROM users WHERE DATE(registered_at) >= DATE('now', '-7 days')")
-    weekly_users = cursor.fetchone()[0]
-    
-    cursor.execute("SELECT COUNT(*) FROM users WHERE wallet_address IS NOT NULL AND wallet_address != ''")
-    users_with_wallet = cursor.fetchone()[0]
-    
-    # آمار سرمایه‌گذاری
-    cursor.execute("SELECT COUNT(*) FROM investments")
-    total_investments = cursor.fetchone()[0] or 0
-    
-    cursor.execute("SELECT SUM(amount) FROM investments WHERE status = 'active'")
-    total_active_amount = cursor.fetchone()[0] or 0
-    
-    cursor.execute("SELECT SUM(amount) FROM investments WHERE DATE(start_date) = DATE('now')")
-    today_investments = cursor.fetchone()[0] or 0
-    
-    # محاسبه سود ماهانه کل
-    cursor.execute("""
-        SELECT SUM(amount * monthly_profit_percent / 100) 
-        FROM investments 
-        WHERE status = 'active'
-    """)
-    monthly_profit = cursor.fetchone()[0] or 0
-    
-    # آمار مالی
-    cursor.execute("SELECT SUM(balance) FROM users")
-    total_balance = cursor.fetchone()[0] or 0
-    
-    # آمار تیکت‌ها
-    cursor.execute("SELECT COUNT(*) FROM tickets WHERE status = 'open'")
-    open_tickets = cursor.fetchone()[0] or 0
-    
-    cursor.execute("SELECT COUNT(*) FROM tickets WHERE status = 'answered'")
-    answered_tickets = cursor.fetchone()[0] or 0
-    
-    cursor.execute("SELECT COUNT(*) FROM tickets")
-    total_tickets = cursor.fetchone()[0] or 0
+    language = user_ctx.language if user_ctx.exists else 'fa'
+    
+    stats = await db.get_system_statistics()
+    
+    total_users = stats['total_users']
+    today_users = stats['today_users']
+    weekly_users = stats['weekly_users']
+    users_with_wallet = stats['users_with_wallet']
+    total_investments = stats['total_investments']
+    total_active_amount = stats['total_active_amount']
+    today_investments = stats['today_investments']
+    monthly_profit = stats['monthly_profit']
+    total_balance = stats['total_balance']
+    open_tickets = stats['open_tickets']
+    answered_tickets = stats['answered_tickets']
+    total_tickets = stats['total_tickets']
     
     if language == 'fa':
         stats_text = (
@@ -338,16 +280,14 @@ async def admin_stats(message: Message):
     
     await message.answer(stats_text)
 
-@router.message(F.text.in_(["📢 اطلاع‌رسانی", "📢 Broadcast", "📢 الإذاعة"]))
-async def broadcast_start(message: Message, state: FSMContext):
+@router.message(Button('broadcast'))
+async def broadcast_start(message: Message, state: FSMContext, user_ctx: UserContext):
     """شروع ارسال اطلاعیه به همه"""
     if not is_admin(message.from_user.id):
         return
     
     # تشخیص زبان ادمین
-    user_id = message.from_user.id
-    user_data = db.get_user(user_id)
-    language = user_data[1] if user_data else 'fa'
+    language = user_ctx.language if user_ctx.exists else 'fa'
     
     if language == 'fa':
         await message.answer(
@@ -368,79 +308,177 @@ async def broadcast_start(message: Message, state: FSMContext):
     await state.set_state(BroadcastStates.waiting_for_broadcast_message)
 
 @router.message(BroadcastStates.waiting_for_broadcast_message)
-async def broadcast_send(message: Message, state: FSMContext, bot: Bot):
-    """ارسال اطلاعیه به همه کاربران"""
+async def broadcast_send(message: Message, state: FSMContext, bot: Bot, user_ctx: UserContext):
+    """ثبت اطلاعیه و شروع ارسال در پس‌زمینه (پیشرفت در یک پیام به‌روز می‌شود)"""
     if not is_admin(message.from_user.id):
         return
     
-    cursor = db.conn.cursor()
-    cursor.execute("SELECT user_id FROM users")
-    all_users = cursor.fetchall()
-    
-    total_users = len(all_users)
-    successful = 0
-    failed = 0
-    
     # تشخیص زبان ادمین
-    user_id = message.from_user.id
-    user_data = db.get_user(user_id)
-    language = user_data[1] if user_data else 'fa'
-    
-    if language == 'fa':
-        await message.answer(f"📤 ارسال اطلاعیه به {total_users} کاربر...")
-    elif language == 'ar':
-        await message.answer(f"📤 جاري إرسال الرسالة إلى {total_users} مستخدم...")
-    else:
-        await message.answer(f"📤 Sending broadcast to {total_users} users...")
-    
-    for user in all_users:
-        user_id = user[0]
-        try:
-            await message.copy_to(user_id)
-            successful += 1
-        except Exception:
-            failed += 1
+    user_id = user_ctx.user_id
+    language = user_ctx.language if user_ctx.exists else 'fa'
     
+    broadcast_id, total_users = await db.create_broadcast(user_id, message.chat.id, message.message_id, language)
     await state.clear()
     
     if language == 'fa':
         await message.answer(
-            f"✅ **ارسال اطلاعیه تکمیل شد!**\n\n"
-            f"📤 ارسال شده: {successful}\n"
-            f"❌ ناموفق: {failed}\n"
-            f"👥 کل کاربران: {total_users}",
+            f"📤 ارسال اطلاعیه #{broadcast_id} به {total_users} کاربر شروع شد.\n"
+            "می‌توانید به کار با پنل ادامه دهید.",
             reply_markup=get_admin_keyboard(language)
         )
     elif language == 'ar':
         await message.answer(
-            f"✅ **اكتمل البث!**\n\n"
-            f"📤 تم الإرسال: {successful}\n"
-            f"❌ فشل: {failed}\n"
-            f"👥 إجمالي المستخدمين: {total_users}",
+            f"📤 بدأ إرسال البث #{broadcast_id} إلى {total_users} مستخدم.\n"
+            "يمكنك متابعة استخدام اللوحة.",
             reply_markup=get_admin_keyboard(language)
         )
     else:
         await message.answer(
-            f"✅ **Broadcast completed!**\n\n"
-            f"📤 Sent: {successful}\n"
-            f"❌ Failed: {failed}\n"
-            f"👥 Total Users: {total_users}",
+            f"📤 Broadcast #{broadcast_id} to {total_users} users has started.\n"
+            "You can keep using the panel.",
             reply_markup=get_admin_keyboard(language)
         )
+    
+    progress = await message.answer(progress_text(language, broadcast_id, 0, 0, total_users))
+    await db.set_broadcast_progress_message(broadcast_id, progress.message_id)
+    
+    start_broadcast(bot, broadcast_id, db)
+
+def get_broadcast_status_labels(language='fa'):
+    labels = {
+        'fa': {
+            'sent': "✅ ارسال شده", 'retried': "🔁 ارسال با تکرار", 'blocked': "🚫 مسدود کرده",
+            'not_found': "👻 حساب ناموجود", 'failed': "❌ خطای موقت", 'pending': "⏳ در صف",
+        },
+        'ar': {
+            'sent': "✅ تم الإرسال", 'retried': "🔁 أُرسل بعد إعادة", 'blocked': "🚫 حظر البوت",
+            'not_found': "👻 حساب غير موجود", 'failed': "❌ خطأ مؤقت", 'pending': "⏳ في الانتظار",
+        },
+        'en': {
+            'sent': "✅ Sent", 'retried': "🔁 Sent after retry", 'blocked': "🚫 Blocked the bot",
+            'not_found': "👻 Chat not found", 'failed': "❌ Temporary error", 'pending': "⏳ Pending",
+        },
+    }
+    return labels.get(language, labels['en'])
+
+@router.message(Command("broadcasts"))
+async def broadcast_list(message: Message, user_ctx: UserContext):
+    """آخرین اطلاعیه‌ها با دستور گزارش هرکدام"""
+    if not is_admin(message.from_user.id):
+        return
+    
+    language = user_ctx.language if user_ctx.exists else 'fa'
+    
+    broadcasts = await db.get_recent_broadcasts(10)
+    if not broadcasts:
+        if language == 'fa':
+            await message.answer("📭 هنوز اطلاعیه‌ای ارسال نشده است.")
+        elif language == 'ar':
+            await message.answer("📭 لم يتم إرسال أي بث بعد.")
+        else:
+            await message.answer("📭 No broadcasts yet.")
+        return
+    
+    if language == 'fa':
+        text = "📢 **آخرین اطلاعیه‌ها**\n\n"
+    elif language == 'ar':
+        text = "📢 **آخر عمليات البث**\n\n"
+    else:
+        text = "📢 **Recent broadcasts**\n\n"
+    
+    for broadcast_id, status, total, sent, failed, created_at in broadcasts:
+        icon = "⏳" if status == 'running' else "✅"
+        text += f"{icon} #{broadcast_id} | {created_at[:16]} | {sent}/{total} (❌ {failed})\n"
+        text += f"   📊 /broadcast_report_{broadcast_id}\n"
+    
+    await message.answer(text)
+
+@deep_commands.verb('broadcast_report')
+async def broadcast_report(message: Message, deep_command: DeepCommand, user_ctx: UserContext):
+    """گزارش یک اطلاعیه به تفکیک وضعیت گیرندگان"""
+    broadcast_id = deep_command.id
+    language = user_ctx.language if user_ctx.exists else 'fa'
+    
+    broadcast = await db.get_broadcast(broadcast_id)
+    if not broadcast:
+        if language == 'fa':
+            await message.answer("❌ اطلاعیه یافت نشد.")
+        elif language == 'ar':
+            await message.answer("❌ لم يتم العثور على البث.")
+        else:
+            await message.answer("❌ Broadcast not found.")
+        return
+    
+    status, total, created_at, finished_at = broadcast[5], broadcast[6], broadcast[10], broadcast[11]
+    breakdown = await db.get_broadcast_breakdown(broadcast_id)
+    labels = get_broadcast_status_labels(language)
+    
+    if language == 'fa':
+        text = f"📊 **گزارش اطلاعیه #{broadcast_id}**\n\n👥 کل گیرندگان: {total}\n📅 شروع: {created_at[:16]}\n"
+        if finished_at:
+            text += f"🏁 پایان: {finished_at[:16]}\n"
+    elif language == 'ar':
+        text = f"📊 **تقرير البث #{broadcast_id}**\n\n👥 إجمالي المستلمين: {total}\n📅 البداية: {created_at[:16]}\n"
+        if finished_at:
+            text += f"🏁 النهاية: {finished_at[:16]}\n"
+    else:
+        text = f"📊 **Broadcast #{broadcast_id} report**\n\n👥 Recipients: {total}\n📅 Started: {created_at[:16]}\n"
+        if finished_at:
+            text += f"🏁 Finished: {finished_at[:16]}\n"
+    
+    text += "\n"
+    for key, label in labels.items():
+        if breakdown.get(key):
+            text += f"{label}: {breakdown[key]}\n"
+    
+    if breakdown.get('failed') and status != 'running':
+        if language == 'fa':
+            text += f"\n🔁 ارسال دوباره فقط ناموفق‌ها: /broadcast_retry_{broadcast_id}"
+        elif language == 'ar':
+            text += f"\n🔁 إعادة الإرسال للفاشلة فقط: /broadcast_retry_{broadcast_id}"
+        else:
+            text += f"\n🔁 Retry failed only: /broadcast_retry_{broadcast_id}"
+    
+    await message.answer(text)
+
+@deep_commands.verb('broadcast_retry')
+async def broadcast_retry(message: Message, bot: Bot, deep_command: DeepCommand, user_ctx: UserContext):
+    """ارسال دوباره اطلاعیه فقط به گیرندگانی که با خطای موقت ناموفق بودند"""
+    broadcast_id = deep_command.id
+    language = user_ctx.language if user_ctx.exists else 'fa'
+    
+    if is_broadcast_running(broadcast_id):
+        if language == 'fa':
+            await message.answer("⏳ این اطلاعیه هنوز در حال ارسال است.")
+        elif language == 'ar':
+            await message.answer("⏳ هذا البث لا يزال قيد الإرسال.")
+        else:
+            await message.answer("⏳ This broadcast is still running.")
+        return
+    
+    count = await db.retry_failed_broadcast(broadcast_id)
+    if count:
+        start_broadcast(bot, broadcast_id, db)
+    
+    if language == 'fa':
+        await message.answer(f"🔁 ارسال دوباره به {count} گیرنده شروع شد.")
+    elif language == 'ar':
+        await message.answer(f"🔁 بدأت إعادة الإرسال إلى {count} مستلم.")
+    else:
+        await message.answer(f"🔁 Retrying {count} recipients.")
 
-@router.message(F.text.in_(["🎫 تیکت‌ها", "🎫 Tickets", "🎫 التذاكر"]))
-async def admin_tickets_menu(message: Message):
+@router.message(Button('admin_tickets'))
+async def admin_tickets_menu(message: Message, user_ctx: UserContext):
     """منوی تیکت‌های ادمین"""
     if not is_admin(message.from_user.id):
         return
     
     # تشخیص زبان ادمین
-    user_id = message.from_user.id
-    user_data = db.get_user(user_id)
-    language = user_data[1] if user_data else 'fa'
+    user_id = user_ctx.user_id
+    language = user_ctx.language if user_ctx.exists else 'fa'
     
     # دریافت تیکت‌های باز
-    open_tickets = db.get_open_tickets()
+    open_tickets = await db.get_open_tickets()
     
     if language == 'fa':
         if open_tickets:
@@ -498,21 +536,17 @@ async def admin_tickets_menu(message: Message):
     
     await message.answer(tickets_text)
 
-@router.message(F.text.regexp(r'^/reply_\d+$'))
-async def reply_to_ticket_start(message: Message, state: FSMContext):
+@deep_commands.verb('reply')
+async def reply_to_ticket_start(message: Message, state: FSMContext, deep_command: DeepCommand, user_ctx: UserContext):
     """شروع پاسخ به تیکت"""
-    if not is_admin(message.from_user.id):
-        return
-    
-    ticket_id = int(message.text.split('_')[1])
+    ticket_id = deep_command.id
     
-    ticket = db.get_ticket(ticket_id)
+    ticket = await db.get_ticket(ticket_id)
     
     if not ticket:
         # تشخیص زبان ادمین
-        user_id = message.from_user.id
-        user_data = db.get_user(user_id)
-        language = user_data[1] if user_data else 'fa'
+        user_id = user_ctx.user_id
+        language = user_ctx.language if user_ctx.exists else 'fa'
         
         if language == 'fa':
             await message.answer("❌ تیکت یافت نشد.")
@@ -527,8 +561,7 @@ async def reply_to_ticket_start(message: Message, state: FSMContext):
     await state.update_data(ticket_id=ticket_id, user_id=user_id)
     
     # تشخیص زبان ادمین
-    admin_data = db.get_user(message.from_user.id)
-    language = admin_data[1] if admin_data else 'fa'
+    language = user_ctx.language if user_ctx.exists else 'fa'
     
     if language == 'fa':
         await message.answer(
@@ -561,7 +594,7 @@ async def reply_to_ticket_start(message: Message, state: FSMContext):
     await state.set_state(AdminReplyStates.waiting_for_reply)
 
 @router.message(AdminReplyStates.waiting_for_reply)
-async def process_admin_reply(message: Message, state: FSMContext, bot: Bot):
+async def process_admin_reply(message: Message, state: FSMContext, bot: Bot, user_ctx: UserContext):
     """پردازش پاسخ ادمین"""
     if not is_admin(message.from_user.id):
         return
@@ -571,15 +604,15 @@ async def process_admin_reply(message: Message, state: FSMContext, bot: Bot):
     user_id = data.get('user_id')
     
     # به‌روزرسانی تیکت با پاسخ ادمین
-    success = db.update_ticket_response(ticket_id, message.text)
+    success = await db.update_ticket_response(ticket_id, message.text, message.from_user.id)
     
     if success:
         # ارسال پاسخ به کاربر
         try:
-            user_lang = db.get_user_language(user_id)
+            user_lang = await db.get_user_language(user_id)
             
             if user_lang == 'fa':
-                await bot.send_message(
+                await outbox.send_message(
                     user_id,
                     f"📨 **پاسخ به تیکت #{ticket_id}**\n\n"
                     f"👤 **پشتیبانی RAMO FINANCE**\n"
@@ -587,7 +620,7 @@ async def process_admin_reply(message: Message, state: FSMContext, bot: Bot):
                     f"✅ برای مشاهده تیکت کامل: /viewticket_{ticket_id}"
                 )
             elif user_lang == 'ar':
-                await bot.send_message(
+                await outbox.send_message(
                     user_id,
                     f"📨 **الرد على التذكرة #{ticket_id}**\n\n"
                     f"👤 **دعم RAMO FINANCE**\n"
@@ -595,7 +628,7 @@ async def process_admin_reply(message: Message, state: FSMContext, bot: Bot):
                     f"✅ لعرض التذكرة كاملة: /viewticket_{ticket_id}"
                 )
             else:
-                await bot.send_message(
+                await outbox.send_message(
                     user_id,
                     f"📨 **Response to Ticket #{ticket_id}**\n\n"
                     f"👤 **RAMO FINANCE Support**\n"
@@ -606,8 +639,7 @@ async def process_admin_reply(message: Message, state: FSMContext, bot: Bot):
             print(f"❌ Failed to send reply to user {user_id}: {e}")
         
         # تشخیص زبان ادمین برای پیام موفقیت
-        admin_data = db.get_user(message.from_user.id)
-        admin_lang = admin_data[1] if admin_data else 'fa'
+        admin_lang = user_ctx.language if user_ctx.exists else 'fa'
         
         if admin_lang == 'fa':
             await message.answer(f"✅ پاسخ به تیکت #{ticket_id} ارسال شد.")
@@ -616,8 +648,7 @@ async def process_admin_reply(message: Message, state: FSMContext, bot: Bot):
         else:
             await message.answer(f"✅ Response to ticket #{ticket_id} sent.")
     else:
-        admin_data = db.get_user(message.from_user.id)
-        admin_lang = admin_data[1] if admin_data else 'fa'
+        admin_lang = user_ctx.language if user_ctx.exists else 'fa'
         
         if admin_lang == 'fa':
             await message.answer("❌ خطا در ارسال پاسخ.")
@@ -628,16 +659,14 @@ async def process_admin_reply(message: Message, state: FSMContext, bot: Bot):
     
     await state.clear()
 
-@router.message(F.text.in_(["🔍 جستجوی کاربر", "🔍 Search User", "🔍 بحث المستخدم"]))
-async def search_user_menu(message: Message, state: FSMContext):
+@router.message(Button('search_user'))
+async def search_user_menu(message: Message, state: FSMContext, user_ctx: UserContext):
     """منوی جستجوی کاربر"""
     if not is_admin(message.from_user.id):
         return
     
     # تشخیص زبان ادمین
-    user_id = message.from_user.id
-    user_data = db.get_user(user_id)
-    language = user_data[1] if user_data else 'fa'
+    language = user_ctx.language if user_ctx.exists else 'fa'
     
     if language == 'fa':
         await message.answer(
@@ -670,37 +699,19 @@ async def search_user_menu(message: Message, state: FSMContext):
     await state.set_state(AdminStates.waiting_for_user_search)
 
 @router.message(AdminStates.waiting_for_user_search)
-async def search_user_execute(message: Message, state: FSMContext):
+async def search_user_execute(message: Message, state: FSMContext, user_ctx: UserContext):
     """اجرای جستجوی کاربر"""
     if not is_admin(message.from_user.id):
         return
     
     search_term = message.text.strip()
     
-    cursor = db.conn.cursor()
-    
-    # اگر عدد باشد (شناسه کاربر)
-    if search_term.isdigit():
-        cursor.execute("""
-            SELECT user_id, full_name, email, registered_at 
-            FROM users 
-            WHERE user_id = ?
-        """, (int(search_term),))
-    else:
-        # جستجو در نام یا ایمیل
-        cursor.execute("""
-            SELECT user_id, full_name, email, registered_at 
-            FROM users 
-            WHERE full_name LIKE ? OR email LIKE ?
-            LIMIT 20
-        """, (f'%{search_term}%', f'%{search_term}%'))
-    
-    results = cursor.fetchall()
+    # با شناسه اگر عدد باشد، وگرنه در نام یا ایمیل
+    results = await db.search_users_basic(search_term, 20)
     
     # تشخیص زبان ادمین
-    user_id = message.from_user.id
-    user_data = db.get_user(user_id)
-    language = user_data[1] if user_data else 'fa'
+    user_id = user_ctx.user_id
+    language = user_ctx.language if user_ctx.exists else 'fa'
     
     if results:
         if language == 'fa':
@@ -744,7 +755,18 @@ async def search_user_execute(message: Message, state: FSMContext):
     await state.clear()
 
 # ========== دکمه تعمیر رفرال ==========
-@router.message(F.text.in_(["🔧 تعمیر رفرال", "🔧 Fix Referral", "🔧 إصلاح الإحالة"]))
+async def run_schema_migrations():
+    """اجرای migrationهای باقی‌مانده و ساخت گزارش (جایگزین ALTER TABLEهای دستی)"""
+    applied = await db.migrate()
+    version = await db.get_schema_version()
+    
+    report = [f"✅ Migration {v}: {description}" for v, description in applied]
+    if not report:
+        report.append("ℹ️ دیتابیس به‌روز است، مرحله‌ای اجرا نشد")
+    report.append(f"📊 نسخه دیتابیس: {version}")
+    return report
+
+@router.message(Button('fix_referral'))
 async def quick_fix_referral(message: Message):
     """تعمیر سریع دیتابیس رفرال"""
     if not is_admin(message.from_user.id):
@@ -753,78 +775,11 @@ async def quick_fix_referral(message: Message):
     status_msg = await message.answer("🔄 در حال تعمیر دیتابیس رفرال...")
     
     try:
-        cursor = db.conn.cursor()
-        
-        # 1. بررسی و اضافه کردن ستون referral_code
-        try:
-            cursor.execute("ALTER TABLE users ADD COLUMN referral_code TEXT")
-            await message.answer("✅ ستون referral_code اضافه شد")
-        except:
-            await message.answer("ℹ️ ستون referral_code از قبل وجود دارد")
-        
-        # 2. بررسی و اضافه کردن ستون referred_by
-        try:
-            cursor.execute("ALTER TABLE users ADD COLUMN referred_by INTEGER")
-            await message.answer("✅ ستون referred_by اضافه شد")
-        except:
-            pass
-        
-        # 3. ساخت کد رفرال برای همه کاربران
-        cursor.execute("SELECT user_id FROM users")
-        users = cursor.fetchall()
-        
-        import random
-        import string
-        
-        count = 0
-        for user in users:
-            user_id = user[0]
-            # چک کن کد نداره
-            cursor.execute("SELECT referral_code FROM users WHERE user_id = ?", (user_id,))
-            existing = cursor.fetchone()
-            
-            if not existing or not existing[0]:
-                random_part = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
-                code = f"RAMO{user_id}{random_part}"
-                cursor.execute("UPDATE users SET referral_code = ? WHERE user_id = ?", (code, user_id))
-                count += 1
-        
-        db.conn.commit()
-        
-        await message.answer(f"✅ کد رفرال برای {count} کاربر جدید ساخته شد!\n"
-                            f"👥 کل کاربران: {len(users)}")
-        
-        # 4. ساخت جدول referrals اگر نیست
-        try:
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS referrals (
-                    referral_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    referrer_id INTEGER,
-                    referred_id INTEGER,
-                    registered_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    status TEXT DEFAULT 'completed',
-                    reward_amount REAL DEFAULT 0.0,
-                    reward_paid INTEGER DEFAULT 0,
-                    FOREIGN KEY (referrer_id) REFERENCES users (user_id),
-                    FOREIGN KEY (referred_id) REFERENCES users (user_id),
-                    UNIQUE(referred_id)
-                )
-            ''')
-            db.conn.commit()
-            await message.answer("✅ جدول referrals بررسی/ساخته شد")
-        except Exception as e:
-            await message.answer(f"⚠️ خطا در ساخت جدول: {e}")
-        
-        # 5. نمایش آمار نهایی
-        cursor.execute("SELECT COUNT(*) FROM users")
-        total_users = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM users WHERE referral_code IS NOT NULL")
-        users_with_code = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM referrals")
-        total_refs = cursor.fetchone()[0]
+        report = await run_schema_migrations()
+        await status_msg.edit_text("\n".join(report))
         
+        # نمایش آمار نهایی
+        total_users, users_with_code, total_refs = await db.get_referral_overview()
         await message.answer(
             f"📊 **آمار نهایی:**\n"
             f"👥 کل کاربران: {total_users}\n"
@@ -843,53 +798,22 @@ async def emergency_fix(message: Message):
         return
     
     try:
-        # اجرای مستقیم دستورات SQL
-        cursor = db.conn.cursor()
-        
-        # 1. اضافه کردن ستون
-        try:
-            cursor.execute("ALTER TABLE users ADD COLUMN referral_code TEXT")
-            await message.answer("✅ ستون referral_code اضافه شد")
-        except:
-            await message.answer("ℹ️ ستون referral_code از قبل وجود دارد")
-        
-        # 2. کد رفرال برای همه
-        cursor.execute("SELECT user_id FROM users")
-        users = cursor.fetchall()
-        
-        import random
-        import string
-        
-        count = 0
-        for user in users:
-            user_id = user[0]
-            cursor.execute("SELECT referral_code FROM users WHERE user_id = ?", (user_id,))
-            existing = cursor.fetchone()
-            
-            if not existing or not existing[0]:
-                random_part = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
-                code = f"RAMO{user_id}{random_part}"
-                cursor.execute("UPDATE users SET referral_code = ? WHERE user_id = ?", (code, user_id))
-                count += 1
-        
-        db.conn.commit()
-        await message.answer(f"✅ تعمیر اضطراری انجام شد! {count} کاربر آپدیت شدند.")
+        report = await run_schema_migrations()
+        await message.answer("✅ تعمیر اضطراری انجام شد!\n" + "\n".join(report))
         
     except Exception as e:
         await message.answer(f"❌ خطا: {str(e)}")
 
 # ========== ادامه فایل ==========
 
-@router.message(F.text.in_(["⚙️ تنظیمات سیستم", "⚙️ System Settings", "⚙️ إعدادات النظام"]))
-async def system_settings(message: Message):
+@router.message(Button('system_settings'))
+async def system_settings(message: Message, user_ctx: UserContext):
     """تنظیمات سیستم"""
     if not is_admin(message.from_user.id):
         return
     
     # تشخیص زبان ادمین
-    user_id = message.from_user.id
-    user_data = db.get_user(user_id)
-    language = user_data[1] if user_data else 'fa'
+    language = user_ctx.language if user_ctx.exists else 'fa'
     
     if language == 'fa':
         await message.answer(
@@ -940,11 +864,10 @@ async def system_settings(message: Message):
             "• /start - Back to main menu"
         )
 
-@router.message(F.text.in_(["🔙 منوی اصلی", "🔙 Main Menu", "🔙 القائمة الرئيسية"]))
-async def back_to_main_menu(message: Message, state: FSMContext):
+@router.message(Button('main_menu'))
+async def back_to_main_menu(message: Message, state: FSMContext, user_ctx: UserContext):
     """بازگشت به منوی اصلی"""
-    user_id = message.from_user.id
-    language = db.get_user_language(user_id)
+    language = user_ctx.language
     
     await state.clear()
     from keyboards.main_menu import get_main_menu_keyboard
@@ -965,20 +888,15 @@ async def back_to_main_menu(message: Message, state: FSMContext):
             reply_markup=get_main_menu_keyboard(language)
         )
 
-@router.message(F.text.regexp(r'^/close_\d+$'))
-async def close_ticket_command(message: Message):
+@deep_commands.verb('close', batch=True)
+async def close_ticket_command(message: Message, deep_command: DeepCommand, user_ctx: UserContext):
     """بستن تیکت"""
-    if not is_admin(message.from_user.id):
-        return
-    
-    ticket_id = int(message.text.split('_')[1])
+    ticket_id = deep_command.id
     
-    success = db.close_ticket(ticket_id)
+    success = await db.close_ticket(ticket_id)
     
     # تشخیص زبان ادمین
-    user_id = message.from_user.id
-    user_data = db.get_user(user_id)
-    language = user_data[1] if user_data else 'fa'
+    language = user_ctx.language if user_ctx.exists else 'fa'
     
     if success:
         if language == 'fa':
@@ -995,33 +913,18 @@ async def close_ticket_command(message: Message):
         else:
             await message.answer("❌ Error closing ticket.")
 
-@router.message(F.text.regexp(r'^/tickets_\d+$'))
-async def view_user_tickets(message: Message):
+@deep_commands.verb('tickets')
+async def view_user_tickets(message: Message, deep_command: DeepCommand, user_ctx: UserContext):
     """مشاهده تیکت‌های یک کاربر"""
-    if not is_admin(message.from_user.id):
-        return
-    
-    user_id = int(message.text.split('_')[1])
+    user_id = deep_command.id
     
-    cursor = db.conn.cursor()
-    cursor.execute("""
-        SELECT ticket_id, subject, status, created_at, admin_response
-        FROM tickets 
-        WHERE user_id = ?
-        ORDER BY created_at DESC
-        LIMIT 10
-    """, (user_id,))
+    tickets = await db.get_user_tickets(user_id, 10)
     
-    tickets = cursor.fetchall()
-    
-    cursor.execute("SELECT full_name FROM users WHERE user_id = ?", (user_id,))
-    user_data = cursor.fetchone()
-    user_name = user_data[0] if user_data else "Unknown"
+    user_data = await db.get_user(user_id)
+    user_name = user_data[2] if user_data else "Unknown"
     
     # تشخیص زبان ادمین
-    admin_id = message.from_user.id
-    admin_data = db.get_user(admin_id)
-    language = admin_data[1] if admin_data else 'fa'
+    language = user_ctx.language if user_ctx.exists else 'fa'
     
     if tickets:
         if language == 'fa':
@@ -1032,7 +935,7 @@ async def view_user_tickets(message: Message):
             result_text = f"🎫 **Tickets of user: {user_name}**\n\n"
         
         for ticket in tickets:
-            ticket_id, subject, status, created_at, admin_response = ticket
+            ticket_id, subject, status, created_at, admin_response, _ = ticket
             
             if language == 'fa':
                 status_text = {
@@ -1086,17 +989,16 @@ async def view_user_tickets(message: Message):
     await message.answer(result_text)
 
 @router.message(Command("opentickets"))
-async def open_tickets_command(message: Message):
+async def open_tickets_command(message: Message, user_ctx: UserContext):
     """دستور مشاهده تیکت‌های باز"""
     if not is_admin(message.from_user.id):
         return
     
-    open_tickets = db.get_open_tickets()
+    open_tickets = await db.get_open_tickets()
     
     # تشخیص زبان ادمین
-    user_id = message.from_user.id
-    user_data = db.get_user(user_id)
-    language = user_data[1] if user_data else 'fa'
+    user_id = user_ctx.user_id
+    language = user_ctx.language if user_ctx.exists else 'fa'
     
     if open_tickets:
         if language == 'fa':
@@ -1165,35 +1067,29 @@ async def open_tickets_command(message: Message):
         else:
             await message.answer("✅ **No open tickets.**")
 
-@router.message(F.text.regexp(r'^/confirm_invest_\d+$'))
-async def confirm_investment(message: Message, bot: Bot):
+async def investment_already_processed(message: Message, investment_id, status, language):
+    """گزارش سرمایه‌گذاری‌ای که دیگر در انتظار تایید نیست"""
+    if language == 'fa':
+        await message.answer(f"⚠️ سرمایه‌گذاری #{investment_id} قبلاً بررسی شده است (وضعیت: {status}).")
+    elif language == 'ar':
+        await message.answer(f"⚠️ تمت معالجة الاستثمار #{investment_id} مسبقاً (الحالة: {status}).")
+    else:
+        await message.answer(f"⚠️ Investment #{investment_id} was already processed (status: {status}).")
+
+@deep_commands.verb('confirm_invest', batch=True)
+async def confirm_investment(message: Message, bot: Bot, deep_command: DeepCommand, user_ctx: UserContext):
     """تایید سرمایه‌گذاری توسط ادمین"""
-    if not is_admin(message.from_user.id):
-        return
-    
     try:
-        investment_id = int(message.text.split('_')[2])
-        
-        cursor = db.conn.cursor()
-        cursor.execute('''
-            UPDATE investments 
-            SET status = 'active', start_date = CURRENT_TIMESTAMP
-            WHERE investment_id = ?
-        ''', (investment_id,))
-        
-        # دریافت اطلاعات سرمایه‌گذاری
-        cursor.execute('''
-            SELECT i.user_id, i.amount, i.monthly_profit_percent, u.full_name, u.wallet_address, u.language
-            FROM investments i
-            JOIN users u ON i.user_id = u.user_id
-            WHERE i.investment_id = ?
-        ''', (investment_id,))
+        investment_id = deep_command.id
         
-        invest_data = cursor.fetchone()
+        # تایید و دریافت اطلاعات سرمایه‌گذاری
+        invest_data = await db.activate_investment(investment_id)
         
-        if invest_data:
+        if isinstance(invest_data, str):
+            # قبلاً تایید یا رد شده (مثلا شناسه تکراری در دستور چندتایی)؛ به کاربر دوباره پیام نمی‌رود
+            await investment_already_processed(message, investment_id, invest_data, user_ctx.language)
+        elif invest_data:
             user_id, amount, profit_percent, full_name, user_wallet, user_lang = invest_data
-            db.conn.commit()
             
             # محاسبه سود ماهانه
             monthly_profit = (amount * profit_percent) / 100
@@ -1236,10 +1132,10 @@ async def confirm_investment(message: Message, bot: Bot):
                     f"📞 Contact support for any questions."
                 )
             
-            await bot.send_message(user_id, user_message)
+            await outbox.send_message(user_id, user_message)
             
             # پیام به ادمین
-            admin_lang = db.get_user_language(message.from_user.id)
+            admin_lang = user_ctx.language
             if admin_lang == 'fa':
                 await message.answer(f"✅ سرمایه‌گذاری #{investment_id} تایید شد و به کاربر اطلاع داده شد.")
             elif admin_lang == 'ar':
@@ -1247,46 +1143,31 @@ async def confirm_investment(message: Message, bot: Bot):
             else:
                 await message.answer(f"✅ Investment #{investment_id} confirmed and user notified.")
         else:
-            admin_lang = db.get_user_language(message.from_user.id)
+            admin_lang = user_ctx.language
             if admin_lang == 'fa':
-                await message.answer("❌ سرمایه‌گذاری یافت نشد.")
+                await message.answer(f"❌ سرمایه‌گذاری #{investment_id} یافت نشد.")
             elif admin_lang == 'ar':
-                await message.answer("❌ لم يتم العثور على الاستثمار.")
+                await message.answer(f"❌ لم يتم العثور على الاستثمار #{investment_id}.")
             else:
-                await message.answer("❌ Investment not found.")
+                await message.answer(f"❌ Investment #{investment_id} not found.")
             
     except Exception as e:
         await message.answer(f"❌ خطا: {str(e)}")
 
-@router.message(F.text.regexp(r'^/reject_invest_\d+$'))
-async def reject_investment(message: Message, bot: Bot):
+@deep_commands.verb('reject_invest', batch=True)
+async def reject_investment(message: Message, bot: Bot, deep_command: DeepCommand, user_ctx: UserContext):
     """رد سرمایه‌گذاری توسط ادمین"""
-    if not is_admin(message.from_user.id):
-        return
-    
     try:
-        investment_id = int(message.text.split('_')[2])
-        
-        cursor = db.conn.cursor()
-        cursor.execute('''
-            UPDATE investments 
-            SET status = 'rejected'
-            WHERE investment_id = ?
-        ''', (investment_id,))
+        investment_id = deep_command.id
         
-        # دریافت اطلاعات سرمایه‌گذاری
-        cursor.execute('''
-            SELECT i.user_id, i.amount, u.full_name, u.language
-            FROM investments i
-            JOIN users u ON i.user_id = u.user_id
-            WHERE i.investment_id = ?
-        ''', (investment_id,))
+        # رد و دریافت اطلاعات سرمایه‌گذاری
+        invest_data = await db.reject_investment(investment_id)
         
-        invest_data = cursor.fetchone()
-        
-        if invest_data:
+        if isinstance(invest_data, str):
+            # قبلاً تایید یا رد شده (مثلا شناسه تکراری در دستور چندتایی)؛ به کاربر دوباره پیام نمی‌رود
+            await investment_already_processed(message, investment_id, invest_data, user_ctx.language)
+        elif invest_data:
             user_id, amount, full_name, user_lang = invest_data
-            db.conn.commit()
             
             # ارسال پیام به کاربر بر اساس زبان
             if user_lang == 'fa':
@@ -1314,10 +1195,10 @@ async def reject_investment(message: Message, bot: Bot):
                     f"👤 Support: @YourSupportUsername"
                 )
             
-            await bot.send_message(user_id, user_message)
+            await outbox.send_message(user_id, user_message)
             
             # پیام به ادمین
-            admin_lang = db.get_user_language(message.from_user.id)
+            admin_lang = user_ctx.language
             if admin_lang == 'fa':
                 await message.answer(f"❌ سرمایه‌گذاری #{investment_id} رد شد و به کاربر اطلاع داده شد.")
             elif admin_lang == 'ar':
@@ -1325,13 +1206,13 @@ async def reject_investment(message: Message, bot: Bot):
             else:
                 await message.answer(f"❌ Investment #{investment_id} rejected and user notified.")
         else:
-            admin_lang = db.get_user_language(message.from_user.id)
+            admin_lang = user_ctx.language
             if admin_lang == 'fa':
-                await message.answer("❌ سرمایه‌گذاری یافت نشد.")
+                await message.answer(f"❌ سرمایه‌گذاری #{investment_id} یافت نشد.")
             elif admin_lang == 'ar':
-                await message.answer("❌ لم يتم العثور على الاستثمار.")
+                await message.answer(f"❌ لم يتم العثور على الاستثمار #{investment_id}.")
             else:
-                await message.answer("❌ Investment not found.")
+                await message.answer(f"❌ Investment #{investment_id} not found.")
             
     except Exception as e:
         await message.answer(f"❌ خطا: {str(e)}")
@@ -1346,64 +1227,7 @@ async def emergency_fix2(message: Message):
     status = await message.answer("🔄 در حال تعمیر کامل دیتابیس...")
     
     try:
-        cursor = db.conn.cursor()
-        results = []
-        
-        # 1. اضافه کردن ستون total_invested
-        try:
-            cursor.execute("ALTER TABLE users ADD COLUMN total_invested REAL DEFAULT 0.0")
-            results.append("✅ ستون total_invested اضافه شد")
-        except Exception as e:
-            results.append(f"ℹ️ total_invested: {str(e)}")
-        
-        # 2. اضافه کردن ستون total_withdrawn
-        try:
-            cursor.execute("ALTER TABLE users ADD COLUMN total_withdrawn REAL DEFAULT 0.0")
-            results.append("✅ ستون total_withdrawn اضافه شد")
-        except Exception as e:
-            results.append(f"ℹ️ total_withdrawn: {str(e)}")
-        
-        # 3. اضافه کردن ستون referral_code (اگر نیست)
-        try:
-            cursor.execute("ALTER TABLE users ADD COLUMN referral_code TEXT")
-            results.append("✅ ستون referral_code اضافه شد")
-        except Exception as e:
-            results.append(f"ℹ️ referral_code: {str(e)}")
-        
-        # 4. اضافه کردن ستون referred_by (اگر نیست)
-        try:
-            cursor.execute("ALTER TABLE users ADD COLUMN referred_by INTEGER")
-            results.append("✅ ستون referred_by اضافه شد")
-        except Exception as e:
-            results.append(f"ℹ️ referred_by: {str(e)}")
-        
-        # 5. ساخت کد رفرال برای کاربرانی که ندارند
-        cursor.execute("SELECT user_id FROM users WHERE referral_code IS NULL OR referral_code = ''")
-        users_without_code = cursor.fetchall()
-        
-        if users_without_code:
-            import random
-            import string
-            count = 0
-            for user in users_without_code:
-                user_id = user[0]
-                random_part = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
-                code = f"RAMO{user_id}{random_part}"
-                cursor.execute("UPDATE users SET referral_code = ? WHERE user_id = ?", (code, user_id))
-                count += 1
-            results.append(f"✅ کد رفرال برای {count} کاربر ساخته شد")
-        
-        # 6. مقداردهی اولیه total_invested برای کاربران فعلی
-        cursor.execute("""
-            UPDATE users 
-            SET total_invested = COALESCE(
-                (SELECT SUM(amount) FROM investments WHERE user_id = users.user_id AND status = 'active'), 
-                0.0
-            )
-        """)
-        results.append("✅ total_invested به‌روز شد")
-        
-        db.conn.commit()
+        results = await run_schema_migrations()
         
         # نمایش نتیجه
         await status.edit_text(
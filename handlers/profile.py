@@ -3,11 +3,13 @@ from aiogram.types import Message, ReplyKeyboardMarkup, KeyboardButton, InlineKe
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 
-from database import Database
+from database import get_db
 from keyboards.main_menu import get_main_menu_keyboard, get_back_keyboard
+from keyboards.registry import static_keyboard
+from middlewares.user_context import UserContext
 from handlers.start import get_phone_keyboard  # برای دکمه اشتراک‌گذاری شماره
 
-db = Database()
+db = get_db()
 
 class ProfileStates(StatesGroup):
     waiting_for_new_name = State()
@@ -15,6 +17,7 @@ class ProfileStates(StatesGroup):
     waiting_for_new_phone = State()
     waiting_for_new_wallet = State()
 
+@static_keyboard
 def get_profile_keyboard(language='en'):
     """منوی پروفایل"""
     if language == 'fa':
@@ -36,6 +39,7 @@ def get_profile_keyboard(language='en'):
             resize_keyboard=True
         )
 
+@static_keyboard
 def get_edit_profile_keyboard(language='en'):
     """منوی ویرایش پروفایل"""
     if language == 'fa':
@@ -61,10 +65,9 @@ def get_edit_profile_keyboard(language='en'):
             resize_keyboard=True
         )
 
-async def profile_menu(message: Message, state: FSMContext):
+async def profile_menu(message: Message, state: FSMContext, user_ctx: UserContext):
     """منوی پروفایل"""
-    user_id = message.from_user.id
-    language = db.get_user_language(user_id)
+    language = user_ctx.language
     
     if language == 'fa':
         await message.answer(
@@ -79,14 +82,14 @@ async def profile_menu(message: Message, state: FSMContext):
             reply_markup=get_profile_keyboard(language)
         )
 
-async def view_profile(message: Message):
+async def view_profile(message: Message, user_ctx: UserContext):
     """مشاهده اطلاعات پروفایل"""
-    user_id = message.from_user.id
-    user = db.get_user(user_id)
-    language = db.get_user_language(user_id)
+    user_id = user_ctx.user_id
+    user = user_ctx.row
+    language = user_ctx.language
     
     if user:
-        user_id, lang, full_name, email, phone, wallet, balance, registered_at = user
+        user_id, lang, full_name, email, phone, wallet, balance, registered_at = user[:8]
         
         if language == 'fa':
             text = (
@@ -118,10 +121,9 @@ async def view_profile(message: Message):
         else:
             await message.answer("❌ Your data not found. Please send /start.")
 
-async def edit_profile_menu(message: Message):
+async def edit_profile_menu(message: Message, user_ctx: UserContext):
     """منوی ویرایش پروفایل"""
-    user_id = message.from_user.id
-    language = db.get_user_language(user_id)
+    language = user_ctx.language
     
     if language == 'fa':
         await message.answer(
@@ -137,10 +139,9 @@ async def edit_profile_menu(message: Message):
         )
 
 # --- ویرایش نام ---
-async def edit_name_start(message: Message, state: FSMContext):
+async def edit_name_start(message: Message, state: FSMContext, user_ctx: UserContext):
     """شروع ویرایش نام"""
-    user_id = message.from_user.id
-    language = db.get_user_language(user_id)
+    language = user_ctx.language
     
     if language == 'fa':
         await message.answer("لطفاً نام جدید خود را وارد کنید:")
@@ -149,15 +150,13 @@ async def edit_name_start(message: Message, state: FSMContext):
     
     await state.set_state(ProfileStates.waiting_for_new_name)
 
-async def edit_name_finish(message: Message, state: FSMContext):
+async def edit_name_finish(message: Message, state: FSMContext, user_ctx: UserContext):
     """اتمام ویرایش نام"""
-    user_id = message.from_user.id
-    language = db.get_user_language(user_id)
+    user_id = user_ctx.user_id
+    language = user_ctx.language
     
     # به روزرسانی نام در دیتابیس
-    cursor = db.conn.cursor()
-    cursor.execute("UPDATE users SET full_name = ? WHERE user_id = ?", (message.text, user_id))
-    db.conn.commit()
+    await db.update_user_field(user_id, 'full_name', message.text)
     
     await state.clear()
     
@@ -167,10 +166,9 @@ async def edit_name_finish(message: Message, state: FSMContext):
         await message.answer("✅ Your name has been updated successfully!", reply_markup=get_profile_keyboard(language))
 
 # --- ویرایش ایمیل ---
-async def edit_email_start(message: Message, state: FSMContext):
+async def edit_email_start(message: Message, state: FSMContext, user_ctx: UserContext):
     """شروع ویرایش ایمیل"""
-    user_id = message.from_user.id
-    language = db.get_user_language(user_id)
+    language = user_ctx.language
     
     if language == 'fa':
         await message.answer("لطفاً ایمیل جدید خود را وارد کنید:")
@@ -179,10 +177,10 @@ async def edit_email_start(message: Message, state: FSMContext):
     
     await state.set_state(ProfileStates.waiting_for_new_email)
 
-async def edit_email_finish(message: Message, state: FSMContext):
+async def edit_email_finish(message: Message, state: FSMContext, user_ctx: UserContext):
     """اتمام ویرایش ایمیل"""
-    user_id = message.from_user.id
-    language = db.get_user_language(user_id)
+    user_id = user_ctx.user_id
+    language = user_ctx.language
     
     # اعتبارسنجی ایمیل
     if '@' not in message.text or '.' not in message.text:
@@ -193,9 +191,7 @@ async def edit_email_finish(message: Message, state: FSMContext):
         return
     
     # به روزرسانی ایمیل در دیتابیس
-    cursor = db.conn.cursor()
-    cursor.execute("UPDATE users SET email = ? WHERE user_id = ?", (message.text, user_id))
-    db.conn.commit()
+    await db.update_user_field(user_id, 'email', message.text)
     
     await state.clear()
     
@@ -205,10 +201,9 @@ async def edit_email_finish(message: Message, state: FSMContext):
         await message.answer("✅ Your email has been updated successfully!", reply_markup=get_profile_keyboard(language))
 
 # --- ویرایش تلفن ---
-async def edit_phone_start(message: Message, state: FSMContext):
+async def edit_phone_start(message: Message, state: FSMContext, user_ctx: UserContext):
     """شروع ویرایش تلفن"""
-    user_id = message.from_user.id
-    language = db.get_user_language(user_id)
+    language = user_ctx.language
     
     if language == 'fa':
         await message.answer(
@@ -223,10 +218,10 @@ async def edit_phone_start(message: Message, state: FSMContext):
     
     await state.set_state(ProfileStates.waiting_for_new_phone)
 
-async def edit_phone_finish(message: Message, state: FSMContext):
+async def edit_phone_finish(message: Message, state: FSMContext, user_ctx: UserContext):
     """اتمام ویرایش تلفن"""
-    user_id = message.from_user.id
-    language = db.get_user_language(user_id)
+    user_id = user_ctx.user_id
+    language = user_ctx.language
     
     # بررسی اگر کاربر skip زد
     if message.text in ["⏭️ رد کردن", "⏭️ Skip"]:
@@ -238,9 +233,7 @@ async def edit_phone_finish(message: Message, state: FSMContext):
         phone = message.text
     
     # به روزرسانی تلفن در دیتابیس
-    cursor = db.conn.cursor()
-    cursor.execute("UPDATE users SET phone = ? WHERE user_id = ?", (phone, user_id))
-    db.conn.commit()
+    await db.update_user_field(user_id, 'phone', phone)
     
     await state.clear()
     
@@ -250,10 +243,9 @@ async def edit_phone_finish(message: Message, state: FSMContext):
         await message.answer("✅ Your phone number has been updated successfully!", reply_markup=get_profile_keyboard(language))
 
 # --- ویرایش کیف پول ---
-async def edit_wallet_start(message: Message, state: FSMContext):
+async def edit_wallet_start(message: Message, state: FSMContext, user_ctx: UserContext):
     """شروع ویرایش کیف پول"""
-    user_id = message.from_user.id
-    language = db.get_user_language(user_id)
+    language = user_ctx.language
     
     if language == 'fa':
         await message.answer(
@@ -276,10 +268,10 @@ async def edit_wallet_start(message: Message, state: FSMContext):
     
     await state.set_state(ProfileStates.waiting_for_new_wallet)
 
-async def edit_wallet_finish(message: Message, state: FSMContext):
+async def edit_wallet_finish(message: Message, state: FSMContext, user_ctx: UserContext):
     """اتمام ویرایش کیف پول"""
-    user_id = message.from_user.id
-    language = db.get_user_language(user_id)
+    user_id = user_ctx.user_id
+    language = user_ctx.language
     
     # اعتبارسنجی ساده آدرس کیف پول
     wallet_address = message.text.strip()
@@ -301,9 +293,7 @@ async def edit_wallet_finish(message: Message, state: FSMContext):
         return
     
     # به روزرسانی کیف پول در دیتابیس
-    cursor = db.conn.cursor()
-    cursor.execute("UPDATE users SET wallet_address = ? WHERE user_id = ?", (wallet_address, user_id))
-    db.conn.commit()
+    await db.update_user_field(user_id, 'wallet_address', wallet_address)
     
     await state.clear()
     
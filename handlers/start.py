@@ -8,10 +8,14 @@ import os
 from datetime import datetime
 from aiogram.enums import ParseMode
 
-from database import Database
+from database import get_db
+from utils import outbox
+from utils.notifications import fan_out_to_admins
 from keyboards.main_menu import get_main_menu_keyboard, get_back_keyboard
+from keyboards.registry import static_keyboard
+from middlewares.user_context import UserContext
 
-db = Database()
+db = get_db()
 
 class RegistrationStates(StatesGroup):
     waiting_for_full_name = State()
@@ -19,6 +23,7 @@ class RegistrationStates(StatesGroup):
     waiting_for_phone = State()
     waiting_for_wallet = State()
 
+@static_keyboard
 def get_phone_keyboard(language='en'):
     """کیبورد برای شماره تلفن (با دکمه skip)"""
     if language == 'fa':
@@ -54,8 +59,8 @@ async def start_command(message: Message, state: FSMContext):
     user_id = message.from_user.id
     
     # بررسی آیا کاربر ثبت‌نام کرده؟
-    user = db.get_user(user_id)
-    language = db.get_user_language(user_id)
+    user = await db.get_user(user_id)
+    language = await db.get_user_language(user_id)
     
     if user and user[2]:  # اگر full_name دارد یعنی ثبت‌نام کرده
         # نمایش منوی اصلی
@@ -99,10 +104,9 @@ async def start_command(message: Message, state: FSMContext):
             )
         await state.set_state(RegistrationStates.waiting_for_full_name)
 
-async def process_full_name(message: Message, state: FSMContext):
+async def process_full_name(message: Message, state: FSMContext, user_ctx: UserContext):
     """دریافت نام کامل"""
-    user_id = message.from_user.id
-    language = db.get_user_language(user_id)
+    language = user_ctx.language
     
     await state.update_data(full_name=message.text)
     
@@ -114,10 +118,9 @@ async def process_full_name(message: Message, state: FSMContext):
         await message.answer("📧 Please enter your email:")
     await state.set_state(RegistrationStates.waiting_for_email)
 
-async def process_email(message: Message, state: FSMContext):
+async def process_email(message: Message, state: FSMContext, user_ctx: UserContext):
     """دریافت ایمیل"""
-    user_id = message.from_user.id
-    language = db.get_user_language(user_id)
+    language = user_ctx.language
     
     # اعتبارسنجی ساده ایمیل
     if '@' not in message.text or '.' not in message.text:
@@ -149,10 +152,9 @@ async def process_email(message: Message, state: FSMContext):
         )
     await state.set_state(RegistrationStates.waiting_for_phone)
 
-async def process_phone(message: Message, state: FSMContext):
+async def process_phone(message: Message, state: FSMContext, user_ctx: UserContext):
     """دریافت شماره تماس"""
-    user_id = message.from_user.id
-    language = db.get_user_language(user_id)
+    language = user_ctx.language
     
     # بررسی اگر کاربر skip زد
     if message.text in ["⏭️ رد کردن", "⏭️ Skip", "⏭️ تخطي"]:
@@ -198,10 +200,10 @@ async def process_phone(message: Message, state: FSMContext):
         )
     await state.set_state(RegistrationStates.waiting_for_wallet)
 
-async def process_wallet(message: Message, state: FSMContext):
+async def process_wallet(message: Message, state: FSMContext, user_ctx: UserContext):
     """دریافت آدرس کیف پول و تکمیل ثبت‌نام با پشتیبانی از رفرال"""
-    user_id = message.from_user.id
-    language = db.get_user_language(user_id)
+    user_id = user_ctx.user_id
+    language = user_ctx.language
     
     # اعتبارسنجی ساده آدرس کیف پول
     wallet_address = message.text.strip()
@@ -233,7 +235,7 @@ async def process_wallet(message: Message, state: FSMContext):
     print(f"🔍 Registration data: {data}")  # دیباگ
     
     # ذخیره در دیتابیس
-    db.update_user_profile(
+    await db.update_user_profile(
         user_id=user_id,
         full_name=data.get('full_name', ''),
         email=data.get('email', ''),
@@ -245,38 +247,41 @@ async def process_wallet(message: Message, state: FSMContext):
     referrer_id = data.get('referrer_id')
     if referrer_id:
         print(f"🔍 Registering referral: referrer={referrer_id}, referred={user_id}")
-        success = db.register_referral(referrer_id, user_id)
+        success = await db.register_referral(referrer_id, user_id)
         print(f"🔍 Referral registration {'successful' if success else 'failed'}")
         
         if success:
             # ارسال نوتیفیکیشن به دعوت‌کننده
             try:
-                referrer_lang = db.get_user_language(referrer_id)
+                referrer_lang = await db.get_user_language(referrer_id)
                 if referrer_lang == 'fa':
-                    await message.bot.send_message(
+                    await outbox.send_message(
                         referrer_id,
                         f"🎉 **تبریک!**\n\n"
                         f"یک نفر با لینک دعوت شما ثبت‌نام کرد.\n"
                         f"👤 کاربر: {data.get('full_name', '')}\n"
-                        f"📅 تاریخ: {datetime.now().strftime('%Y-%m-%d')}"
+                        f"📅 تاریخ: {datetime.now().strftime('%Y-%m-%d')}",
+                        priority=outbox.PRIORITY_NOTIFICATION
                     )
                 elif referrer_lang == 'ar':
-                    await message.bot.send_message(
+                    await outbox.send_message(
                         referrer_id,
                         f"🎉 **تهانينا!**\n\n"
                         f"شخص ما سجل عبر رابط دعوتك.\n"
                         f"👤 المستخدم: {data.get('full_name', '')}\n"
-                        f"📅 التاريخ: {datetime.now().strftime('%Y-%m-%d')}"
+                        f"📅 التاريخ: {datetime.now().strftime('%Y-%m-%d')}",
+                        priority=outbox.PRIORITY_NOTIFICATION
                     )
                 else:
-                    await message.bot.send_message(
+                    await outbox.send_message(
                         referrer_id,
                         f"🎉 **Congratulations!**\n\n"
                         f"Someone registered using your referral link.\n"
                         f"👤 User: {data.get('full_name', '')}\n"
-                        f"📅 Date: {datetime.now().strftime('%Y-%m-%d')}"
+                        f"📅 Date: {datetime.now().strftime('%Y-%m-%d')}",
+                        priority=outbox.PRIORITY_NOTIFICATION
                     )
-                print(f"🔍 Referral notification sent to {referrer_id}")
+                print(f"🔍 Referral notification queued for {referrer_id}")
             except Exception as e:
                 print(f"❌ Failed to send referral notification: {e}")
     
@@ -334,47 +339,32 @@ async def process_wallet(message: Message, state: FSMContext):
         )
     
     # ارسال نوتیفیکیشن به ادمین‌ها
-    await send_admin_notification(message.bot, user_id, data.get('full_name', ''), 
+    await send_admin_notification(user_id, data.get('full_name', ''), 
                                   message.from_user.username, data.get('email', ''), 
                                   data.get('phone', 'Not provided'), wallet_address)
 
-async def send_admin_notification(bot: Bot, user_id: int, full_name: str, username: str, 
+async def send_admin_notification(user_id: int, full_name: str, username: str, 
                                   email: str, phone: str, wallet_address: str):
     """ارسال نوتیفیکیشن به ادمین‌ها"""
-    admin_ids_str = os.getenv("ADMIN_IDS", "")
-    if not admin_ids_str:
-        print("⚠️ ADMIN_IDS not set in environment variables")
-        return
-    
-    admin_ids = [int(id_str.strip()) for id_str in admin_ids_str.split(",") if id_str.strip()]
+    notification_text = (
+        "🆕 <b>کاربر جدید ثبت‌نام کرد!</b>\n\n"
+        f"👤 <b>نام:</b> {full_name}\n"
+        f"🆔 <b>شناسه:</b> <code>{user_id}</code>\n"
+        f"📱 <b>یوزرنیم:</b> @{username or 'ندارد'}\n"
+        f"📧 <b>ایمیل:</b> {email}\n"
+        f"📞 <b>تلفن:</b> {phone}\n"
+        f"💰 <b>کیف پول:</b> {wallet_address[:10]}...{wallet_address[-4:]}\n"
+        f"📅 <b>زمان:</b> {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+    )
     
-    for admin_id in admin_ids:
-        try:
-            notification_text = (
-                "🆕 <b>کاربر جدید ثبت‌نام کرد!</b>\n\n"
-                f"👤 <b>نام:</b> {full_name}\n"
-                f"🆔 <b>شناسه:</b> <code>{user_id}</code>\n"
-                f"📱 <b>یوزرنیم:</b> @{username or 'ندارد'}\n"
-                f"📧 <b>ایمیل:</b> {email}\n"
-                f"📞 <b>تلفن:</b> {phone}\n"
-                f"💰 <b>کیف پول:</b> {wallet_address[:10]}...{wallet_address[-4:]}\n"
-                f"📅 <b>زمان:</b> {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-            )
-            
-            await bot.send_message(
-                admin_id, 
-                notification_text, 
-                parse_mode=ParseMode.HTML
-            )
-            print(f"✅ Admin notification sent to {admin_id}")
-            
-        except Exception as e:
-            print(f"❌ Failed to send notification to admin {admin_id}: {e}")
+    return await fan_out_to_admins(
+        lambda _: {'text': notification_text, 'parse_mode': ParseMode.HTML},
+        label=f"new user {user_id} alert"
+    )
 
-async def cancel_registration(message: Message, state: FSMContext):
+async def cancel_registration(message: Message, state: FSMContext, user_ctx: UserContext):
     """لغو ثبت‌نام"""
-    user_id = message.from_user.id
-    language = db.get_user_language(user_id)
+    language = user_ctx.language
     
     await state.clear()
     
@@ -1,28 +1,26 @@
 # handlers/tickets.py
-from aiogram import F, Router, Bot
+from aiogram import Router, Bot
 from aiogram.types import Message, ReplyKeyboardMarkup, KeyboardButton
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from datetime import datetime
-import os
 
-from database import Database
+from config import is_admin
+from database import get_db
+from keyboards.buttons import Button
+from keyboards.registry import static_keyboard
+from middlewares.user_context import UserContext
+from utils.deep_commands import DeepCommand, deep_commands
+from utils.notifications import fan_out_to_admins
 
 router = Router()
-db = Database()
+db = get_db()
 
 class TicketStates(StatesGroup):
     waiting_for_subject = State()
     waiting_for_message = State()
 
-def is_admin(user_id: int) -> bool:
-    """بررسی اینکه کاربر ادمین هست یا نه"""
-    admin_ids_str = os.getenv("ADMIN_IDS", "")
-    if admin_ids_str:
-        admin_ids = [int(id_str.strip()) for id_str in admin_ids_str.split(",") if id_str.strip()]
-        return user_id in admin_ids
-    return False
-
+@static_keyboard
 def get_ticket_keyboard(language='fa'):
     """منوی تیکت"""
     if language == 'fa':
@@ -44,11 +42,10 @@ def get_ticket_keyboard(language='fa'):
             resize_keyboard=True
         )
 
-@router.message(F.text.in_(["🆘 Support", "🆘 پشتیبانی"]))
-async def support_menu(message: Message):
+@router.message(Button('support'))
+async def support_menu(message: Message, user_ctx: UserContext):
     """منوی پشتیبانی (تیکت)"""
-    user_id = message.from_user.id
-    language = db.get_user_language(user_id)
+    language = user_ctx.language
     
     if language == 'fa':
         await message.answer(
@@ -67,11 +64,10 @@ async def support_menu(message: Message):
             reply_markup=get_ticket_keyboard(language)
         )
 
-@router.message(F.text.in_(["🎫 ارسال تیکت جدید", "🎫 New Ticket"]))
-async def start_new_ticket(message: Message, state: FSMContext):
+@router.message(Button('new_ticket'))
+async def start_new_ticket(message: Message, state: FSMContext, user_ctx: UserContext):
     """شروع ایجاد تیکت جدید"""
-    user_id = message.from_user.id
-    language = db.get_user_language(user_id)
+    language = user_ctx.language
     
     if language == 'fa':
         await message.answer(
@@ -95,17 +91,10 @@ async def start_new_ticket(message: Message, state: FSMContext):
     await state.set_state(TicketStates.waiting_for_subject)
 
 @router.message(TicketStates.waiting_for_subject)
-async def process_ticket_subject(message: Message, state: FSMContext):
+async def process_ticket_subject(message: Message, state: FSMContext, user_ctx: UserContext):
     """دریافت موضوع تیکت"""
-    if message.text in ["🔙 بازگشت", "🔙 Back"]:
-        await state.clear()
-        user_id = message.from_user.id
-        language = db.get_user_language(user_id)
-        await message.answer("❌ ایجاد تیکت لغو شد.", reply_markup=get_ticket_keyboard(language))
-        return
-    
     if len(message.text) > 50:
-        language = db.get_user_language(message.from_user.id)
+        language = user_ctx.language
         if language == 'fa':
             await message.answer("⚠️ موضوع نباید بیشتر از ۵۰ کاراکتر باشد. لطفاً مجدداً وارد کنید:")
         else:
@@ -114,7 +103,7 @@ async def process_ticket_subject(message: Message, state: FSMContext):
     
     await state.update_data(subject=message.text)
     
-    language = db.get_user_language(message.from_user.id)
+    language = user_ctx.language
     if language == 'fa':
         await message.answer(
             "📝 **پیام خود را وارد کنید:**\n\n"
@@ -133,42 +122,32 @@ async def process_ticket_subject(message: Message, state: FSMContext):
     await state.set_state(TicketStates.waiting_for_message)
 
 @router.message(TicketStates.waiting_for_message)
-async def process_ticket_message(message: Message, state: FSMContext, bot: Bot):
+async def process_ticket_message(message: Message, state: FSMContext, bot: Bot, user_ctx: UserContext):
     """دریافت پیام تیکت و ثبت آن"""
-    user_id = message.from_user.id
-    language = db.get_user_language(user_id)
-    user_data = db.get_user(user_id)
-    user_name = user_data[2] if user_data else "Unknown"
+    user_id = user_ctx.user_id
+    language = user_ctx.language
+    user_name = user_ctx.full_name if user_ctx.exists else "Unknown"
     
     data = await state.get_data()
     subject = data.get('subject', 'No Subject')
     
     # ذخیره تیکت در دیتابیس
     ticket_message = message.text if message.text else "📎 فایل/عکس ارسال شده"
-    ticket_id = db.create_ticket(user_id, subject, ticket_message)
+    ticket_id = await db.create_ticket(user_id, subject, ticket_message)
     
     # ارسال نوتیفیکیشن به ادمین‌ها
-    admin_ids_str = os.getenv("ADMIN_IDS", "")
-    if admin_ids_str:
-        admin_ids = [int(id_str.strip()) for id_str in admin_ids_str.split(",") if id_str.strip()]
-        
-        for admin_id in admin_ids:
-            try:
-                notification = (
-                    "🎫 **تیکت جدید**\n\n"
-                    f"🆔 **شماره تیکت:** #{ticket_id}\n"
-                    f"👤 **کاربر:** {user_name}\n"
-                    f"🆔 **شناسه کاربر:** {user_id}\n"
-                    f"📌 **موضوع:** {subject}\n"
-                    f"📝 **پیام:** {ticket_message[:100]}...\n"
-                    f"📅 **زمان:** {datetime.now().strftime('%Y-%m-%d %H:%M')}\n\n"
-                    f"💬 **برای پاسخ:** /reply_{ticket_id}"
-                )
-                
-                await bot.send_message(admin_id, notification)
-                
-            except Exception as e:
-                print(f"❌ Failed to notify admin {admin_id}: {e}")
+    notification = (
+        "🎫 **تیکت جدید**\n\n"
+        f"🆔 **شماره تیکت:** #{ticket_id}\n"
+        f"👤 **کاربر:** {user_name}\n"
+        f"🆔 **شناسه کاربر:** {user_id}\n"
+        f"📌 **موضوع:** {subject}\n"
+        f"📝 **پیام:** {ticket_message[:100]}...\n"
+        f"📅 **زمان:** {datetime.now().strftime('%Y-%m-%d %H:%M')}\n\n"
+        f"💬 **برای پاسخ:** /reply_{ticket_id}"
+    )
+    
+    await fan_out_to_admins(lambda _: {'text': notification}, label=f"ticket #{ticket_id} alert")
     
     await state.clear()
     
@@ -195,13 +174,13 @@ async def process_ticket_message(message: Message, state: FSMContext, bot: Bot):
             reply_markup=get_ticket_keyboard(language)
         )
 
-@router.message(F.text.in_(["📋 تیکت‌های من", "📋 My Tickets"]))
-async def show_user_tickets(message: Message):
+@router.message(Button('my_tickets'))
+async def show_user_tickets(message: Message, user_ctx: UserContext):
     """نمایش تیکت‌های کاربر"""
-    user_id = message.from_user.id
-    language = db.get_user_language(user_id)
+    user_id = user_ctx.user_id
+    language = user_ctx.language
     
-    tickets = db.get_user_tickets(user_id)
+    tickets = await db.get_user_tickets(user_id)
     
     if not tickets:
         if language == 'fa':
@@ -257,14 +236,14 @@ async def show_user_tickets(message: Message):
     await message.answer(response, parse_mode="Markdown")
 
 # هندلر مشاهده یک تیکت خاص
-@router.message(F.text.regexp(r'^/viewticket_\d+$'))
-async def view_single_ticket(message: Message):
+@deep_commands.verb('viewticket', admin_only=False)
+async def view_single_ticket(message: Message, deep_command: DeepCommand, user_ctx: UserContext):
     """مشاهده یک تیکت خاص"""
-    user_id = message.from_user.id
+    user_id = user_ctx.user_id
     
     try:
-        ticket_id = int(message.text.split('_')[1])
-        ticket = db.get_ticket(ticket_id)
+        ticket_id = deep_command.id
+        ticket = await db.get_ticket(ticket_id)
         
         if not ticket:
             await message.answer("❌ تیکت یافت نشد.")
@@ -277,7 +256,7 @@ async def view_single_ticket(message: Message):
         
         ticket_id, ticket_user_id, subject, ticket_message, status, created_at, admin_response, responded_at, full_name, email = ticket
         
-        language = db.get_user_language(user_id)
+        language = user_ctx.language
         
         if language == 'fa':
             status_text = {
@@ -328,11 +307,10 @@ async def view_single_ticket(message: Message):
     except Exception as e:
         await message.answer(f"❌ خطا: {str(e)}")
 
-# هندلر بازگشت
-@router.message(F.text.in_(["🔙 بازگشت", "🔙 Back"]))
-async def back_to_support_menu(message: Message):
-    """بازگشت به منوی پشتیبانی"""
-    user_id = message.from_user.id
-    language = db.get_user_language(user_id)
-    
-    await message.answer("🔙 بازگشت به منوی پشتیبانی", reply_markup=get_ticket_keyboard(language))
\ No newline at end of file
+# بازگشت در وسط ایجاد تیکت (main.py برای TICKET_STATES قبل از بازگشت به منوی اصلی ثبت می‌کند)
+TICKET_STATES = (TicketStates.waiting_for_subject, TicketStates.waiting_for_message)
+
+async def back_to_support_menu(message: Message, state: FSMContext, user_ctx: UserContext):
+    """لغو تیکت نیمه‌کاره و بازگشت به منوی پشتیبانی"""
+    await state.clear()
+    await message.answer("❌ ایجاد تیکت لغو شد.", reply_markup=get_ticket_keyboard(user_ctx.language))
\ No newline at end of file
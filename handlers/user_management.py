@@ -1,35 +1,34 @@
-import os
 from datetime import datetime
-from aiogram import F, Router
+from aiogram import Router
 from aiogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery
 from aiogram.fsm.context import FSMContext
 
-from database import Database
+from config import is_admin
+from database import get_db
+from keyboards.buttons import Button
+from keyboards.callbacks import BackToUsersList, UsersPage, ViewUser, callback_routes
+from middlewares.user_context import UserContext
 
 router = Router()
-db = Database()
+db = get_db()
 
-def is_admin(user_id: int) -> bool:
-    """بررسی اینکه کاربر ادمین هست یا نه"""
-    admin_ids_str = os.getenv("ADMIN_IDS", "")
-    if admin_ids_str:
-        admin_ids = [int(id_str.strip()) for id_str in admin_ids_str.split(",") if id_str.strip()]
-        return user_id in admin_ids
-    return False
-
-def get_users_list_keyboard(page: int = 0, total_pages: int = 1, user_id: int = None):
-    """کیبورد صفحه‌بندی کاربران با دکمه مشاهده جزئیات"""
+def get_users_list_keyboard(page: int = 0, total_pages: int = 1, user_id: int = None,
+                            first_id: int = None, last_id: int = None):
+    """
+    کیبورد صفحه‌بندی کاربران با دکمه مشاهده جزئیات.
+    callback صفحه‌ها: UsersPage(شماره، n|p، شناسه کاربر مرجع) (صفحه‌بندی keyset)
+    """
     keyboard = []
     
     # دکمه‌های صفحه‌بندی
     nav_buttons = []
-    if page > 0:
-        nav_buttons.append(InlineKeyboardButton(text="⬅️ قبلی", callback_data=f"users_page_{page-1}"))
+    if page > 0 and first_id is not None:
+        nav_buttons.append(InlineKeyboardButton(text="⬅️ قبلی", callback_data=UsersPage(page - 1, "p", first_id).pack()))
     
     nav_buttons.append(InlineKeyboardButton(text=f"📄 {page+1}/{total_pages}", callback_data="current_page"))
     
-    if page < total_pages - 1:
-        nav_buttons.append(InlineKeyboardButton(text="➡️ بعدی", callback_data=f"users_page_{page+1}"))
+    if page < total_pages - 1 and last_id is not None:
+        nav_buttons.append(InlineKeyboardButton(text="➡️ بعدی", callback_data=UsersPage(page + 1, "n", last_id).pack()))
     
     if nav_buttons:
         keyboard.append(nav_buttons)
@@ -37,15 +36,14 @@ def get_users_list_keyboard(page: int = 0, total_pages: int = 1, user_id: int =
     # دکمه مشاهده جزئیات کاربر خاص
     if user_id:
         keyboard.append([
-            InlineKeyboardButton(text="👁️ مشاهده جزئیات", callback_data=f"view_user_{user_id}")
+            InlineKeyboardButton(text="👁️ مشاهده جزئیات", callback_data=ViewUser(user_id).pack())
         ])
     
     keyboard.append([InlineKeyboardButton(text="🔙 بازگشت به ادمین", callback_data="back_to_admin")])
     
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
-@router.message(F.text.in_(["👥 مدیریت کاربران", "👥 User Management", 
-                          "👥 لیست کاربران (جدید)", "👥 Users List (New)"]))
+@router.message(Button('user_management', 'users_list'))
 async def handle_all_user_list_buttons(message: Message):
     """هندلر همه دکمه‌های لیست کاربران"""
     if not is_admin(message.from_user.id):
@@ -55,25 +53,26 @@ async def handle_all_user_list_buttons(message: Message):
     
     await show_users_page(message, page=0, language=language)
 
-async def show_users_page(message: Message, page: int = 0, language: str = 'fa', edit_message: bool = False):
-    """نمایش صفحه کاربران"""
+async def show_users_page(message: Message, page: int = 0, language: str = 'fa', edit_message: bool = False,
+                          anchor_id: int = None, direction: str = 'next'):
+    """نمایش صفحه کاربران (keyset: از کاربر anchor_id به بعد/قبل، نه OFFSET)"""
     limit = 6
     offset = page * limit
     
-    cursor = db.conn.cursor()
-    cursor.execute("SELECT COUNT(*) FROM users")
-    total_users = cursor.fetchone()[0]
+    total_users = await db.get_users_count()
     total_pages = max(1, (total_users + limit - 1) // limit)
     
     # **مهم: همه فیلدها رو بگیر**
-    cursor.execute("""
-        SELECT user_id, language, full_name, email, phone, wallet_address, balance, registered_at 
-        FROM users 
-        ORDER BY registered_at DESC 
-        LIMIT ? OFFSET ?
-    """, (limit, offset))
+    users = await db.get_users_page(limit, anchor_id, direction)
+    
+    # کاربر مرجع حذف شده یا صفحه خالی است؛ برگرد به صفحه اول
+    if not users and anchor_id is not None:
+        page, offset = 0, 0
+        users = await db.get_users_page(limit)
     
-    users = cursor.fetchall()
+    first_id = users[0][0] if users else None
+    last_id = users[-1][0] if users else None
+    keyboard = get_users_list_keyboard(page, total_pages, first_id=first_id, last_id=last_id)
     
     if language == 'fa':
         users_list = f"📋 <b>لیست کاربران - صفحه {page+1} از {total_pages}</b>\n\n"
@@ -153,59 +152,39 @@ async def show_users_page(message: Message, page: int = 0, language: str = 'fa',
         await message.edit_text(
             users_list,
             parse_mode="HTML",
-            reply_markup=get_users_list_keyboard(page, total_pages)
+            reply_markup=keyboard
         )
     else:
         await message.answer(
             users_list,
             parse_mode="HTML",
-            reply_markup=get_users_list_keyboard(page, total_pages)
+            reply_markup=keyboard
         )
 
-@router.callback_query(lambda c: c.data.startswith("users_page_"))
-async def handle_users_pagination(callback_query: CallbackQuery):
+@callback_routes.route(UsersPage, admin_only=True)
+async def handle_users_pagination(callback_query: CallbackQuery, callback_data: UsersPage, user_ctx: UserContext):
     """مدیریت صفحه‌بندی کاربران"""
-    if not is_admin(callback_query.from_user.id):
-        return
+    page, anchor_id = callback_data.page, callback_data.anchor
+    direction = 'next' if callback_data.direction == 'n' else 'prev'
     
-    page = int(callback_query.data.split("_")[2])
+    language = user_ctx.language if user_ctx.exists else 'fa'
     
-    user_id = callback_query.from_user.id
-    user_data = db.get_user(user_id)
-    language = user_data[1] if user_data else 'fa'
-    
-    await show_users_page(callback_query.message, page=page, language=language, edit_message=True)
+    await show_users_page(callback_query.message, page=page, language=language, edit_message=True,
+                          anchor_id=anchor_id, direction=direction)
     await callback_query.answer()
 
-@router.callback_query(lambda c: c.data.startswith("view_user_"))
-async def handle_view_user(callback_query: CallbackQuery):
+@callback_routes.route(ViewUser, admin_only=True)
+async def handle_view_user(callback_query: CallbackQuery, callback_data: ViewUser):
     """مشاهده جزئیات یک کاربر"""
-    if not is_admin(callback_query.from_user.id):
-        return
-    
     try:
-        user_id = int(callback_query.data.split("_")[2])
-        
-        cursor = db.conn.cursor()
-        cursor.execute("""
-            SELECT user_id, language, full_name, email, phone, wallet_address, balance, registered_at 
-            FROM users 
-            WHERE user_id = ?
-        """, (user_id,))
+        user_id = callback_data.user_id
         
-        user = cursor.fetchone()
+        user = await db.get_user_details(user_id)
         
         if user:
             user_id, language, full_name, email, phone, wallet, balance, reg_date = user
             
-            cursor.execute("""
-                SELECT COUNT(*), SUM(amount) 
-                FROM investments 
-                WHERE user_id = ? AND status = 'active'
-            """, (user_id,))
-            inv_count, inv_total = cursor.fetchone()
-            inv_count = inv_count or 0
-            inv_total = inv_total or 0
+            inv_count, inv_total, _ = await db.get_user_portfolio(user_id)
             
             details = (
                 "👤 <b>جزئیات کامل کاربر</b>\n\n"
@@ -243,7 +222,7 @@ async def handle_view_user(callback_query: CallbackQuery):
                 details, 
                 parse_mode="HTML",
                 reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                    [InlineKeyboardButton(text="🔙 بازگشت به لیست", callback_data="back_to_users_list")]
+                    [InlineKeyboardButton(text="🔙 بازگشت به لیست", callback_data=BackToUsersList().pack())]
                 ])
             )
         else:
@@ -254,15 +233,10 @@ async def handle_view_user(callback_query: CallbackQuery):
     
     await callback_query.answer()
 
-@router.callback_query(F.data == "back_to_users_list")
-async def back_to_users_list(callback_query: CallbackQuery):
+@callback_routes.route(BackToUsersList, admin_only=True)
+async def back_to_users_list(callback_query: CallbackQuery, user_ctx: UserContext):
     """بازگشت به لیست کاربران"""
-    if not is_admin(callback_query.from_user.id):
-        return
-    
-    user_id = callback_query.from_user.id
-    user_data = db.get_user(user_id)
-    language = user_data[1] if user_data else 'fa'
+    language = user_ctx.language if user_ctx.exists else 'fa'
     
     await show_users_page(callback_query.message, page=0, language=language, edit_message=True)
     await callback_query.answer()
\ No newline at end of file
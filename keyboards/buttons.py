@@ -0,0 +1,68 @@
+# keyboards/buttons.py
+"""
+جدول متن دکمه‌های کیبورد: action → متن دکمه در هر زبان
+
+handlerها به جای F.text.in_([...]) از Button('action') استفاده می‌کنند تا متن هر دکمه
+فقط یک جا تعریف شود و middlewares/button_dispatch.py بتواند از روی آن جدول
+«متن → handler» را بسازد.
+"""
+from aiogram.filters import BaseFilter
+from aiogram.types import Message
+
+BUTTONS = {
+    # منوی اصلی
+    'profile': ("👤 پروفایل", "👤 Profile", "👤 الملف الشخصي"),
+    'invite_friends': ("🎁 دعوت از دوستان", "🎁 Invite Friends", "🎁 دعوة الأصدقاء"),
+    'settings': ("⚙️ تنظیمات", "⚙️ Settings", "⚙️ الإعدادات"),
+    'about': ("ℹ️ درباره ما", "ℹ️ About", "ℹ️ من نحن"),
+    'support': ("🆘 پشتیبانی", "🆘 Support"),
+    'investment': ("💰 سرمایه‌گذاری", "💰 Investment", "💰 استثمار"),
+    'back': ("🔙 بازگشت", "🔙 Back", "🔙 رجوع"),
+
+    # پروفایل
+    'view_profile': ("👁️ مشاهده اطلاعات", "👁️ View Profile", "👁️ عرض الملف"),
+    'edit_profile': ("✏️ ویرایش اطلاعات", "✏️ Edit Profile", "✏️ تعديل الملف"),
+    'edit_name': ("✏️ ویرایش نام", "✏️ Edit Name", "✏️ تعديل الاسم"),
+    'edit_email': ("📧 ویرایش ایمیل", "📧 Edit Email", "📧 تعديل البريد"),
+    'edit_phone': ("📱 ویرایش تلفن", "📱 Edit Phone", "📱 تعديل الهاتف"),
+    'edit_wallet': ("💰 ویرایش کیف پول", "💰 Edit Wallet", "💰 تعديل المحفظة"),
+    'skip': ("⏭️ رد کردن", "⏭️ Skip", "⏭️ تخطي"),
+
+    # سرمایه‌گذاری
+    'new_investment': ("💰 سرمایه‌گذاری جدید", "💰 New Investment", "💰 استثمار جديد"),
+    'my_investments': ("📊 سرمایه‌گذاری‌های من", "📊 My Investments", "📊 استثماراتي"),
+    'balance': ("💵 موجودی و سود", "💵 Balance & Profit", "💵 الرصيد والربح"),
+
+    # دعوت دوستان
+    'referral_link': ("🔗 لینک دعوت من", "🔗 My Referral Link", "🔗 رابطتي"),
+    'referral_stats': ("📊 آمار دعوت‌ها", "📊 Referral Stats", "📊 الإحصائيات"),
+
+    # تیکت
+    'new_ticket': ("🎫 ارسال تیکت جدید", "🎫 New Ticket"),
+    'my_tickets': ("📋 تیکت‌های من", "📋 My Tickets"),
+
+    # پنل ادمین
+    'user_management': ("👥 مدیریت کاربران", "👥 User Management", "👥 إدارة المستخدمين"),
+    'users_list': ("👥 لیست کاربران (جدید)", "👥 Users List (New)"),
+    'admin_investments': ("💰 سرمایه‌گذاری‌ها", "💰 Investments", "💰 الاستثمارات"),
+    'admin_stats': ("📊 آمار کلی", "📊 Statistics", "📊 الإحصائيات"),
+    'broadcast': ("📢 اطلاع‌رسانی", "📢 Broadcast", "📢 الإذاعة"),
+    'admin_tickets': ("🎫 تیکت‌ها", "🎫 Tickets", "🎫 التذاكر"),
+    'search_user': ("🔍 جستجوی کاربر", "🔍 Search User", "🔍 بحث المستخدم"),
+    'fix_referral': ("🔧 تعمیر رفرال", "🔧 Fix Referral", "🔧 إصلاح الإحالة"),
+    'system_settings': ("⚙️ تنظیمات سیستم", "⚙️ System Settings", "⚙️ إعدادات النظام"),
+    'main_menu': ("🔙 منوی اصلی", "🔙 Main Menu", "🔙 القائمة الرئيسية"),
+}
+
+class Button(BaseFilter):
+    """فیلتر دکمه: متن پیام یکی از متن‌های action(های) داده‌شده است"""
+
+    def __init__(self, *actions: str):
+        self.actions = actions
+        self.texts = frozenset(text for action in actions for text in BUTTONS[action])
+
+    async def __call__(self, message: Message) -> bool:
+        return message.text in self.texts
+
+    def __repr__(self):
+        return f"Button({', '.join(map(repr, self.actions))})"
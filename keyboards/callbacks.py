@@ -0,0 +1,224 @@
+# keyboards/callbacks.py
+"""
+callback_data دکمه‌های inline: payloadهای تایپ‌دار و فشرده + مسیریابی با trie پیشوندها
+
+- هر payload یک dataclass با پیشوند کوتاه است؛ pack() آن را به شکل «پیشوند:فیلد:فیلد»
+  می‌نویسد و اعداد صحیح به مبنای ۳۶ فشرده می‌شوند (شناسه کاربر ۱۰ رقمی → ۷ کاراکتر)
+- pack() اگر نتیجه از سقف ۶۴ بایتی تلگرام بزرگ‌تر شود ValueError می‌دهد
+- callback_routes همه پیشوندها (و پیشوندهای قدیمی مثل lang_ و users_page_ برای دکمه‌های
+  پیام‌های قبلی) را در یک trie نگه می‌دارد و callback را در یک پیمایش به handler می‌رساند
+
+ثبت handler:
+    @callback_routes.route(ViewUser, admin_only=True)
+    async def handle_view_user(callback_query: CallbackQuery, callback_data: ViewUser): ...
+
+main.py فقط یک handler برای همه callbackها ثبت می‌کند:
+    dp.callback_query.register(callback_routes.dispatch, callback_routes.filter)
+"""
+from dataclasses import dataclass, fields
+from typing import Any, ClassVar, Optional
+
+from aiogram.dispatcher.event.handler import CallableObject
+from aiogram.types import CallbackQuery
+
+from config import is_admin
+
+SEPARATOR = ':'
+# سقف طول callback_data در Bot API (بایت)
+MAX_CALLBACK_BYTES = 64
+DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+
+def encode_int(value: int) -> str:
+    """عدد صحیح → مبنای ۳۶"""
+    if value < 0:
+        return '-' + encode_int(-value)
+    encoded = ''
+    while True:
+        value, digit = divmod(value, 36)
+        encoded = DIGITS[digit] + encoded
+        if not value:
+            return encoded
+
+def decode_int(text: str) -> int:
+    return int(text, 36)
+
+@dataclass(frozen=True)
+class Payload:
+    """پایه payloadها؛ زیرکلاس‌ها با prefix (و در صورت نیاز legacy) تعریف می‌شوند"""
+    prefix: ClassVar[str]
+    # پیشوند قالب قدیمی (قبل از payloadهای فشرده) که هنوز در پیام‌های ارسال‌شده وجود دارد
+    legacy: ClassVar[Optional[str]] = None
+
+    def __init_subclass__(cls, prefix: str, legacy: Optional[str] = None, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if SEPARATOR in prefix:
+            raise ValueError(f"Callback prefix {prefix!r} must not contain {SEPARATOR!r}")
+        cls.prefix = prefix
+        cls.legacy = legacy
+
+    def pack(self) -> str:
+        parts = [self.prefix]
+        for field in fields(self):
+            value = getattr(self, field.name)
+            if value is None:
+                parts.append('')
+            elif isinstance(value, int):
+                parts.append(encode_int(value))
+            elif SEPARATOR in value:
+                raise ValueError(f"{type(self).__name__}.{field.name} must not contain {SEPARATOR!r}")
+            else:
+                parts.append(value)
+        data = SEPARATOR.join(parts)
+        if len(data.encode()) > MAX_CALLBACK_BYTES:
+            raise ValueError(f"callback_data {data!r} is longer than {MAX_CALLBACK_BYTES} bytes")
+        return data
+
+    @classmethod
+    def codecs(cls):
+        """(تابع decode، اختیاری بودن) هر فیلد؛ یک بار برای هر کلاس ساخته می‌شود"""
+        codecs = cls.__dict__.get('_codecs')
+        if codecs is None:
+            codecs = []
+            for field in fields(cls):
+                # فیلدها int، str یا Optional[int] هستند
+                decode = decode_int if field.type in (int, Optional[int]) else str
+                codecs.append((decode, field.type != Optional[int]))
+            codecs = cls._codecs = tuple(codecs)
+        return codecs
+
+    @classmethod
+    def unpack(cls, rest: str):
+        """متن بعد از پیشوند (مثلا ':fa') → payload؛ ValueError اگر معتبر نباشد"""
+        codecs = cls.codecs()
+        if not codecs:
+            if rest:
+                raise ValueError(rest)
+            return cls()
+        parts = rest.split(SEPARATOR)
+        # parts[0] متن بین پیشوند و اولین جداکننده است و باید خالی باشد
+        if parts[0] or len(parts) != len(codecs) + 1:
+            raise ValueError(rest)
+        values = []
+        for (decode, required), part in zip(codecs, parts[1:]):
+            if part:
+                values.append(decode(part))
+            elif required:
+                raise ValueError(rest)
+            else:
+                values.append(None)
+        return cls(*values)
+
+    @classmethod
+    def from_legacy(cls, rest: str):
+        """متن بعد از پیشوند قدیمی → payload (زیرکلاس‌های دارای legacy پیاده‌سازی می‌کنند)"""
+        raise ValueError(rest)
+
+@dataclass(frozen=True)
+class LanguageChoice(Payload, prefix='l', legacy='lang_'):
+    code: str
+
+    @classmethod
+    def from_legacy(cls, rest):
+        return cls(rest)
+
+@dataclass(frozen=True)
+class UsersPage(Payload, prefix='up', legacy='users_page_'):
+    """صفحه لیست کاربران؛ anchor شناسه کاربر مرجع در صفحه‌بندی keyset"""
+    page: int
+    direction: str
+    anchor: Optional[int] = None
+
+    @classmethod
+    def from_legacy(cls, rest):
+        # users_page_{page}_{n|p}_{anchor}؛ دکمه‌های خیلی قدیمی (users_page_{page}) به صفحه اول می‌روند
+        parts = rest.split('_')
+        if len(parts) == 3:
+            return cls(int(parts[0]), parts[1], int(parts[2]))
+        return cls(0, 'n', None)
+
+@dataclass(frozen=True)
+class ViewUser(Payload, prefix='vu', legacy='view_user_'):
+    user_id: int
+
+    @classmethod
+    def from_legacy(cls, rest):
+        return cls(int(rest))
+
+@dataclass(frozen=True)
+class BackToUsersList(Payload, prefix='bu', legacy='back_to_users_list'):
+
+    @classmethod
+    def from_legacy(cls, rest):
+        if rest:
+            raise ValueError(rest)
+        return cls()
+
+@dataclass(frozen=True)
+class Route:
+    payload: type
+    parse: Any
+    handler: CallableObject
+    admin_only: bool
+
+class CallbackRoutes:
+    """trie پیشوندهای callback_data → handler"""
+
+    def __init__(self):
+        # هر گره: {کاراکتر: گره بعدی}؛ کلید None مسیر پیشوندی که همین‌جا تمام می‌شود
+        self.trie = {}
+        self.payloads = {}
+
+    def _insert(self, key, route):
+        node = self.trie
+        for char in key:
+            node = node.setdefault(char, {})
+        if None in node:
+            raise ValueError(f"Callback prefix {key!r} is already registered")
+        node[None] = route
+
+    def route(self, payload: type, *, admin_only=False):
+        """دکوراتور ثبت handler یک نوع payload"""
+        def register(callback):
+            handler = CallableObject(callback)
+            self._insert(payload.prefix, Route(payload, payload.unpack, handler, admin_only))
+            if payload.legacy:
+                self._insert(payload.legacy, Route(payload, payload.from_legacy, handler, admin_only))
+            self.payloads[payload.prefix] = payload
+            return callback
+        return register
+
+    def resolve(self, data: Optional[str]):
+        """(route، payload) برای طولانی‌ترین پیشوند ثبت‌شده‌ای که payloadش معتبر است، یا None"""
+        if not data:
+            return None
+        node, matches = self.trie, []
+        for index, char in enumerate(data):
+            node = node.get(char)
+            if node is None:
+                break
+            if None in node:
+                matches.append((node[None], index + 1))
+        # پیشوندهای جدید و قدیمی هم‌پوشانی دارند؛ اگر طولانی‌ترین parse نشد، کوتاه‌تر امتحان می‌شود
+        for route, end in reversed(matches):
+            try:
+                return route, route.parse(data[end:])
+            except ValueError:
+                continue
+        return None
+
+    async def filter(self, callback_query: CallbackQuery):
+        """فیلتر aiogram: payload به صورت callback_data به handler داده می‌شود"""
+        resolved = self.resolve(callback_query.data)
+        if resolved is None:
+            return False
+        route, payload = resolved
+        return {'callback_route': route, 'callback_data': payload}
+
+    async def dispatch(self, callback_query: CallbackQuery, callback_route: Route, **data: Any):
+        """handler مشترک همه callbackها"""
+        if callback_route.admin_only and not is_admin(callback_query.from_user.id):
+            return
+        return await callback_route.handler.call(callback_query, **data)
+
+# جدول مشترک کل بات
+callback_routes = CallbackRoutes()
@@ -1,5 +1,8 @@
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton
 
+from keyboards.registry import static_keyboard
+
+@static_keyboard
 def get_main_menu_keyboard(language='en'):
     """منوی اصلی بر اساس زبان کاربر"""
     if language == 'fa':
@@ -30,6 +33,7 @@ def get_main_menu_keyboard(language='en'):
             resize_keyboard=True
         )
 
+@static_keyboard
 def get_back_keyboard(language='en'):
     """دکمه بازگشت"""
     if language == 'fa':
@@ -0,0 +1,75 @@
+# keyboards/registry.py
+"""
+کیبوردهای ثابت (فقط وابسته به زبان).
+
+- هر (کیبورد، زبان) یک بار ساخته می‌شود و همان شیء به همه handlerها داده می‌شود؛
+  این اشیاء مشترک‌اند و نباید تغییر داده شوند
+- StaticMarkupSession متن JSON هر کیبورد ثابت را یک بار می‌سازد و در ارسال‌های بعدی
+  بدون model_dump و json.dumps دوباره از همان استفاده می‌کند
+- prebuild_keyboards هنگام شروع همه کیبوردها را برای همه زبان‌ها می‌سازد
+"""
+import inspect
+from functools import wraps
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiohttp import FormData
+
+LANGUAGES = ('fa', 'en', 'ar')
+
+# کیبوردهای ساخته‌شده: id(markup) -> JSON (یا None تا اولین ارسال)
+_static_markups = {}
+_builders = []
+
+def static_keyboard(builder):
+    """دکوراتور: نتیجه تابع برای هر ترکیب آرگومان یک بار ساخته و نگه داشته می‌شود"""
+    cache = {}
+
+    @wraps(builder)
+    def get(*args, **kwargs):
+        key = (args, tuple(sorted(kwargs.items())))
+        markup = cache.get(key)
+        if markup is None:
+            markup = cache[key] = builder(*args, **kwargs)
+            _static_markups[id(markup)] = None
+        return markup
+
+    _builders.append((get, bool(inspect.signature(builder).parameters)))
+    return get
+
+def prebuild_keyboards(languages=LANGUAGES):
+    """ساخت همه کیبوردهای ثابت برای همه زبان‌ها (هنگام شروع بات)"""
+    count = 0
+    for get, takes_language in _builders:
+        for language in (languages if takes_language else (None,)):
+            get(language) if takes_language else get()
+            count += 1
+    return count
+
+def is_static_markup(markup) -> bool:
+    return markup is not None and id(markup) in _static_markups
+
+class StaticMarkupSession(AiohttpSession):
+    """session بات که JSON کیبوردهای ثابت را فقط یک بار می‌سازد"""
+
+    def build_form_data(self, bot: Bot, method):
+        markup = getattr(method, 'reply_markup', None)
+        if not is_static_markup(markup):
+            return super().build_form_data(bot, method)
+
+        serialized = _static_markups[id(markup)]
+        if serialized is None:
+            serialized = _static_markups[id(markup)] = self.prepare_value(markup, bot=bot, files={})
+
+        # همان build_form_data خود aiogram، بدون reply_markup که از قبل آماده است
+        form = FormData(quote_fields=False)
+        files = {}
+        for key, value in method.model_dump(warnings=False, exclude={'reply_markup'}).items():
+            value = self.prepare_value(value, bot=bot, files=files)
+            if not value:
+                continue
+            form.add_field(key, value)
+        form.add_field('reply_markup', serialized)
+        for key, value in files.items():
+            form.add_field(key, value.read(bot), filename=value.filename or key)
+        return form
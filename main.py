@@ -3,16 +3,28 @@ import asyncio
 import os
 from dotenv import load_dotenv
 
-from aiogram import Bot, Dispatcher, F
+from aiogram import Bot, Dispatcher
 from aiogram.filters import CommandStart, Command
 from aiogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery
-from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.fsm.strategy import FSMStrategy
 from aiogram.fsm.context import FSMContext
 
 # Import handlers
-from database import Database
+from config import is_admin, start_config_watcher, stop_config_watcher
+from database import get_db, close_db
+from keyboards.buttons import Button
+from keyboards.callbacks import LanguageChoice, callback_routes
 from keyboards.main_menu import get_main_menu_keyboard
+from keyboards.registry import StaticMarkupSession, prebuild_keyboards, static_keyboard
+from middlewares.button_dispatch import ButtonDispatcher, contact_filter
+from middlewares.scheduled_sends import ScheduledSendCanceller
+from middlewares.user_context import UserContext, UserContextLoader
+from utils.broadcast import resume_broadcasts, stop_broadcasts
+from utils.deep_commands import DeepCommand, deep_commands
+from utils import outbox
+from utils.fsm_storage import SQLiteStorage
+from utils.outbox import start_outbox, stop_outbox
+from utils.referral_codes import decode_referral_code
 from handlers.start import (
     RegistrationStates, 
     process_full_name, 
@@ -39,18 +51,46 @@ from handlers.profile import (
 from handlers.about import router as about_router
 from handlers.admin import router as admin_router
 from handlers.user_management import router as user_management_router
-from handlers.tickets import router as tickets_router
-from handlers.investment import router as investment_router
+from handlers.tickets import router as tickets_router, TICKET_STATES, back_to_support_menu
+from handlers.investment import router as investment_router, InvestmentStates, back_to_investment_menu
 from handlers.referral import router as referral_router
 
 # Load env
 load_dotenv()
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 
+# فاصله ارسال بخش‌های متن معرفی (ثانیه)
+INTRO_INTERVAL = 0.8
+
+# دیتابیس مشترک کل پردازه - همه handlerها از همین نمونه استفاده می‌کنند
+db = get_db()
+
 # ایجاد bot و dispatcher
-storage = MemoryStorage()
-bot = Bot(token=BOT_TOKEN)
-dp = Dispatcher(storage=storage, fsm_strategy=FSMStrategy.USER_IN_CHAT)
+# db در workflow data ثبت می‌شود تا handlerها بتوانند آن را به صورت پارامتر دریافت کنند
+# وضعیت FSM در دیتابیس ذخیره می‌شود تا ثبت‌نام و سرمایه‌گذاری نیمه‌کاره با ری‌استارت از بین نرود
+storage = SQLiteStorage(db)
+# JSON کیبوردهای ثابت فقط یک بار ساخته می‌شود (keyboards/registry.py)
+bot = Bot(token=BOT_TOKEN, session=StaticMarkupSession())
+dp = Dispatcher(storage=storage, fsm_strategy=FSMStrategy.USER_IN_CHAT, db=db)
+dp.startup.register(start_config_watcher)
+dp.startup.register(start_outbox)
+dp.startup.register(resume_broadcasts)
+# اول ارسال‌ها متوقف و ذخیره می‌شوند، بعد دیتابیس بسته می‌شود
+dp.shutdown.register(stop_broadcasts)
+dp.shutdown.register(stop_outbox)
+dp.shutdown.register(stop_config_watcher)
+dp.shutdown.register(close_db)
+
+# هر آپدیت ردیف کاربر را یک بار می‌خواند و به صورت user_ctx به handlerها می‌دهد
+dp.update.outer_middleware(UserContextLoader(db))
+# پیام جدید کاربر بخش‌های زمان‌بندی‌شده معرفی و «درباره ما» را لغو می‌کند
+dp.update.outer_middleware(ScheduledSendCanceller())
+# دکمه‌های کیبورد با یک جستجو در جدول «متن → handler» به handler می‌رسند
+button_dispatcher = dp.message.outer_middleware(ButtonDispatcher(dp))
+# دستورهای /فعل_شناسه (مثل /user_5 و /confirm_invest_12,13) با یک parse و جدول فعل‌ها
+dp.message.register(deep_commands.dispatch, deep_commands.filter)
+# callbackهای inline با یک پیمایش trie پیشوندها به handler می‌رسند
+dp.callback_query.register(callback_routes.dispatch, callback_routes.filter)
 
 # اضافه کردن router به dispatcher
 dp.include_router(about_router)
@@ -60,24 +100,25 @@ dp.include_router(tickets_router)
 dp.include_router(investment_router)
 dp.include_router(referral_router)
 
-# ایجاد دیتابیس
-db = Database()
-
+@static_keyboard
 def language_keyboard():
     return InlineKeyboardMarkup(inline_keyboard=[
         [
-            InlineKeyboardButton(text="🇮🇷 فارسی", callback_data="lang_fa"),
-            InlineKeyboardButton(text="🇬🇧 English", callback_data="lang_en"),
+            InlineKeyboardButton(text="🇮🇷 فارسی", callback_data=LanguageChoice("fa").pack()),
+            InlineKeyboardButton(text="🇬🇧 English", callback_data=LanguageChoice("en").pack()),
         ],
         [
-            InlineKeyboardButton(text="🇸🇦 العربية", callback_data="lang_ar"),
+            InlineKeyboardButton(text="🇸🇦 العربية", callback_data=LanguageChoice("ar").pack()),
         ]
     ])
 
+# همه کیبوردهای ثابت برای همه زبان‌ها یک بار ساخته می‌شوند
+prebuild_keyboards()
+
 @dp.message(CommandStart())
-async def start_handler(message: Message, state: FSMContext):
+async def start_handler(message: Message, state: FSMContext, user_ctx: UserContext):
     """هندلر شروع با پشتیبانی از رفرال"""
-    user_id = message.from_user.id
+    user_id = user_ctx.user_id
     
     # بررسی وجود کد رفرال در استارت
     args = message.text.split()
@@ -86,7 +127,10 @@ async def start_handler(message: Message, state: FSMContext):
     if len(args) > 1 and args[1].startswith('ref_'):
         referral_code = args[1][4:]  # حذف 'ref_' از ابتدا
         print(f"🔍 Referral code detected: {referral_code}")
-        referrer_id = db.get_user_by_referral_code(referral_code)
+        # کدهای امضاشده بدون دیتابیس خوانده می‌شوند؛ فقط کدهای قدیمی RAMO جستجو می‌شوند
+        referrer_id = decode_referral_code(referral_code)
+        if referrer_id is None:
+            referrer_id = await db.get_user_by_referral_code(referral_code)
         print(f"🔍 Referrer ID found: {referrer_id}")
         
         # اطمینان از اینکه کاربر خودش رو دعوت نکرده
@@ -94,10 +138,13 @@ async def start_handler(message: Message, state: FSMContext):
             print("🔍 User tried to self-refer, ignoring")
             referrer_id = None
     
-    user = db.get_user(user_id)
+    # کاربری که بات را مسدود کرده بود و برگشته، دوباره اطلاعیه‌ها را دریافت می‌کند
+    # فقط وقتی غیرفعال است نوشته می‌شود (هر نوشتن کش این کاربر را خالی می‌کند)
+    if user_ctx.exists and not user_ctx.is_active:
+        await db.set_users_active([user_id], True)
     
     # اگر کاربر ثبت‌نام نکرده (full_name ندارد)
-    if user is None or user[2] is None:  # user[2] = full_name
+    if not user_ctx.is_registered:
         # اگر کاربر جدید است و کد رفرال دارد
         if referrer_id:
             await state.update_data(referrer_id=referrer_id)
@@ -110,7 +157,7 @@ async def start_handler(message: Message, state: FSMContext):
         )
     else:
         # کاربر ثبت‌نام کرده - منوی اصلی
-        language = db.get_user_language(user_id)
+        language = user_ctx.language
         if language == 'fa':
             await message.answer(
                 "🤝 خوش آمدید!\n"
@@ -130,10 +177,10 @@ async def start_handler(message: Message, state: FSMContext):
                 reply_markup=get_main_menu_keyboard(language)
             )
 
-@dp.callback_query(lambda c: c.data.startswith("lang_"))
-async def language_callback_handler(callback_query: CallbackQuery, state: FSMContext):
+@callback_routes.route(LanguageChoice)
+async def language_callback_handler(callback_query: CallbackQuery, state: FSMContext, callback_data: LanguageChoice):
     """هندلر انتخاب زبان - با متن معرفی در 3 پارت و حفظ referrer_id"""
-    lang_code = callback_query.data.split("_")[1]
+    lang_code = callback_data.code
     user_id = callback_query.from_user.id
     
     # دریافت داده‌های قبلی state (برای حفظ referrer_id)
@@ -143,7 +190,7 @@ async def language_callback_handler(callback_query: CallbackQuery, state: FSMCon
         print(f"🔍 Found referrer_id in state: {referrer_id}")
     
     # ذخیره زبان کاربر
-    db.add_user(user_id, lang_code)
+    await db.add_user(user_id, lang_code)
     
     await callback_query.answer()
     
@@ -167,10 +214,7 @@ async def language_callback_handler(callback_query: CallbackQuery, state: FSMCon
         )
         
         await callback_query.message.answer(intro_part1)
-        await asyncio.sleep(0.8)
-        await callback_query.message.answer(intro_part2)
-        await asyncio.sleep(0.8)
-        await callback_query.message.answer(intro_part3)
+        await outbox.send_sequence(callback_query.message.chat.id, [intro_part2, intro_part3], INTRO_INTERVAL)
         
     elif lang_code == "en":
         # انگلیسی - سه بخش
@@ -191,10 +235,7 @@ async def language_callback_handler(callback_query: CallbackQuery, state: FSMCon
         )
         
         await callback_query.message.answer(intro_part1)
-        await asyncio.sleep(0.8)
-        await callback_query.message.answer(intro_part2)
-        await asyncio.sleep(0.8)
-        await callback_query.message.answer(intro_part3)
+        await outbox.send_sequence(callback_query.message.chat.id, [intro_part2, intro_part3], INTRO_INTERVAL)
         
     elif lang_code == "ar":
         # عربی - سه بخش
@@ -215,10 +256,7 @@ async def language_callback_handler(callback_query: CallbackQuery, state: FSMCon
         )
         
         await callback_query.message.answer(intro_part1)
-        await asyncio.sleep(0.8)
-        await callback_query.message.answer(intro_part2)
-        await asyncio.sleep(0.8)
-        await callback_query.message.answer(intro_part3)
+        await outbox.send_sequence(callback_query.message.chat.id, [intro_part2, intro_part3], INTRO_INTERVAL)
     
     # تنظیم state برای دریافت نام - با حفظ referrer_id
     await state.set_state(RegistrationStates.waiting_for_full_name)
@@ -233,17 +271,15 @@ async def reset_command(message: Message):
     user_id = message.from_user.id
     
     # حذف کاربر از دیتابیس
-    cursor = db.conn.cursor()
-    cursor.execute("DELETE FROM users WHERE user_id = ?", (user_id,))
-    db.conn.commit()
+    await db.delete_user(user_id)
     
     await message.answer("✅ Your data has been reset! Send /start to begin again.")
 
 @dp.message(Command("myid"))
-async def get_my_id(message: Message):
+async def get_my_id(message: Message, user_ctx: UserContext):
     """دریافت شناسه کاربر"""
-    user_id = message.from_user.id
-    language = db.get_user_language(user_id) if db.get_user(user_id) else 'en'
+    user_id = user_ctx.user_id
+    language = user_ctx.language
     
     if language == 'fa':
         await message.answer(f"شناسه شما: {user_id}\n\nبرای افزودن به ادمین‌ها، این شناسه را به ADMIN_IDS در فایل .env اضافه کنید.")
@@ -255,31 +291,11 @@ async def get_my_id(message: Message):
 @dp.message(Command("checkwallets"))
 async def check_wallets_command(message: Message):
     """بررسی کیف پول‌های کاربران"""
-    admin_ids_str = os.getenv("ADMIN_IDS", "")
-    if not admin_ids_str:
-        return
-    
-    admin_ids = [int(id_str.strip()) for id_str in admin_ids_str.split(",") if id_str.strip()]
-    if message.from_user.id not in admin_ids:
+    if not is_admin(message.from_user.id):
         return
     
-    cursor = db.conn.cursor()
-    
     # شمارش کاربران با کیف پول
-    cursor.execute("SELECT COUNT(*) FROM users WHERE wallet_address IS NOT NULL AND wallet_address != ''")
-    with_wallet = cursor.fetchone()[0]
-    
-    cursor.execute("SELECT COUNT(*) FROM users")
-    total_users = cursor.fetchone()[0]
-    
-    cursor.execute("""
-        SELECT user_id, full_name, wallet_address 
-        FROM users 
-        WHERE wallet_address IS NOT NULL AND wallet_address != ''
-        LIMIT 10
-    """)
-    
-    users_with_wallets = cursor.fetchall()
+    total_users, with_wallet, users_with_wallets = await db.get_wallet_overview(10)
     
     result = (
         "💰 **بررسی کیف پول‌های کاربران**\n\n"
@@ -309,25 +325,22 @@ async def check_wallets_command(message: Message):
     await message.answer(result)
 
 @dp.message(Command("resetdb"))
-async def reset_db_command(message: Message):
+async def reset_db_command(message: Message, cluster_workers: int = 0):
     """ریست دیتابیس"""
-    admin_ids_str = os.getenv("ADMIN_IDS", "")
-    if not admin_ids_str:
+    if not is_admin(message.from_user.id):
         return
     
-    admin_ids = [int(id_str.strip()) for id_str in admin_ids_str.split(",") if id_str.strip()]
-    if message.from_user.id not in admin_ids:
+    # در cluster.py بقیه workerها با اتصال، کش و FSM خودشان روی فایل حذف‌شده ادامه می‌دادند
+    if cluster_workers:
+        await message.answer(
+            f"⛔ بات با {cluster_workers} پردازه (cluster.py) اجرا می‌شود؛ ریست دیتابیس فقط در اجرای تک‌پردازه‌ای ممکن است.\n"
+            "بات را متوقف کنید، فایل دیتابیس را حذف کنید و دوباره اجرا کنید."
+        )
         return
     
-    # حذف و ایجاد مجدد دیتابیس
-    import os
-    if os.path.exists('finance_bot.db'):
-        os.remove('finance_bot.db')
-        print("🗑️ دیتابیس قدیمی حذف شد")
-    
-    # ایجاد مجدد دیتابیس
-    global db
-    db = Database()
+    # حذف و ایجاد مجدد دیتابیس روی همان نمونه مشترک (همه handlerها اتصال جدید را می‌بینند)
+    await db.reset()
+    print("🗑️ دیتابیس قدیمی حذف و دوباره ساخته شد")
     
     await message.answer(
         "✅ دیتابیس با موفقیت ریست شد!\n\n"
@@ -340,31 +353,18 @@ async def reset_db_command(message: Message):
 @dp.message(Command("dbinfo"))
 async def db_info_command(message: Message):
     """اطلاعات دیتابیس"""
-    admin_ids_str = os.getenv("ADMIN_IDS", "")
-    if not admin_ids_str:
+    if not is_admin(message.from_user.id):
         return
     
-    admin_ids = [int(id_str.strip()) for id_str in admin_ids_str.split(",") if id_str.strip()]
-    if message.from_user.id not in admin_ids:
-        return
-    
-    cursor = db.conn.cursor()
-    
-    # بررسی جداول
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-    tables = cursor.fetchall()
+    # بررسی جداول، ستون‌ها و تعداد رکوردها
+    tables = await db.get_schema_overview()
     
     info = "📊 **اطلاعات دیتابیس**\n\n"
     info += "**جدول‌های موجود:**\n"
     
-    for table in tables:
-        table_name = table[0]
+    for table_name, columns, row_count in tables:
         info += f"  📁 {table_name}\n"
         
-        # بررسی ستون‌های هر جدول
-        cursor.execute(f"PRAGMA table_info({table_name})")
-        columns = cursor.fetchall()
-        
         for col in columns:
             col_id, col_name, col_type, notnull, default_val, pk = col
             info += f"    • {col_name} ({col_type})"
@@ -373,55 +373,55 @@ async def db_info_command(message: Message):
             info += "\n"
         
         # تعداد رکوردها
-        cursor.execute(f"SELECT COUNT(*) FROM {table_name}")
-        row_count = cursor.fetchone()[0]
         info += f"    📈 تعداد رکوردها: {row_count}\n\n"
     
     # اطلاعات فایل
-    import os
-    if os.path.exists('finance_bot.db'):
-        size = os.path.getsize('finance_bot.db')
+    if os.path.exists(db.db_name):
+        size = os.path.getsize(db.db_name)
         info += f"**اطلاعات فایل:**\n"
         info += f"  📏 حجم: {size:,} بایت ({size/1024/1024:.2f} مگابایت)\n"
-        info += f"  📅 آخرین تغییر: {os.path.getmtime('finance_bot.db'):.0f}"
-    
+        info += f"  📅 آخرین تغییر: {os.path.getmtime(db.db_name):.0f}\n\n"
+
+    # کارایی کش کاربران
+    cache = db.cache_stats()
+    info += f"**کش کاربران:**\n"
+    info += f"  👥 {cache['size']:,} / {cache['max_size']:,}\n"
+    info += f"  🎯 hit: {cache['hits']:,} | miss: {cache['misses']:,} ({cache['hit_rate']:.1%})\n"
+    info += f"  ♻️ invalidations: {cache['invalidations']:,}\n\n"
+
+    # کش وضعیت FSM
+    fsm = storage.stats()
+    info += f"**وضعیت FSM:**\n"
+    info += f"  👥 {fsm['size']:,} / {fsm['max_size']:,} | 💾 unsaved: {fsm['dirty']:,}\n"
+    info += f"  🗑️ evictions: {fsm['evictions']:,} | ⌛ expired: {fsm['expired']:,}\n\n"
+
+    # وضعیت صف پیام‌های خروجی
+    outbox_stats = await db.get_outbox_stats()
+    info += f"**صف پیام‌ها:**\n"
+    info += f"  ⏳ pending: {outbox_stats.get('pending', 0):,} | 📤 sending: {outbox_stats.get('sending', 0):,}\n"
+    info += f"  ✅ sent: {outbox_stats.get('sent', 0):,} | 💀 dead: {outbox_stats.get('dead', 0):,}"
+
     await message.answer(info)
 
 @dp.message(Command("list_users"))
-async def list_users_command(message: Message):
+async def list_users_command(message: Message, user_ctx: UserContext):
     """لیست تمام کاربران - دستور جدید"""
-    admin_ids_str = os.getenv("ADMIN_IDS", "")
-    if not admin_ids_str:
-        return
-    
-    admin_ids = [int(id_str.strip()) for id_str in admin_ids_str.split(",") if id_str.strip()]
-    if message.from_user.id not in admin_ids:
+    if not is_admin(message.from_user.id):
         return
     
     # تشخیص زبان ادمین
-    user_id = message.from_user.id
-    admin_data = db.get_user(user_id)
-    admin_language = admin_data[1] if admin_data else 'fa'
-    
-    cursor = db.conn.cursor()
-    cursor.execute("SELECT COUNT(*) FROM users")
-    total_users = cursor.fetchone()[0]
+    user_id = user_ctx.user_id
+    admin_language = user_ctx.language if user_ctx.exists else 'fa'
     
-    cursor.execute("""
-        SELECT user_id, full_name, email, phone, wallet_address, balance, registered_at 
-        FROM users 
-        ORDER BY registered_at DESC 
-        LIMIT 15
-    """)
-    
-    users = cursor.fetchall()
+    total_users = await db.get_users_count()
+    users = await db.get_all_users(15)
     
     if users:
         if admin_language == 'fa':
             result_text = f"📋 **لیست کاربران - کل: {total_users} نفر**\n\n"
             
             for user in users:
-                user_id, full_name, email, phone, wallet, balance, reg_date = user
+                user_id, _, full_name, email, phone, wallet, balance, reg_date = user
                 
                 # نمایش کیف پول اگر وجود دارد
                 wallet_display = ""
@@ -447,7 +447,7 @@ async def list_users_command(message: Message):
             result_text = f"📋 **قائمة المستخدمين - الإجمالي: {total_users} مستخدم**\n\n"
             
             for user in users:
-                user_id, full_name, email, phone, wallet, balance, reg_date = user
+                user_id, _, full_name, email, phone, wallet, balance, reg_date = user
                 
                 wallet_display = ""
                 if wallet and wallet.strip():
@@ -472,7 +472,7 @@ async def list_users_command(message: Message):
             result_text = f"📋 **Users List - Total: {total_users} users**\n\n"
             
             for user in users:
-                user_id, full_name, email, phone, wallet, balance, reg_date = user
+                user_id, _, full_name, email, phone, wallet, balance, reg_date = user
                 
                 wallet_display = ""
                 if wallet and wallet.strip():
@@ -503,53 +503,25 @@ async def list_users_command(message: Message):
             await message.answer("❌ No users found.")
 
 # Handler برای دستور /user_
-@dp.message(F.text.regexp(r'^/user_\d+$'))
-async def handle_user_command(message: Message):
+@deep_commands.verb('user')
+async def handle_user_command(message: Message, deep_command: DeepCommand, user_ctx: UserContext):
     """مشاهده جزئیات کامل یک کاربر"""
-    admin_ids_str = os.getenv("ADMIN_IDS", "")
-    if not admin_ids_str:
-        return
-    
-    admin_ids = [int(id_str.strip()) for id_str in admin_ids_str.split(",") if id_str.strip()]
-    if message.from_user.id not in admin_ids:
-        return
-    
     try:
-        user_id = int(message.text.split('_')[1])
+        user_id = deep_command.id
         
-        cursor = db.conn.cursor()
-        cursor.execute("""
-            SELECT user_id, language, full_name, email, phone, wallet_address, balance, registered_at 
-            FROM users 
-            WHERE user_id = ?
-        """, (user_id,))
-        
-        user = cursor.fetchone()
+        user = await db.get_user_details(user_id)
         
         if user:
             user_id, language, full_name, email, phone, wallet, balance, reg_date = user
             
             # دریافت سرمایه‌گذاری‌های کاربر
-            cursor.execute("""
-                SELECT COUNT(*), SUM(amount) 
-                FROM investments 
-                WHERE user_id = ? AND status = 'active'
-            """, (user_id,))
-            inv_count, inv_total = cursor.fetchone()
-            inv_count = inv_count or 0
-            inv_total = inv_total or 0
+            inv_count, inv_total, _ = await db.get_user_portfolio(user_id)
             
             # دریافت تیکت‌های کاربر
-            cursor.execute("""
-                SELECT COUNT(*)
-                FROM tickets 
-                WHERE user_id = ?
-            """, (user_id,))
-            ticket_count = cursor.fetchone()[0] or 0
+            ticket_count = await db.get_user_tickets_count(user_id)
             
             # تشخیص زبان ادمین برای نمایش پیام
-            admin_data = db.get_user(message.from_user.id)
-            admin_language = admin_data[1] if admin_data else 'fa'
+            admin_language = user_ctx.language if user_ctx.exists else 'fa'
             
             if admin_language == 'fa':
                 details = (
@@ -661,8 +633,7 @@ async def handle_user_command(message: Message):
             
             await message.answer(details)
         else:
-            admin_data = db.get_user(message.from_user.id)
-            admin_language = admin_data[1] if admin_data else 'fa'
+            admin_language = user_ctx.language if user_ctx.exists else 'fa'
             
             if admin_language == 'fa':
                 await message.answer("❌ کاربر یافت نشد.")
@@ -675,32 +646,15 @@ async def handle_user_command(message: Message):
         await message.answer(f"❌ خطا: {str(e)}")
 
 # Handler برای دستور /find_
-@dp.message(F.text.regexp(r'^/find_.+$'))
-async def find_user_command(message: Message):
+@deep_commands.verb('find', text=True)
+async def find_user_command(message: Message, deep_command: DeepCommand, user_ctx: UserContext):
     """دستور find برای جستجوی کاربر"""
-    admin_ids_str = os.getenv("ADMIN_IDS", "")
-    if not admin_ids_str:
-        return
-    
-    admin_ids = [int(id_str.strip()) for id_str in admin_ids_str.split(",") if id_str.strip()]
-    if message.from_user.id not in admin_ids:
-        return
-    
-    search_term = message.text[6:]  # حذف /find_
+    search_term = deep_command.argument
     
-    cursor = db.conn.cursor()
-    cursor.execute("""
-        SELECT user_id, full_name, email, phone, wallet_address, registered_at 
-        FROM users 
-        WHERE full_name LIKE ? OR email LIKE ? OR phone LIKE ? OR wallet_address LIKE ?
-        LIMIT 15
-    """, (f'%{search_term}%', f'%{search_term}%', f'%{search_term}%', f'%{search_term}%'))
-    
-    results = cursor.fetchall()
+    results = await db.search_users(search_term, 15)
     
     # تشخیص زبان ادمین
-    admin_data = db.get_user(message.from_user.id)
-    admin_language = admin_data[1] if admin_data else 'fa'
+    admin_language = user_ctx.language if user_ctx.exists else 'fa'
     
     if results:
         if admin_language == 'fa':
@@ -780,19 +734,18 @@ async def find_user_command(message: Message):
             await message.answer("❌ No users found.")
 
 # هندلرهای منوی اصلی
-@dp.message(F.text.in_(["👤 Profile", "👤 پروفایل", "👤 الملف الشخصي"]))
-async def handle_profile(message: Message, state: FSMContext):
-    await profile_menu(message, state)
+@dp.message(Button('profile'))
+async def handle_profile(message: Message, state: FSMContext, user_ctx: UserContext):
+    await profile_menu(message, state, user_ctx)
 
-@dp.message(F.text.in_(["🎁 Invite Friends", "🎁 دعوت از دوستان", "🎁 دعوة الأصدقاء"]))
-async def handle_referral(message: Message, state: FSMContext):
+@dp.message(Button('invite_friends'))
+async def handle_referral(message: Message, state: FSMContext, user_ctx: UserContext):
     from handlers.referral import referral_menu
-    await referral_menu(message)
+    await referral_menu(message, user_ctx)
 
-@dp.message(F.text.in_(["⚙️ Settings", "⚙️ تنظیمات", "⚙️ الإعدادات"]))
-async def handle_settings(message: Message):
-    user_id = message.from_user.id
-    language = db.get_user_language(user_id)
+@dp.message(Button('settings'))
+async def handle_settings(message: Message, user_ctx: UserContext):
+    language = user_ctx.language
     
     if language == 'fa':
         await message.answer("⚙️ **تنظیمات**\n\nاین بخش به زودی فعال خواهد شد...")
@@ -802,49 +755,55 @@ async def handle_settings(message: Message):
         await message.answer("⚙️ **Settings**\n\nThis section will be available soon...")
 
 # هندلرهای پروفایل
-@dp.message(F.text.in_(["👁️ مشاهده اطلاعات", "👁️ View Profile", "👁️ عرض الملف"]))
-async def handle_view_profile(message: Message):
-    await view_profile(message)
+@dp.message(Button('view_profile'))
+async def handle_view_profile(message: Message, user_ctx: UserContext):
+    await view_profile(message, user_ctx)
 
-@dp.message(F.text.in_(["✏️ ویرایش اطلاعات", "✏️ Edit Profile", "✏️ تعديل الملف"]))
-async def handle_edit_profile_menu(message: Message):
-    await edit_profile_menu(message)
+@dp.message(Button('edit_profile'))
+async def handle_edit_profile_menu(message: Message, user_ctx: UserContext):
+    await edit_profile_menu(message, user_ctx)
 
 # هندلرهای ویرایش پروفایل
-@dp.message(F.text.in_(["✏️ ویرایش نام", "✏️ Edit Name", "✏️ تعديل الاسم"]))
-async def handle_edit_name(message: Message, state: FSMContext):
-    await edit_name_start(message, state)
+@dp.message(Button('edit_name'))
+async def handle_edit_name(message: Message, state: FSMContext, user_ctx: UserContext):
+    await edit_name_start(message, state, user_ctx)
 
-@dp.message(F.text.in_(["📧 ویرایش ایمیل", "📧 Edit Email", "📧 تعديل البريد"]))
-async def handle_edit_email(message: Message, state: FSMContext):
-    await edit_email_start(message, state)
+@dp.message(Button('edit_email'))
+async def handle_edit_email(message: Message, state: FSMContext, user_ctx: UserContext):
+    await edit_email_start(message, state, user_ctx)
 
-@dp.message(F.text.in_(["📱 ویرایش تلفن", "📱 Edit Phone", "📱 تعديل الهاتف"]))
-async def handle_edit_phone(message: Message, state: FSMContext):
-    await edit_phone_start(message, state)
+@dp.message(Button('edit_phone'))
+async def handle_edit_phone(message: Message, state: FSMContext, user_ctx: UserContext):
+    await edit_phone_start(message, state, user_ctx)
 
-@dp.message(F.text.in_(["💰 ویرایش کیف پول", "💰 Edit Wallet", "💰 تعديل المحفظة"]))
-async def handle_edit_wallet(message: Message, state: FSMContext):
-    await edit_wallet_start(message, state)
+@dp.message(Button('edit_wallet'))
+async def handle_edit_wallet(message: Message, state: FSMContext, user_ctx: UserContext):
+    await edit_wallet_start(message, state, user_ctx)
 
 # هندلر برای contact (اشتراک‌گذاری شماره تماس)
-@dp.message(F.contact)
-async def handle_contact(message: Message, state: FSMContext):
+@dp.message(contact_filter)
+async def handle_contact(message: Message, state: FSMContext, user_ctx: UserContext):
     """هندل کردن شماره تماس از دکمه اشتراک‌گذاری"""
     current_state = await state.get_state()
     
     # اگر در حال ثبت‌نام هست
     if current_state == RegistrationStates.waiting_for_phone.state:
-        await process_phone(message, state)
+        await process_phone(message, state, user_ctx)
     # اگر در حال ویرایش پروفایل هست
     elif current_state == ProfileStates.waiting_for_new_phone.state:
-        await edit_phone_finish(message, state)
+        await edit_phone_finish(message, state, user_ctx)
+
+# «🔙 Back» وسط ایجاد تیکت یا سرمایه‌گذاری به منوی همان بخش برمی‌گردد و در بقیه stateها به منوی اصلی؛
+# این handlerها باید قبل از handle_back_to_main ثبت شوند
+for ticket_state in TICKET_STATES:
+    dp.message.register(back_to_support_menu, ticket_state, Button('back'))
+for investment_state in InvestmentStates.__states__:
+    dp.message.register(back_to_investment_menu, investment_state, Button('back'))
 
 # هندلر برای بازگشت به منوی اصلی
-@dp.message(F.text.in_(["🔙 بازگشت", "🔙 Back", "🔙 رجوع"]))
-async def handle_back_to_main(message: Message, state: FSMContext):
-    user_id = message.from_user.id
-    language = db.get_user_language(user_id)
+@dp.message(Button('back'))
+async def handle_back_to_main(message: Message, state: FSMContext, user_ctx: UserContext):
+    language = user_ctx.language
     
     await state.clear()
     if language == 'fa':
@@ -855,15 +814,15 @@ async def handle_back_to_main(message: Message, state: FSMContext):
         await message.answer("🔙 Back to main menu", reply_markup=get_main_menu_keyboard(language))
 
 # هندلر برای skip شماره تلفن (هم در ثبت‌نام هم در ویرایش)
-@dp.message(F.text.in_(["⏭️ رد کردن", "⏭️ Skip", "⏭️ تخطي"]))
-async def handle_skip_phone(message: Message, state: FSMContext):
+@dp.message(Button('skip'))
+async def handle_skip_phone(message: Message, state: FSMContext, user_ctx: UserContext):
     """هندل کردن دکمه skip برای شماره تلفن"""
     current_state = await state.get_state()
     
     if current_state == RegistrationStates.waiting_for_phone.state:
-        await process_phone(message, state)
+        await process_phone(message, state, user_ctx)
     elif current_state == ProfileStates.waiting_for_new_phone.state:
-        await edit_phone_finish(message, state)
+        await edit_phone_finish(message, state, user_ctx)
 
 # ثبت handlerهای ثبت‌نام
 dp.message.register(process_full_name, RegistrationStates.waiting_for_full_name)
@@ -895,7 +854,7 @@ async def main():
     except Exception as e:
         print(f"❌ Error: {type(e).__name__}: {e}")
     finally:
-        db.close()
+        close_db()
 
 if __name__ == "__main__":
     asyncio.run(main())
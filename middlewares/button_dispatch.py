@@ -0,0 +1,168 @@
+# middlewares/button_dispatch.py
+"""
+رساندن دکمه‌های کیبورد به handler با یک جستجوی dict.
+
+بدون این middleware هر پیام متنی فیلترهای handlerهای dp و همه routerها را به ترتیب
+امتحان می‌کند تا اولی بخورد (برای دکمه‌های router آخر چند ده فیلتر). ButtonDispatcher
+روی اولین پیام درخت routerها را به همان ترتیب aiogram مرور می‌کند و برای هر متن دکمه
+(Button در keyboards/buttons.py) از پیش حساب می‌کند کدام handler برنده می‌شود:
+
+- handler دکمه (بدون state) در همه stateها
+- handler یک state که قبل از handler دکمه ثبت شده، در همان state برنده است؛ مثلا در
+  RegistrationStates.waiting_for_full_name متن «💰 Investment» به process_full_name می‌رسد
+- اگر برنده از جدول معلوم نباشد (فیلتر دیگری کنار Button یا state، فیلتر یا outer middleware
+  روی یک router) پیام همان مسیر معمول aiogram را می‌رود
+
+handler با فیلتر ناشناخته فقط وقتی رد می‌شود که یکی از فیلترهایش ثابت‌شده روی آن متن
+نخورد (Command/CommandStart، deep_commands.filter، contact_filter)؛ در غیر این صورت
+FALLBACK. benchmarks/dispatch.py نتیجه جدول را برای همه دکمه‌ها و stateها با مسیر معمول
+aiogram مقایسه می‌کند.
+
+جدول به دو ویژگی داخلی aiogram تکیه دارد (TelegramEventObserver._handler و
+_resolve_middlewares)؛ اگر نسخه aiogram آن‌ها را نداشته باشد جدول خاموش می‌شود.
+
+این middleware باید آخرین outer middleware روی dp.message باشد.
+خاموش کردن: BUTTON_DISPATCH=0
+"""
+import os
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware, F, Router
+from aiogram.dispatcher.event.bases import SkipHandler
+from aiogram.filters import Command
+from aiogram.fsm.state import State
+from aiogram.types import Message, TelegramObject
+
+from keyboards.buttons import Button
+from utils.deep_commands import DeepCommands
+
+BUTTON_DISPATCH = os.getenv("BUTTON_DISPATCH", "1") != "0"
+
+# برنده از جدول معلوم نیست؛ مسیر معمول aiogram
+FALLBACK = None
+
+# پیام contact متن ندارد؛ handler ثبت‌شده با این فیلتر روی متن دکمه نمی‌خورد
+contact_filter = F.contact
+
+# فیلتر سراسری یا outer middleware روی router؛ handlerهای آن router هیچ‌وقت رد نمی‌شوند
+OPAQUE = object()
+
+def supported(router: Router) -> bool:
+    """نسخه aiogram ویژگی‌های داخلی مورد نیاز جدول را دارد"""
+    observer = router.message
+    return hasattr(getattr(observer, '_handler', None), 'filters') and callable(
+        getattr(observer, '_resolve_middlewares', None)
+    )
+
+def never_matches(callback, text) -> bool:
+    """فیلتر ثابت‌شده روی این متن False است"""
+    if isinstance(callback, Command):
+        # Command و CommandStart فقط متن شروع‌شده با prefix دستور را می‌پذیرند
+        return text[:1] not in callback.prefix
+    if isinstance(getattr(callback, '__self__', None), DeepCommands):
+        return callback.__func__ is DeepCommands.filter and callback.__self__.parse(text) is None
+    return callback == contact_filter.resolve
+
+def message_handlers(router: Router, opaque=False):
+    """(router, handler, texts, state, other) به همان ترتیبی که aiogram handlerها را امتحان می‌کند"""
+    observer = router.message
+    # فیلتر سراسری (router.message.filter) یا outer middleware روی زیر-router
+    opaque = opaque or bool(observer._handler.filters) or (
+        router.parent_router is not None and len(observer.outer_middleware) > 0
+    )
+    for handler in observer.handlers:
+        texts, state, other = None, None, [OPAQUE] if opaque else []
+        for event_filter in handler.filters or ():
+            callback = event_filter.callback
+            if isinstance(callback, Button):
+                texts = callback.texts if texts is None else texts & callback.texts
+            elif isinstance(callback, State) and state is None:
+                state = None if callback.state == '*' else callback.state
+            else:
+                other.append(callback)
+        yield router, handler, texts, state, tuple(other)
+    for sub_router in router.sub_routers:
+        yield from message_handlers(sub_router, opaque)
+
+def resolve(entries, text, raw_state):
+    """ردیف اولین handler که aiogram برای این متن در این state اجرا می‌کند"""
+    for entry in entries:
+        router, handler, texts, state, other = entry
+        if texts is not None and text not in texts:
+            continue
+        if state is not None and state != raw_state:
+            continue
+        if other:
+            if OPAQUE not in other and any(never_matches(callback, text) for callback in other):
+                continue
+            return FALLBACK
+        return entry
+    return FALLBACK
+
+def build_table(root: Router):
+    """متن دکمه → (handler پیش‌فرض، {state: handler متفاوت در آن state})"""
+    entries = list(message_handlers(root))
+    states = {state for _, _, _, state, _ in entries if state is not None}
+    labels = set().union(*(texts for _, _, texts, _, _ in entries if texts is not None))
+
+    table = {}
+    for text in labels:
+        default = resolve(entries, text, None)
+        by_state = {}
+        for state in states:
+            target = resolve(entries, text, state)
+            if target is not default:
+                by_state[state] = target
+        table[text] = (default, by_state)
+    return table
+
+class ButtonDispatcher(BaseMiddleware):
+    """
+    outer middleware روی dp.message: پیامی که متنش یک دکمه است مستقیم به handler
+    از پیش حساب‌شده می‌رسد و فیلترهای بقیه handlerها امتحان نمی‌شوند.
+    """
+
+    def __init__(self, root: Router, enabled: bool = BUTTON_DISPATCH):
+        if enabled and not supported(root):
+            print("⚠️ ButtonDispatcher disabled: this aiogram version lacks the observer internals it uses")
+            enabled = False
+        self.root = root
+        self.enabled = enabled
+        self.table = None
+
+    def rebuild(self):
+        """ساخت دوباره جدول (بعد از اضافه شدن handler یا router)"""
+        self.table = build_table(self.root)
+        return self.table
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: Message,
+        data: Dict[str, Any],
+    ) -> Any:
+        if not self.enabled:
+            return await handler(event, data)
+        if self.table is None:
+            self.rebuild()
+
+        entry = self.table.get(event.text)
+        if entry is None:
+            return await handler(event, data)
+        default, by_state = entry
+        target = by_state.get(data.get("raw_state"), default) if by_state else default
+        if target is FALLBACK:
+            return await handler(event, data)
+
+        # همان کاری که Router.propagate_event و TelegramEventObserver.trigger برای handler برنده می‌کنند
+        router, handler_object = target[0], target[1]
+        observer = router.message
+        data["event_router"] = router
+        data["handler"] = handler_object
+        try:
+            wrapped = observer.outer_middleware.wrap_middlewares(
+                observer._resolve_middlewares(), handler_object.call
+            )
+            return await wrapped(event, data)
+        except SkipHandler:
+            return await handler(event, data)
@@ -0,0 +1,26 @@
+# middlewares/scheduled_sends.py
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.types import Chat, TelegramObject, Update
+
+from utils import outbox
+
+class ScheduledSendCanceller(BaseMiddleware):
+    """
+    outer middleware روی update: وقتی کاربر پیام یا دکمه جدیدی می‌فرستد، بخش‌های باقی‌مانده
+    معرفی و «درباره ما» که با outbox.send_sequence زمان‌بندی شده‌اند لغو می‌شوند.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        chat: Optional[Chat] = data.get("event_chat")
+        if chat is not None and isinstance(event, Update) and (event.message or event.callback_query):
+            cancelled = await outbox.cancel_scheduled(chat.id)
+            if cancelled:
+                print(f"⏭️ {cancelled} scheduled messages to {chat.id} cancelled")
+        return await handler(event, data)
@@ -0,0 +1,66 @@
+# middlewares/user_context.py
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, User
+
+from config import is_admin
+from database import get_db
+
+@dataclass(frozen=True)
+class UserContext:
+    """اطلاعات کاربرِ آپدیت فعلی که فقط یک بار از دیتابیس خوانده می‌شود"""
+    user_id: int
+    language: str
+    full_name: Optional[str]
+    wallet_address: Optional[str]
+    balance: float
+    is_registered: bool
+    is_admin: bool
+    # False اگر بات را مسدود کرده بود (utils/broadcast.py و utils/outbox.py)
+    is_active: bool
+    row: Optional[tuple]
+
+    @property
+    def exists(self) -> bool:
+        """ردیف کاربر در دیتابیس وجود دارد (حتی اگر ثبت‌نام کامل نشده باشد)"""
+        return self.row is not None
+
+def build_user_context(user_id: int, row) -> UserContext:
+    """ساخت UserContext از ردیف get_user (ستون‌ها به ترتیب SELECT در Database.get_user)"""
+    if row is None:
+        return UserContext(user_id, 'en', None, None, 0.0, False, is_admin(user_id), True, None)
+
+    return UserContext(
+        user_id=user_id,
+        language=row[1] or 'en',
+        full_name=row[2],
+        wallet_address=row[5],
+        balance=row[6] or 0.0,
+        is_registered=bool(row[2]),
+        is_admin=is_admin(user_id),
+        is_active=row[8] != 0,
+        row=row,
+    )
+
+class UserContextLoader(BaseMiddleware):
+    """
+    outer middleware روی update: ردیف کاربر را یک بار می‌خواند و به صورت user_ctx
+    به handlerها می‌دهد تا get_user / get_user_language / is_admin جداگانه صدا زده نشوند.
+    """
+
+    def __init__(self, db=None):
+        self.db = db or get_db()
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        user: Optional[User] = data.get("event_from_user")
+        if user is not None:
+            row = await self.db.get_user(user.id)
+            data["user_ctx"] = build_user_context(user.id, row)
+        return await handler(event, data)
@@ -0,0 +1,517 @@
+# migrations.py
+"""
+موتور migration دیتابیس بر اساس PRAGMA user_version
+
+هر مرحله یک شماره نسخه دارد و داخل یک تراکنش اجرا می‌شود؛ بعد از اجرای موفق،
+user_version به همان شماره می‌رسد و دیگر تکرار نمی‌شود.
+مراحلی که backfill دارند، داده‌ها را در دسته‌های BATCH_SIZE تایی و هر دسته در یک تراکنش
+به‌روز می‌کنند؛ backfill باید idempotent باشد تا اگر وسط کار قطع شد، از همان‌جا ادامه پیدا کند.
+
+برای افزودن تغییر جدید در ساختار، فقط یک مرحله به انتهای MIGRATIONS اضافه کنید.
+"""
+import os
+import random
+import sqlite3
+import string
+
+BATCH_SIZE = int(os.getenv("DB_MIGRATION_BATCH", "500"))
+
+# ===== توابع کمکی =====
+
+def _columns(cursor, table):
+    cursor.execute(f"PRAGMA table_info({table})")
+    return {col[1] for col in cursor.fetchall()}
+
+def _add_column(cursor, table, column, definition):
+    """اضافه کردن ستون اگر وجود ندارد؛ True یعنی ستون تازه اضافه شد"""
+    if column in _columns(cursor, table):
+        return False
+    cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+    return True
+
+def _batched_ids(conn, query, params=()):
+    """شناسه‌ها را دسته‌دسته (بر اساس ترتیب user_id) برمی‌گرداند"""
+    last_id = 0
+    while True:
+        rows = conn.execute(query, (*params, last_id, BATCH_SIZE)).fetchall()
+        if not rows:
+            return
+        yield [row[0] for row in rows]
+        last_id = rows[-1][0]
+
+# ===== مراحل migration =====
+
+def _v1_base_schema(cursor):
+    """جداول اصلی (برای دیتابیس جدید ساختار کامل، برای دیتابیس قدیمی بدون تغییر)"""
+    # جدول کاربران
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            user_id INTEGER PRIMARY KEY,
+            language TEXT DEFAULT 'en',
+            full_name TEXT,
+            email TEXT,
+            phone TEXT,
+            wallet_address TEXT,
+            balance REAL DEFAULT 0.0,
+            registered_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            is_active INTEGER DEFAULT 1,
+            last_login TIMESTAMP,
+            referral_code TEXT UNIQUE,
+            referred_by INTEGER,
+            total_invested REAL DEFAULT 0.0,
+            total_withdrawn REAL DEFAULT 0.0
+        )
+    ''')
+
+    # جدول سرمایه‌گذاری‌ها
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS investments (
+            investment_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            package TEXT,
+            amount REAL,
+            duration INTEGER,
+            start_date TIMESTAMP,
+            end_date TIMESTAMP,
+            status TEXT DEFAULT 'pending',
+            monthly_profit_percent REAL,
+            transaction_receipt TEXT,
+            receipt_type TEXT DEFAULT 'none',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            confirmed_by INTEGER,
+            confirmed_at TIMESTAMP,
+            notes TEXT,
+            FOREIGN KEY (user_id) REFERENCES users (user_id),
+            FOREIGN KEY (confirmed_by) REFERENCES users (user_id)
+        )
+    ''')
+
+    # جدول تیکت‌ها
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS tickets (
+            ticket_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            subject TEXT,
+            message TEXT,
+            status TEXT DEFAULT 'open',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            admin_response TEXT,
+            responded_at TIMESTAMP,
+            responded_by INTEGER,
+            priority TEXT DEFAULT 'normal',
+            category TEXT,
+            FOREIGN KEY (user_id) REFERENCES users (user_id),
+            FOREIGN KEY (responded_by) REFERENCES users (user_id)
+        )
+    ''')
+
+    # جدول تراکنش‌ها
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS transactions (
+            transaction_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            type TEXT,
+            amount REAL,
+            description TEXT,
+            status TEXT DEFAULT 'pending',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            completed_at TIMESTAMP,
+            wallet_address TEXT,
+            transaction_hash TEXT,
+            admin_notes TEXT,
+            processed_by INTEGER,
+            FOREIGN KEY (user_id) REFERENCES users (user_id),
+            FOREIGN KEY (processed_by) REFERENCES users (user_id)
+        )
+    ''')
+
+    # جدول پرداخت سود ماهانه
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS profit_payments (
+            payment_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            investment_id INTEGER,
+            amount REAL,
+            payment_date TIMESTAMP,
+            status TEXT DEFAULT 'pending',
+            wallet_address TEXT,
+            transaction_hash TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (user_id),
+            FOREIGN KEY (investment_id) REFERENCES investments (investment_id)
+        )
+    ''')
+
+    # جدول اعلان‌ها
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS notifications (
+            notification_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            type TEXT,
+            title TEXT,
+            message TEXT,
+            is_read INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            related_id INTEGER,
+            FOREIGN KEY (user_id) REFERENCES users (user_id)
+        )
+    ''')
+
+    # جدول لاگ‌های سیستم
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS system_logs (
+            log_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            action TEXT,
+            details TEXT,
+            ip_address TEXT,
+            user_agent TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (user_id)
+        )
+    ''')
+
+def _v2_investment_columns(cursor):
+    """ستون‌های رسید و تایید سرمایه‌گذاری (قبلاً در update_database.py)"""
+    _add_column(cursor, 'investments', 'transaction_receipt', 'TEXT')
+    _add_column(cursor, 'investments', 'receipt_type', "TEXT DEFAULT 'none'")
+    _add_column(cursor, 'investments', 'confirmed_by', 'INTEGER')
+    _add_column(cursor, 'investments', 'confirmed_at', 'TIMESTAMP')
+    _add_column(cursor, 'investments', 'notes', 'TEXT')
+
+    # ALTER TABLE پیش‌فرض CURRENT_TIMESTAMP را قبول نمی‌کند؛ از start_date پر می‌کنیم
+    if _add_column(cursor, 'investments', 'created_at', 'TIMESTAMP'):
+        cursor.execute("UPDATE investments SET created_at = start_date WHERE created_at IS NULL")
+    if _add_column(cursor, 'investments', 'updated_at', 'TIMESTAMP'):
+        cursor.execute("UPDATE investments SET updated_at = start_date WHERE updated_at IS NULL")
+
+def _v3_ticket_columns(cursor):
+    """ستون‌های پاسخ‌دهنده، اولویت و دسته تیکت"""
+    _add_column(cursor, 'tickets', 'responded_by', 'INTEGER')
+    _add_column(cursor, 'tickets', 'priority', "TEXT DEFAULT 'normal'")
+    _add_column(cursor, 'tickets', 'category', 'TEXT')
+
+def _v4_user_referral_columns(cursor):
+    """ستون‌های رفرال و جدول referrals (قبلاً در fix_referral_db.py و /emergency_fix)"""
+    _add_column(cursor, 'users', 'is_active', 'INTEGER DEFAULT 1')
+    _add_column(cursor, 'users', 'last_login', 'TIMESTAMP')
+    _add_column(cursor, 'users', 'referred_by', 'INTEGER')
+    _add_column(cursor, 'users', 'total_invested', 'REAL DEFAULT 0.0')
+    _add_column(cursor, 'users', 'total_withdrawn', 'REAL DEFAULT 0.0')
+
+    # ALTER TABLE ستون UNIQUE را قبول نمی‌کند؛ یکتایی با ایندکس جداگانه
+    if _add_column(cursor, 'users', 'referral_code', 'TEXT'):
+        cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_users_referral_code ON users(referral_code)")
+
+    # جدول رفرال‌ها
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS referrals (
+            referral_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            referrer_id INTEGER,
+            referred_id INTEGER,
+            registered_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            status TEXT DEFAULT 'completed',
+            reward_amount REAL DEFAULT 0.0,
+            reward_paid INTEGER DEFAULT 0,
+            FOREIGN KEY (referrer_id) REFERENCES users (user_id),
+            FOREIGN KEY (referred_id) REFERENCES users (user_id),
+            UNIQUE(referred_id)
+        )
+    ''')
+
+def _legacy_referral_code(user_id):
+    random_part = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
+    return f"RAMO{user_id}{random_part}"
+
+def _v5_backfill_referral_codes(conn):
+    """کد رفرال برای کاربرانی که ندارند؛ هر دسته در یک تراکنش"""
+    updated = 0
+    batches = _batched_ids(conn, '''
+        SELECT user_id FROM users
+        WHERE (referral_code IS NULL OR referral_code = '') AND user_id > ?
+        ORDER BY user_id LIMIT ?
+    ''')
+
+    for user_ids in batches:
+        with conn:
+            for user_id in user_ids:
+                while True:
+                    try:
+                        conn.execute("UPDATE users SET referral_code = ? WHERE user_id = ?",
+                                     (_legacy_referral_code(user_id), user_id))
+                        break
+                    except sqlite3.IntegrityError:
+                        # کد تکراری؛ یک کد دیگر
+                        continue
+        updated += len(user_ids)
+
+    return updated
+
+def _v6_backfill_total_invested(conn):
+    """مقداردهی total_invested از سرمایه‌گذاری‌های فعال؛ هر دسته در یک تراکنش"""
+    updated = 0
+    batches = _batched_ids(conn, 'SELECT user_id FROM users WHERE user_id > ? ORDER BY user_id LIMIT ?')
+
+    for user_ids in batches:
+        placeholders = ','.join('?' * len(user_ids))
+        with conn:
+            conn.execute(f'''
+                UPDATE users
+                SET total_invested = COALESCE(
+                    (SELECT SUM(amount) FROM investments WHERE user_id = users.user_id AND status = 'active'),
+                    0.0
+                )
+                WHERE user_id IN ({placeholders})
+            ''', user_ids)
+        updated += len(user_ids)
+
+    return updated
+
+def _v7_secondary_indexes(cursor):
+    """ایندکس‌های مسیرهای پرتکرار (فیلتر بر اساس user_id، referrer_id و status)"""
+    # سرمایه‌گذاری‌ها
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_investments_user_created ON investments(user_id, created_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_investments_user_status ON investments(user_id, status)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_investments_status_start ON investments(status, start_date)")
+
+    # تیکت‌ها
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_tickets_user_created ON tickets(user_id, created_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_tickets_status_created ON tickets(status, created_at)")
+
+    # تراکنش‌ها، اعلان‌ها، پرداخت سود و لاگ‌ها
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_transactions_user_created ON transactions(user_id, created_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_notifications_user_created ON notifications(user_id, created_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_profit_payments_status_date ON profit_payments(status, payment_date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_system_logs_created ON system_logs(created_at)")
+
+    # رفرال‌ها (referred_id از قبل UNIQUE است)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_referrals_referrer ON referrals(referrer_id, registered_at)")
+
+    # آمار جدید برای query planner
+    cursor.execute("ANALYZE")
+
+def _v8_user_pagination(cursor):
+    """ایندکس صفحه‌بندی keyset کاربران و شمارنده نگهداری‌شده با trigger به جای COUNT(*)"""
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_registered ON users(registered_at, user_id)")
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS counters (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute("INSERT OR REPLACE INTO counters (name, value) SELECT 'users', COUNT(*) FROM users")
+
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_users_count_insert AFTER INSERT ON users
+        BEGIN
+            UPDATE counters SET value = value + 1 WHERE name = 'users';
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_users_count_delete AFTER DELETE ON users
+        BEGIN
+            UPDATE counters SET value = value - 1 WHERE name = 'users';
+        END
+    ''')
+
+def _v9_users_fts(cursor):
+    """
+    ایندکس متنی FTS5 روی نام، ایمیل، تلفن و کیف پول برای جستجوی ادمین.
+    جدول external-content است (داده فقط در users نگه داشته می‌شود) و triggerها آن را همگام نگه می‌دارند.
+    اگر sqlite بدون FTS5 ساخته شده باشد، این مرحله رد می‌شود و جستجو به LIKE برمی‌گردد.
+    """
+    try:
+        cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5(
+                full_name, email, phone, wallet_address,
+                content='users', content_rowid='user_id',
+                tokenize='unicode61 remove_diacritics 2',
+                prefix='2 3'
+            )
+        ''')
+    except sqlite3.OperationalError as e:
+        print(f"⚠️ FTS5 not available, admin search will use LIKE: {e}")
+        return
+
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_users_fts_insert AFTER INSERT ON users
+        BEGIN
+            INSERT INTO users_fts (rowid, full_name, email, phone, wallet_address)
+            VALUES (new.user_id, new.full_name, new.email, new.phone, new.wallet_address);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_users_fts_delete AFTER DELETE ON users
+        BEGIN
+            INSERT INTO users_fts (users_fts, rowid, full_name, email, phone, wallet_address)
+            VALUES ('delete', old.user_id, old.full_name, old.email, old.phone, old.wallet_address);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_users_fts_update AFTER UPDATE OF full_name, email, phone, wallet_address ON users
+        BEGIN
+            INSERT INTO users_fts (users_fts, rowid, full_name, email, phone, wallet_address)
+            VALUES ('delete', old.user_id, old.full_name, old.email, old.phone, old.wallet_address);
+            INSERT INTO users_fts (rowid, full_name, email, phone, wallet_address)
+            VALUES (new.user_id, new.full_name, new.email, new.phone, new.wallet_address);
+        END
+    ''')
+
+    # ساخت ایندکس برای کاربران فعلی
+    cursor.execute("INSERT INTO users_fts (users_fts) VALUES ('rebuild')")
+
+def _v10_legacy_referral_codes(cursor):
+    """نگهداری کدهای قدیمی RAMO بعد از تبدیل به کد امضاشده (tools/migrate_referral_codes.py)"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS legacy_referral_codes (
+            code TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES users (user_id)
+        )
+    ''')
+
+def _v11_broadcasts(cursor):
+    """اطلاعیه‌های همگانی و وضعیت ارسال به هر گیرنده (برای ادامه بعد از ری‌استارت)"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS broadcasts (
+            broadcast_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            admin_id INTEGER NOT NULL,
+            from_chat_id INTEGER NOT NULL,
+            message_id INTEGER NOT NULL,
+            language TEXT DEFAULT 'fa',
+            status TEXT DEFAULT 'running',
+            total INTEGER DEFAULT 0,
+            sent INTEGER DEFAULT 0,
+            failed INTEGER DEFAULT 0,
+            progress_message_id INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            finished_at TIMESTAMP
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS broadcast_recipients (
+            broadcast_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            status TEXT DEFAULT 'pending',
+            attempts INTEGER DEFAULT 0,
+            error TEXT,
+            updated_at TIMESTAMP,
+            PRIMARY KEY (broadcast_id, user_id)
+        ) WITHOUT ROWID
+    ''')
+    # گیرندگان باقی‌مانده یک اطلاعیه به ترتیب user_id
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_broadcast_recipients_status ON broadcast_recipients(broadcast_id, status, user_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_broadcasts_status ON broadcasts(status)")
+
+def _v12_outbox(cursor):
+    """صف پایدار پیام‌های خروجی (utils/outbox.py)"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS outbox (
+            outbox_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            chat_id INTEGER NOT NULL,
+            method TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            priority INTEGER DEFAULT 1,
+            status TEXT DEFAULT 'pending',
+            attempts INTEGER DEFAULT 0,
+            next_attempt_at REAL DEFAULT 0,
+            last_error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            sent_at TIMESTAMP
+        )
+    ''')
+    # پیام‌های آماده ارسال به ترتیب اولویت و زمان ثبت
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_outbox_pending ON outbox(priority, outbox_id) WHERE status = 'pending'")
+    # پیام‌های باز هر چت (برای حفظ ترتیب ارسال در هر چت)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_outbox_chat_open ON outbox(chat_id, outbox_id) WHERE status IN ('pending', 'sending')")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_outbox_status ON outbox(status, outbox_id)")
+
+def _v13_fsm_states(cursor):
+    """وضعیت FSM کاربران (utils/fsm_storage.py)"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS fsm_states (
+            storage_key TEXT PRIMARY KEY,
+            chat_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            state TEXT,
+            data TEXT,
+            updated_at REAL NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    # حذف وضعیت‌های رهاشده
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_fsm_states_updated ON fsm_states(updated_at)")
+
+# (نسخه، توضیح، تغییر ساختار داخل تراکنش، backfill دسته‌ای)
+MIGRATIONS = [
+    (1, "base schema", _v1_base_schema, None),
+    (2, "investment receipt/confirmation columns", _v2_investment_columns, None),
+    (3, "ticket responder/priority columns", _v3_ticket_columns, None),
+    (4, "user referral columns and referrals table", _v4_user_referral_columns, None),
+    (5, "backfill referral codes", None, _v5_backfill_referral_codes),
+    (6, "backfill users.total_invested", None, _v6_backfill_total_invested),
+    (7, "secondary indexes", _v7_secondary_indexes, None),
+    (8, "users keyset pagination index and counter", _v8_user_pagination, None),
+    (9, "users full-text search index", _v9_users_fts, None),
+    (10, "legacy referral codes table", _v10_legacy_referral_codes, None),
+    (11, "broadcasts and per-recipient progress", _v11_broadcasts, None),
+    (12, "outbound message queue", _v12_outbox, None),
+    (13, "persistent FSM storage", _v13_fsm_states, None),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+# ===== موتور migration =====
+
+def get_schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def pending_migrations(conn):
+    version = get_schema_version(conn)
+    return [(v, description) for v, description, _, _ in MIGRATIONS if v > version]
+
+def run_migrations(conn, target=None):
+    """
+    اجرای مراحل باقی‌مانده به ترتیب؛ لیست (نسخه، توضیح) مراحل اجرا شده را برمی‌گرداند.
+    BEGIN IMMEDIATE باعث می‌شود اگر چند پردازه هم‌زمان بالا بیایند، هر مرحله فقط یک بار اجرا شود.
+    """
+    target = LATEST_VERSION if target is None else target
+    applied = []
+
+    # سریع‌ترین مسیر: دیتابیس به‌روز است
+    if get_schema_version(conn) >= target:
+        return applied
+
+    for version, description, apply_schema, backfill in MIGRATIONS:
+        if version > target:
+            break
+
+        if conn.in_transaction:
+            conn.commit()
+
+        if backfill is not None:
+            if get_schema_version(conn) >= version:
+                continue
+            count = backfill(conn)
+            print(f"🔄 Migration {version} backfill: {count} rows")
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # شاید پردازه دیگری همین حالا این مرحله را اجرا کرده باشد
+            if get_schema_version(conn) >= version:
+                conn.rollback()
+                continue
+
+            if apply_schema is not None:
+                apply_schema(conn.cursor())
+            conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+        applied.append((version, description))
+        print(f"✅ Migration {version}: {description}")
+
+    return applied
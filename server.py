@@ -1,12 +1,126 @@
+"""
+سرور aiohttp: health check و بات در یک پردازه.
+
+اگر WEBHOOK_URL (یا RENDER_EXTERNAL_URL) تنظیم شده باشد بات در حالت webhook روی همین سرور اجرا می‌شود،
+وگرنه polling در پس‌زمینه همین پردازه اجرا می‌شود.
+
+متغیرها:
+    BOT_MODE                 webhook / polling (پیش‌فرض: webhook اگر آدرس عمومی موجود باشد)
+    WEBHOOK_URL              آدرس عمومی سرور، مثلاً https://bot.example.com
+    WEBHOOK_PATH             مسیر مخفی دریافت آپدیت‌ها (پیش‌فرض /webhook)
+    WEBHOOK_SECRET           توکنی که تلگرام در هدر X-Telegram-Bot-Api-Secret-Token می‌فرستد
+    WEBHOOK_MAX_CONNECTIONS  تعداد اتصال هم‌زمان تلگرام به سرور (۱ تا ۱۰۰)
+    WEBHOOK_MAX_UPDATES      حداکثر آپدیت در حال پردازش؛ بیشتر از آن درخواست منتظر می‌ماند
+    WEBHOOK_DRAIN_TIMEOUT    ثانیه‌های انتظار برای تمام شدن آپدیت‌های در حال پردازش هنگام خاموش شدن
+"""
+import asyncio
 import os
 from aiohttp import web
+from dotenv import load_dotenv
+
+from aiogram import Bot
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+
+load_dotenv()
+
+WEBHOOK_URL = os.getenv("WEBHOOK_URL") or os.getenv("RENDER_EXTERNAL_URL", "")
+BOT_MODE = os.getenv("BOT_MODE") or ("webhook" if WEBHOOK_URL else "polling")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET") or None
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40"))
+WEBHOOK_MAX_UPDATES = int(os.getenv("WEBHOOK_MAX_UPDATES", "100"))
+WEBHOOK_DRAIN_TIMEOUT = float(os.getenv("WEBHOOK_DRAIN_TIMEOUT", "25"))
 
 async def health_check(request):
     return web.Response(text='Bot is running')
 
-app = web.Application()
-app.router.add_get('/', health_check)
+async def set_webhook(bot: Bot, allowed_updates):
+    """ثبت webhook (مشترک server.py و cluster.py)؛ allowed_updates نوع آپدیت‌هایی است که routerها handler دارند"""
+    # بدون allowed_updates تلگرام همان فهرست ثبت‌شده قبلی را نگه می‌دارد
+    await bot.set_webhook(
+        WEBHOOK_URL.rstrip('/') + WEBHOOK_PATH,
+        secret_token=WEBHOOK_SECRET,
+        max_connections=WEBHOOK_MAX_CONNECTIONS,
+        allowed_updates=allowed_updates,
+    )
+    print(f"🌐 Webhook set on {WEBHOOK_URL.rstrip('/')}{'/…' if WEBHOOK_SECRET else WEBHOOK_PATH}")
+
+class BoundedRequestHandler(SimpleRequestHandler):
+    """
+    پردازش آپدیت‌ها در پس‌زمینه با سقف تعداد هم‌زمان.
+    وقتی سقف پر است پاسخ به تلگرام عقب می‌افتد (تلگرام خودش ارسال را کند می‌کند).
+    هنگام خاموش شدن درخواست جدید با 503 رد می‌شود (تلگرام بعداً دوباره می‌فرستد)
+    و آپدیت‌های در حال پردازش تا WEBHOOK_DRAIN_TIMEOUT تمام می‌شوند.
+    """
+
+    def __init__(self, *args, max_updates=WEBHOOK_MAX_UPDATES, **kwargs):
+        super().__init__(*args, handle_in_background=True, **kwargs)
+        self._slots = asyncio.Semaphore(max_updates)
+        self._draining = False
+
+    async def _handle_request_background(self, bot: Bot, request: web.Request) -> web.Response:
+        if self._draining:
+            return web.Response(status=503, text='Shutting down')
+
+        update = await request.json(loads=bot.session.json_loads)
+        await self._slots.acquire()
+
+        task = asyncio.create_task(self._feed(bot, update))
+        self._background_feed_update_tasks.add(task)
+        task.add_done_callback(self._background_feed_update_tasks.discard)
+        return web.json_response({}, dumps=bot.session.json_dumps)
+
+    async def _feed(self, bot: Bot, update):
+        try:
+            await self._background_feed_update(bot=bot, update=update)
+        except Exception as e:
+            print(f"❌ Update {update.get('update_id')} failed: {type(e).__name__}: {e}")
+        finally:
+            self._slots.release()
+
+    async def close(self):
+        self._draining = True
+        pending = list(self._background_feed_update_tasks)
+        if pending:
+            print(f"⏳ Draining {len(pending)} in-flight updates...")
+            done, not_done = await asyncio.wait(pending, timeout=WEBHOOK_DRAIN_TIMEOUT)
+            if not_done:
+                print(f"⚠️ {len(not_done)} updates still running after {WEBHOOK_DRAIN_TIMEOUT}s, cancelling")
+                for task in not_done:
+                    task.cancel()
+        await super().close()
+
+def create_app(mode=BOT_MODE):
+    app = web.Application()
+    app.router.add_get('/', health_check)
+
+    # main بات، dispatcher و routerها را می‌سازد
+    from main import bot, dp
+
+    if mode == 'webhook':
+        async def register_webhook(bot: Bot):
+            await set_webhook(bot, dp.resolve_used_update_types())
+
+        dp.startup.register(register_webhook)
+        # ترتیب مهم است: اول آپدیت‌های در حال پردازش تمام می‌شوند، بعد shutdown بات (صف‌ها و دیتابیس)
+        BoundedRequestHandler(dp, bot, secret_token=WEBHOOK_SECRET).register(app, path=WEBHOOK_PATH)
+        setup_application(app, dp, bot=bot)
+    else:
+        async def start_polling(app):
+            # webhook قبلی باید حذف شود وگرنه getUpdates خطا می‌دهد
+            await bot.delete_webhook()
+            app['polling'] = asyncio.create_task(dp.start_polling(bot, handle_signals=False))
+
+        async def stop_polling(app):
+            await dp.stop_polling()
+            await app['polling']
+
+        app.on_startup.append(start_polling)
+        app.on_cleanup.append(stop_polling)
+
+    print(f"🤖 Bot mode: {mode}")
+    return app
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 10000))
-    web.run_app(app, host='0.0.0.0', port=port)
\ No newline at end of file
+    web.run_app(create_app(), host='0.0.0.0', port=port, shutdown_timeout=WEBHOOK_DRAIN_TIMEOUT + 5)
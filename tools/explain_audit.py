@@ -0,0 +1,152 @@
+# tools/explain_audit.py
+"""
+اجرای EXPLAIN QUERY PLAN روی همه دستورات SQL ثابت در database.py، main.py و handlers
+و گزارش هر SCAN روی جدول‌های بزرگ.
+
+اجرا:
+    python -m tools.explain_audit            # گزارش؛ اگر SCAN غیرمنتظره باشد exit code = 1
+    python -m tools.explain_audit --all      # نمایش plan همه دستورات
+"""
+import argparse
+import ast
+import glob
+import re
+import sqlite3
+import sys
+
+from migrations import run_migrations
+
+DEFAULT_PATHS = ['database.py', 'main.py', 'handlers/*.py', 'utils/*.py']
+
+# جدول‌هایی که با رشد کاربران بزرگ می‌شوند
+LARGE_TABLES = {
+    'users', 'investments', 'tickets', 'transactions', 'profit_payments',
+    'notifications', 'system_logs', 'referrals', 'broadcast_recipients', 'outbox',
+    'fsm_states',
+}
+
+# توابعی که ذاتاً کل جدول را می‌خوانند (آمار و گزارش‌های ادمین)؛ SCAN در آن‌ها خطا حساب نمی‌شود
+EXPECTED_SCANS = {
+    'get_users_count': "COUNT(*) over all users",
+    'get_all_user_ids': "broadcast needs every user",
+    'create_broadcast': "snapshot of the whole audience",
+    'search_users': "LIKE fallback when FTS5 is unavailable",
+    'search_users_basic': "LIKE fallback when FTS5 is unavailable",
+    'get_wallet_overview': "admin report",
+    'get_system_statistics': "admin report",
+    'get_investment_overview': "admin report",
+    'get_referral_overview': "admin report",
+    'get_outbox_stats': "admin report (sent rows are purged)",
+    'get_schema_overview': "row counts per table",
+    'get_investments_count': "COUNT(*) when no status filter",
+    'get_tickets_count': "COUNT(*) when no status filter",
+}
+
+_SQL_START = re.compile(r'^\s*(SELECT|INSERT|UPDATE|DELETE|WITH|REPLACE)\b', re.IGNORECASE)
+_TABLE_REF = re.compile(r'\b(?:FROM|JOIN|UPDATE|INTO)\s+(\w+)(?:\s+(?:AS\s+)?(?!WHERE|ON|JOIN|LEFT|INNER|ORDER|GROUP|LIMIT|SET|VALUES)(\w+))?', re.IGNORECASE)
+_SCAN = re.compile(r'^SCAN (\w+)')
+_LIMIT = re.compile(r'\bLIMIT\b', re.IGNORECASE)
+
+def extract_statements(path):
+    """(خط، نام تابع، SQL) برای هر execute/executemany با رشته ثابت"""
+    with open(path, encoding='utf-8') as f:
+        tree = ast.parse(f.read(), filename=path)
+
+    statements = []
+
+    def visit(node, function_name):
+        for child in ast.iter_child_nodes(node):
+            name = function_name
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                name = child.name
+
+            if (isinstance(child, ast.Call) and isinstance(child.func, ast.Attribute)
+                    and child.func.attr in ('execute', 'executemany') and child.args):
+                sql = child.args[0]
+                if isinstance(sql, ast.Constant) and isinstance(sql.value, str):
+                    statements.append((child.lineno, name, sql.value))
+                elif isinstance(sql, ast.JoinedStr):
+                    statements.append((child.lineno, name, None))
+
+            visit(child, name)
+
+    visit(tree, '<module>')
+    return statements
+
+def table_aliases(sql):
+    """نگاشت alias به نام جدول (مثلاً i -> investments)"""
+    aliases = {}
+    for table, alias in _TABLE_REF.findall(sql):
+        aliases[table] = table
+        if alias:
+            aliases[alias] = table
+    return aliases
+
+def explain(conn, sql):
+    params = [None] * sql.count('?')
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()]
+
+def audit(paths, show_all=False):
+    conn = sqlite3.connect(':memory:')
+    run_migrations(conn)
+
+    problems = 0
+    skipped = 0
+
+    for pattern in paths:
+        for path in sorted(glob.glob(pattern)):
+            for lineno, function_name, sql in extract_statements(path):
+                location = f"{path}:{lineno} {function_name}()"
+
+                if sql is None:
+                    skipped += 1
+                    if show_all:
+                        print(f"⏭️  {location}: dynamic SQL (f-string), skipped")
+                    continue
+
+                if not _SQL_START.match(sql):
+                    continue
+
+                try:
+                    plan = explain(conn, sql)
+                except sqlite3.Error as e:
+                    problems += 1
+                    print(f"❌ {location}: {e}")
+                    continue
+
+                aliases = table_aliases(sql)
+                scans = []
+                for detail in plan:
+                    match = _SCAN.match(detail)
+                    if not match or aliases.get(match.group(1), match.group(1)) not in LARGE_TABLES:
+                        continue
+                    # پیمایش مرتب یک ایندکس که با LIMIT قطع می‌شود، اسکن کامل نیست
+                    if ' USING ' in detail and 'INDEX' in detail and _LIMIT.search(sql):
+                        continue
+                    scans.append(detail)
+
+                if scans and function_name not in EXPECTED_SCANS:
+                    problems += 1
+                    print(f"⚠️  {location}")
+                    for detail in plan:
+                        print(f"      {detail}")
+                elif show_all:
+                    note = f"  ({EXPECTED_SCANS[function_name]})" if scans else ""
+                    print(f"✅ {location}{note}")
+                    for detail in plan:
+                        print(f"      {detail}")
+
+    conn.close()
+    print(f"\n📊 unexpected scans/errors: {problems}, dynamic statements skipped: {skipped}")
+    return problems
+
+def main():
+    parser = argparse.ArgumentParser(description="EXPLAIN QUERY PLAN audit for the bot's SQL")
+    parser.add_argument('paths', nargs='*', default=DEFAULT_PATHS)
+    parser.add_argument('--all', action='store_true', help="print the plan of every statement")
+    args = parser.parse_args()
+
+    sys.exit(1 if audit(args.paths, args.all) else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# tools/migrate_referral_codes.py
+"""
+تبدیل کدهای رفرال قدیمی (RAMO{user_id}{random}) به کد امضاشده جدید.
+کد قدیمی در جدول legacy_referral_codes می‌ماند تا لینک‌های دعوت قبلی همچنان کار کنند.
+هر دسته در یک تراکنش اجرا می‌شود و اجرای دوباره فقط کاربران باقی‌مانده را تبدیل می‌کند.
+
+قبل از اجرا REFERRAL_SECRET را در .env تنظیم کنید (تغییر آن بعداً همه لینک‌های جدید را باطل می‌کند).
+
+اجرا:
+    python -m tools.migrate_referral_codes --dry-run
+    python -m tools.migrate_referral_codes
+"""
+import argparse
+import sqlite3
+
+from dotenv import load_dotenv
+
+from database import connect
+from migrations import BATCH_SIZE, run_migrations
+from utils.referral_codes import decode_referral_code, make_referral_code
+
+def migrate_referral_codes(conn, dry_run=False, batch_size=BATCH_SIZE):
+    """(تبدیل‌شده، کدهای قدیمی ذخیره‌شده، ردشده) را برمی‌گرداند"""
+    converted = archived = skipped = 0
+    last_id = 0
+
+    while True:
+        rows = conn.execute('''
+            SELECT user_id, referral_code FROM users
+            WHERE user_id > ?
+            ORDER BY user_id
+            LIMIT ?
+        ''', (last_id, batch_size)).fetchall()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+
+        # فقط کاربرانی که کد استاندارد جدید ندارند
+        pending = [(user_id, code) for user_id, code in rows if decode_referral_code(code or '') != user_id]
+        if not pending or dry_run:
+            converted += len(pending)
+            archived += sum(1 for _, code in pending if code)
+            continue
+
+        with conn:
+            for user_id, old_code in pending:
+                try:
+                    if old_code:
+                        conn.execute("INSERT OR IGNORE INTO legacy_referral_codes (code, user_id) VALUES (?, ?)",
+                                     (old_code, user_id))
+                        archived += 1
+                    conn.execute("UPDATE users SET referral_code = ? WHERE user_id = ?",
+                                 (make_referral_code(user_id), user_id))
+                    converted += 1
+                except sqlite3.IntegrityError as e:
+                    skipped += 1
+                    print(f"⚠️ User {user_id} skipped: {e}")
+
+        print(f"🔄 ... up to user {last_id}: {converted} converted")
+
+    return converted, archived, skipped
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert legacy RAMO referral codes to signed codes")
+    parser.add_argument('--dry-run', action='store_true', help="only count users that would be converted")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    load_dotenv()
+    conn = connect()
+    try:
+        run_migrations(conn)
+        converted, archived, skipped = migrate_referral_codes(conn, args.dry_run, args.batch_size)
+    finally:
+        conn.close()
+
+    prefix = "🔍 [dry-run] " if args.dry_run else "✅ "
+    print(f"{prefix}converted: {converted}, legacy codes kept: {archived}, skipped: {skipped}")
+
+if __name__ == "__main__":
+    main()
@@ -1,61 +1,54 @@
 # update_database.py
-import sqlite3
+import argparse
+
+from database import DB_NAME, connect
+from migrations import LATEST_VERSION, get_schema_version, pending_migrations, run_migrations
+
+def update_database(target=None):
+    """اجرای migrationهای باقی‌مانده روی دیتابیس"""
+    conn = connect()
 
-def update_investments_table():
-    """اضافه کردن ستون‌های جدید به جدول investments"""
-    conn = sqlite3.connect('finance_bot.db')
-    cursor = conn.cursor()
-    
     try:
-        # بررسی وجود ستون‌ها
-        cursor.execute("PRAGMA table_info(investments)")
-        columns = [col[1] for col in cursor.fetchall()]
-        
-        print("📊 ستون‌های فعلی جدول investments:")
-        for col in columns:
-            print(f"  • {col}")
-        
-        # اضافه کردن ستون transaction_receipt اگر وجود ندارد
-        if 'transaction_receipt' not in columns:
-            cursor.execute("ALTER TABLE investments ADD COLUMN transaction_receipt TEXT")
-            print("✅ ستون transaction_receipt اضافه شد")
-        
-        # اضافه کردن ستون receipt_type اگر وجود ندارد
-        if 'receipt_type' not in columns:
-            cursor.execute("ALTER TABLE investments ADD COLUMN receipt_type TEXT DEFAULT 'none'")
-            print("✅ ستون receipt_type اضافه شد")
-        
-        # اضافه کردن ستون‌های دیگر اگر نیاز است
-        if 'confirmed_by' not in columns:
-            cursor.execute("ALTER TABLE investments ADD COLUMN confirmed_by INTEGER")
-            print("✅ ستون confirmed_by اضافه شد")
-        
-        if 'confirmed_at' not in columns:
-            cursor.execute("ALTER TABLE investments ADD COLUMN confirmed_at TIMESTAMP")
-            print("✅ ستون confirmed_at اضافه شد")
-        
-        if 'notes' not in columns:
-            cursor.execute("ALTER TABLE investments ADD COLUMN notes TEXT")
-            print("✅ ستون notes اضافه شد")
-        
-        conn.commit()
-        print("🎉 دیتابیس با موفقیت آپدیت شد!")
-        
+        print(f"📊 نسخه فعلی دیتابیس: {get_schema_version(conn)} (آخرین نسخه: {LATEST_VERSION})")
+
+        applied = run_migrations(conn, target)
+        if applied:
+            print(f"🎉 {len(applied)} مرحله اجرا شد، نسخه جدید: {get_schema_version(conn)}")
+        else:
+            print("✅ دیتابیس به‌روز است.")
+
     except Exception as e:
         print(f"❌ خطا در آپدیت دیتابیس: {e}")
-        conn.rollback()
-    
+        raise
+
     finally:
         conn.close()
 
+def show_status():
+    """نمایش نسخه و مراحل باقی‌مانده بدون اعمال تغییر"""
+    conn = connect()
+
+    print(f"📁 دیتابیس: {DB_NAME}")
+    print(f"📊 نسخه فعلی: {get_schema_version(conn)} (آخرین نسخه: {LATEST_VERSION})")
+
+    pending = pending_migrations(conn)
+    if pending:
+        print("\n⏳ مراحل باقی‌مانده:")
+        for version, description in pending:
+            print(f"  • {version}: {description}")
+    else:
+        print("✅ مرحله‌ای باقی نمانده است.")
+
+    conn.close()
+
 def check_database_tables():
     """بررسی ساختار دیتابیس"""
-    conn = sqlite3.connect('finance_bot.db')
+    conn = connect()
     cursor = conn.cursor()
-    
+
     cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
     tables = cursor.fetchall()
-    
+
     print("\n📋 جدول‌های موجود در دیتابیس:")
     for table in tables:
         print(f"\n📁 جدول: {table[0]}")
@@ -63,11 +56,22 @@ def check_database_tables():
         columns = cursor.fetchall()
         for col in columns:
             print(f"  • {col[1]} ({col[2]})")
-    
+
     conn.close()
 
 if __name__ == "__main__":
-    print("🔄 در حال آپدیت دیتابیس...")
-    update_investments_table()
-    check_database_tables()
-    print("\n✅ آپدیت دیتابیس کامل شد! حالا می‌توانید بات را اجرا کنید.")
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Database schema migrations")
+    parser.add_argument('--status', action='store_true', help="only show current version and pending steps")
+    parser.add_argument('--target', type=int, default=None, help="migrate up to this version")
+    parser.add_argument('--tables', action='store_true', help="print table structure afterwards")
+    args = parser.parse_args()
+
+    if args.status:
+        show_status()
+    else:
+        print("🔄 در حال آپدیت دیتابیس...")
+        update_database(args.target)
+        print("\n✅ آپدیت دیتابیس کامل شد! حالا می‌توانید بات را اجرا کنید.")
+
+    if args.tables:
+        check_database_tables()
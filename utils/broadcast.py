@@ -0,0 +1,233 @@
+# utils/broadcast.py
+"""
+موتور ارسال اطلاعیه همگانی.
+
+- ارسال موازی با چند worker و محدودکننده سرعت مشترک پردازه (utils/rate_limit.py)
+- رعایت RetryAfter تلگرام (توقف همه ارسال‌ها) و تکرار خطاهای موقت شبکه/سرور
+- ذخیره وضعیت هر گیرنده در broadcast_recipients؛ بعد از ری‌استارت فقط گیرندگان باقی‌مانده ارسال می‌شوند
+  (پیام‌هایی که بین آخرین ذخیره و خاموش شدن رفته‌اند ممکن است دوباره ارسال شوند)
+- به‌روزرسانی پیام پیشرفت برای ادمین
+"""
+import asyncio
+import os
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramAPIError,
+    TelegramBadRequest,
+    TelegramForbiddenError,
+    TelegramNetworkError,
+    TelegramNotFound,
+    TelegramRetryAfter,
+    TelegramServerError,
+)
+
+from database import get_db
+from utils.i18n import get_texts
+from utils.rate_limit import get_rate_limiter
+
+BROADCAST_WORKERS = int(os.getenv("BROADCAST_WORKERS", "20"))
+BROADCAST_MAX_ATTEMPTS = int(os.getenv("BROADCAST_MAX_ATTEMPTS", "5"))
+PROGRESS_INTERVAL = float(os.getenv("BROADCAST_PROGRESS_INTERVAL", "3"))  # ثانیه
+
+# وضعیت هر گیرنده:
+#   sent       ارسال در اولین تلاش
+#   retried    ارسال بعد از RetryAfter یا خطای موقت
+#   blocked    کاربر بات را مسدود کرده یا حسابش غیرفعال است
+#   not_found  چت وجود ندارد
+#   failed     خطای موقت که بعد از همه تلاش‌ها برطرف نشد (با retry_failed_broadcast دوباره ارسال می‌شود)
+# کاربران blocked و not_found غیرفعال می‌شوند و در اطلاعیه‌های بعدی نیستند تا دوباره /start بزنند
+DEAD_STATUSES = ('blocked', 'not_found')
+
+# تعداد گیرندگانی که هر بار از دیتابیس خوانده یا در آن ذخیره می‌شوند
+PAGE_SIZE = 500
+FLUSH_SIZE = 100
+
+async def send_with_retry(bot: Bot, chat_id, from_chat_id, message_id, limiter=None):
+    """کپی پیام برای یک گیرنده؛ (وضعیت، تعداد تلاش، خطا) را برمی‌گرداند"""
+    limiter = limiter or get_rate_limiter()
+    attempts = 0
+    retried = False
+    error = None
+
+    while attempts < BROADCAST_MAX_ATTEMPTS:
+        await limiter.acquire()
+        attempts += 1
+        try:
+            await bot.copy_message(chat_id, from_chat_id, message_id)
+            return ('retried' if retried else 'sent'), attempts, None
+        except TelegramRetryAfter as e:
+            # محدودیت سرعت تلگرام؛ تلاش حساب نمی‌شود
+            attempts -= 1
+            retried = True
+            error = f"RetryAfter {e.retry_after}s"
+            print(f"⏳ Flood control, pausing broadcasts for {e.retry_after}s")
+            limiter.pause(e.retry_after)
+        except (TelegramNetworkError, TelegramServerError) as e:
+            retried = True
+            error = str(e)
+            await asyncio.sleep(min(2 ** attempts, 30))
+        except TelegramForbiddenError as e:
+            return 'blocked', attempts, str(e)
+        except TelegramNotFound as e:
+            return 'not_found', attempts, str(e)
+        except TelegramBadRequest as e:
+            message = str(e).lower()
+            if 'chat not found' in message or 'user not found' in message:
+                return 'not_found', attempts, str(e)
+            return 'failed', attempts, str(e)
+        except TelegramAPIError as e:
+            return 'failed', attempts, str(e)
+
+    return 'failed', attempts, error
+
+def get_progress_texts(language):
+    return get_texts('broadcast', language)
+
+def progress_text(language, broadcast_id, sent, failed, total, done=False):
+    texts = get_progress_texts(language)
+    percent = (sent + failed) * 100 / total if total else 100
+    header = texts['done' if done else 'running'].format(broadcast_id=broadcast_id)
+    text = header + texts['body'].format(sent=sent, failed=failed, total=total, percent=percent)
+    if done:
+        text += texts['report'].format(broadcast_id=broadcast_id)
+    return text
+
+class BroadcastRun:
+    """اجرای یک اطلاعیه: خواندن گیرندگان باقی‌مانده، ارسال موازی و ذخیره دسته‌ای نتایج"""
+
+    def __init__(self, bot: Bot, db, broadcast):
+        (self.broadcast_id, self.admin_id, self.from_chat_id, self.message_id, self.language,
+         _, self.total, self.sent, self.failed, self.progress_message_id, _, _) = broadcast
+        self.bot = bot
+        self.db = db
+        self.limiter = get_rate_limiter()
+        self._results = []
+        self._shown = None
+
+    async def run(self):
+        queue = asyncio.Queue(maxsize=BROADCAST_WORKERS * 2)
+        workers = [asyncio.create_task(self._worker(queue)) for _ in range(BROADCAST_WORKERS)]
+        progress = asyncio.create_task(self._progress_loop())
+        try:
+            after = 0
+            while True:
+                pending = await self.db.get_broadcast_pending(self.broadcast_id, after, PAGE_SIZE)
+                if not pending:
+                    break
+                for user_id in pending:
+                    await queue.put(user_id)
+                after = pending[-1]
+
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            # در خاموش شدن (cancel) هم نتایج ارسال‌شده ذخیره شوند تا ادامه از همین‌جا باشد
+            for task in workers + [progress]:
+                task.cancel()
+            await asyncio.gather(*workers, progress, return_exceptions=True)
+            await self._flush()
+
+        await self.db.finish_broadcast(self.broadcast_id)
+        await self._show_progress(done=True)
+        print(f"✅ Broadcast #{self.broadcast_id} finished: {self.sent} sent, {self.failed} failed")
+
+    async def _worker(self, queue):
+        while True:
+            user_id = await queue.get()
+            if user_id is None:
+                return
+
+            status, attempts, error = await send_with_retry(
+                self.bot, user_id, self.from_chat_id, self.message_id, self.limiter
+            )
+            if status in ('sent', 'retried'):
+                self.sent += 1
+            else:
+                self.failed += 1
+            self._results.append((user_id, status, attempts, error))
+
+            if len(self._results) >= FLUSH_SIZE:
+                await self._flush()
+
+    async def _flush(self):
+        results, self._results = self._results, []
+        if not results:
+            return
+
+        await self.db.record_broadcast_results(self.broadcast_id, results)
+
+        dead = [user_id for user_id, status, _, _ in results if status in DEAD_STATUSES]
+        if dead:
+            await self.db.set_users_active(dead, False)
+
+    async def _progress_loop(self):
+        while True:
+            await asyncio.sleep(PROGRESS_INTERVAL)
+            await self._show_progress()
+
+    async def _show_progress(self, done=False):
+        if not self.progress_message_id:
+            return
+
+        text = progress_text(self.language, self.broadcast_id, self.sent, self.failed, self.total, done)
+        if text == self._shown:
+            return
+
+        await self.limiter.acquire()
+        try:
+            await self.bot.edit_message_text(text, chat_id=self.from_chat_id, message_id=self.progress_message_id)
+            self._shown = text
+        except TelegramBadRequest as e:
+            # "message is not modified" یا پیام حذف شده
+            print(f"⚠️ Broadcast #{self.broadcast_id} progress not updated: {e}")
+        except TelegramAPIError as e:
+            print(f"⚠️ Broadcast #{self.broadcast_id} progress error: {e}")
+
+# اطلاعیه‌های در حال اجرا در این پردازه
+_running = {}
+
+def start_broadcast(bot: Bot, broadcast_id, db=None) -> asyncio.Task:
+    """اجرای اطلاعیه در پس‌زمینه (اگر از قبل در حال اجرا باشد همان task برمی‌گردد)"""
+    if broadcast_id in _running:
+        return _running[broadcast_id]
+
+    db = db or get_db()
+
+    async def _run():
+        broadcast = await db.get_broadcast(broadcast_id)
+        if broadcast is None or broadcast[5] != 'running':
+            return
+        try:
+            await BroadcastRun(bot, db, broadcast).run()
+        except asyncio.CancelledError:
+            print(f"⏸️ Broadcast #{broadcast_id} paused, will resume on next start")
+            raise
+        except Exception as e:
+            print(f"❌ Broadcast #{broadcast_id} stopped: {type(e).__name__}: {e}")
+
+    task = asyncio.create_task(_run())
+    _running[broadcast_id] = task
+    task.add_done_callback(lambda _: _running.pop(broadcast_id, None))
+    return task
+
+async def resume_broadcasts(bot: Bot, shard=None):
+    """ادامه اطلاعیه‌های نیمه‌کاره هنگام شروع بات (در حالت چند پردازه‌ای فقط worker شماره ۰)"""
+    if shard:
+        return
+
+    db = get_db()
+    for broadcast_id in await db.get_running_broadcasts():
+        print(f"▶️ Resuming broadcast #{broadcast_id}")
+        start_broadcast(bot, broadcast_id, db)
+
+async def stop_broadcasts():
+    """توقف اطلاعیه‌ها هنگام خاموش شدن؛ وضعیت running می‌ماند تا بعداً ادامه پیدا کنند"""
+    tasks = list(_running.values())
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+def is_broadcast_running(broadcast_id) -> bool:
+    return broadcast_id in _running
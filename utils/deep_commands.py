@@ -0,0 +1,113 @@
+# utils/deep_commands.py
+"""
+دستورهای «/فعل_شناسه» مثل /user_5، /reply_12 و /confirm_invest_12,13,14
+
+به جای یک فیلتر regexp برای هر دستور (که برای هر پیام متنی یکی‌یکی امتحان می‌شدند و
+handler دوباره متن را با split('_') می‌شکست) متن هر پیام یک بار parse می‌شود و از روی
+جدول فعل‌ها به handler می‌رسد:
+
+- handler به جای متن یک DeepCommand می‌گیرد (فعل، شناسه‌ها، آرگومان)
+- دستورهای ادمین برای غیرادمین قبل از هر کار دیتابیسی بی‌صدا نادیده گرفته می‌شوند
+- فعل‌های batch=True چند شناسه با کاما می‌گیرند و handler برای هر شناسه یک بار اجرا می‌شود
+
+ثبت فعل:
+    @deep_commands.verb('confirm_invest', batch=True)
+    async def confirm_investment(message: Message, bot: Bot, deep_command: DeepCommand):
+        investment_id = deep_command.id
+
+main.py فقط یک handler برای همه فعل‌ها ثبت می‌کند:
+    dp.message.register(deep_commands.dispatch, deep_commands.filter)
+"""
+from dataclasses import dataclass
+from typing import Any, Optional, Tuple
+
+from aiogram.dispatcher.event.handler import CallableObject
+from aiogram.types import Message
+
+from config import is_admin
+
+# بیشترین تعداد شناسه در یک دستور چندتایی
+MAX_BATCH = 50
+
+@dataclass(frozen=True)
+class DeepCommand:
+    """دستور parse‌شده؛ ids برای فعل‌های شناسه‌دار و argument متن بعد از فعل"""
+    verb: str
+    ids: Tuple[int, ...] = ()
+    argument: str = ''
+
+    @property
+    def id(self) -> int:
+        return self.ids[0]
+
+@dataclass(frozen=True)
+class Verb:
+    handler: CallableObject
+    admin_only: bool
+    batch: bool
+    # آرگومان متنی آزاد (مثل /find_…) به جای شناسه
+    text: bool
+
+class DeepCommands:
+    """جدول فعل‌ها: نام فعل → handler و قواعد آن"""
+
+    def __init__(self):
+        self.verbs = {}
+
+    def verb(self, name, *, admin_only=True, batch=False, text=False):
+        """دکوراتور ثبت handler یک فعل"""
+        def register(callback):
+            if name in self.verbs:
+                raise ValueError(f"Deep command /{name}_ is already registered")
+            self.verbs[name] = Verb(CallableObject(callback), admin_only, batch, text)
+            return callback
+        return register
+
+    def parse(self, text) -> Optional[DeepCommand]:
+        """متن پیام → DeepCommand، یا None اگر دستور شناخته‌شده و معتبر نیست"""
+        if not text or text[0] != '/':
+            return None
+        body = text[1:]
+
+        # آرگومان متنی خودش می‌تواند _ داشته باشد: فعل تا اولین _
+        name, _, argument = body.partition('_')
+        verb = self.verbs.get(name)
+        if verb is None or not verb.text:
+            # نام فعل‌های شناسه‌دار می‌تواند _ داشته باشد (confirm_invest): فعل تا آخرین _
+            name, _, argument = body.rpartition('_')
+            verb = self.verbs.get(name)
+            if verb is None or verb.text:
+                return None
+        if not argument:
+            return None
+        if verb.text:
+            return DeepCommand(name, argument=argument)
+
+        parts = argument.split(',') if verb.batch else [argument]
+        if len(parts) > MAX_BATCH or not all(part.isdecimal() for part in parts):
+            return None
+        ids = tuple(dict.fromkeys(int(part) for part in parts))
+        return DeepCommand(name, ids, argument)
+
+    async def filter(self, message: Message):
+        """فیلتر aiogram: دستور parse‌شده به صورت deep_command به handler داده می‌شود"""
+        deep_command = self.parse(message.text)
+        if deep_command is None:
+            return False
+        return {'deep_command': deep_command}
+
+    async def dispatch(self, message: Message, deep_command: DeepCommand, **data: Any):
+        """handler مشترک همه فعل‌ها"""
+        verb = self.verbs[deep_command.verb]
+        if verb.admin_only and not is_admin(message.from_user.id):
+            return
+
+        if len(deep_command.ids) > 1:
+            commands = [DeepCommand(deep_command.verb, (item,), str(item)) for item in deep_command.ids]
+        else:
+            commands = [deep_command]
+        for command in commands:
+            await verb.handler.call(message, deep_command=command, **data)
+
+# جدول مشترک کل بات
+deep_commands = DeepCommands()
@@ -0,0 +1,266 @@
+# utils/fsm_storage.py
+"""
+ذخیره وضعیت FSM در جدول fsm_states به جای MemoryStorage.
+
+- وضعیت ثبت‌نام، سرمایه‌گذاری و تیکت نیمه‌کاره با ری‌استارت از بین نمی‌رود
+- خواندن از کش حافظه؛ فقط اولین دسترسی به هر کاربر از دیتابیس خوانده می‌شود
+- نوشتن‌ها جمع می‌شوند و هر FSM_FLUSH_INTERVAL ثانیه در یک تراکنش ذخیره می‌شوند
+  (تغییرات همین بازه در خاموش شدن ناگهانی از بین می‌روند؛ در خاموش شدن عادی ذخیره می‌شوند)
+- وضعیتی که مدتی تغییر نکرده رهاشده حساب می‌شود و حذف می‌شود؛ مهلت برای هر گروه state جداست
+  (FSM_IDLE_TIMEOUTS) و می‌توان به کاربر پیام «مهلت تمام شد» فرستاد (FSM_EXPIRY_NOTIFY=1)
+- کش حداکثر FSM_CACHE_SIZE کاربر را نگه می‌دارد (LRU) تا حافظه در هجوم کاربران جدید ثابت بماند؛
+  کاربر حذف‌شده از کش در دسترسی بعدی دوباره از دیتابیس خوانده می‌شود
+"""
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Mapping, Optional
+
+from aiogram.exceptions import DataNotDictLikeError
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+
+from database import get_db
+from utils import outbox
+from utils.i18n import get_texts
+
+FSM_FLUSH_INTERVAL = float(os.getenv("FSM_FLUSH_INTERVAL", "0.5"))  # ثانیه
+FSM_SWEEP_INTERVAL = float(os.getenv("FSM_SWEEP_INTERVAL", "60"))  # ثانیه
+FSM_CACHE_SIZE = int(os.getenv("FSM_CACHE_SIZE", "50000"))
+FSM_EXPIRY_NOTIFY = os.getenv("FSM_EXPIRY_NOTIFY", "0") == "1"
+SWEEP_PAGE_SIZE = 500
+
+# مهلت بیکاری (ثانیه): پیش‌فرض برای همه و مقدار جدا برای هر گروه state
+# مثال: FSM_IDLE_TIMEOUTS="RegistrationStates=21600,InvestmentStates=1800"
+FSM_IDLE_TIMEOUT = int(os.getenv("FSM_IDLE_TIMEOUT", os.getenv("FSM_TTL", str(24 * 3600))))
+DEFAULT_IDLE_TIMEOUTS = {
+    'RegistrationStates': 6 * 3600,
+    'InvestmentStates': 3600,
+    'TicketStates': 2 * 3600,
+    'ProfileStates': 3600,
+}
+
+def parse_idle_timeouts(value):
+    timeouts = dict(DEFAULT_IDLE_TIMEOUTS)
+    for item in value.split(','):
+        group, _, seconds = item.partition('=')
+        if group.strip() and seconds.strip():
+            timeouts[group.strip()] = int(seconds)
+    return timeouts
+
+FSM_IDLE_TIMEOUTS = parse_idle_timeouts(os.getenv("FSM_IDLE_TIMEOUTS", ""))
+
+def get_expired_texts(language):
+    return get_texts('session', language)['expired']
+
+@dataclass
+class FSMRecord:
+    chat_id: int
+    user_id: int
+    state: Optional[str] = None
+    data: Dict[str, Any] = field(default_factory=dict)
+    updated_at: float = 0.0
+
+    @property
+    def empty(self) -> bool:
+        return self.state is None and not self.data
+
+def storage_key_id(key: StorageKey) -> str:
+    """کلید متنی جدول fsm_states"""
+    return ':'.join(str(part) if part is not None else '' for part in (
+        key.bot_id, key.chat_id, key.user_id, key.thread_id, key.business_connection_id, key.destiny
+    ))
+
+class SQLiteStorage(BaseStorage):
+    """storage پایدار FSM روی دیتابیس مشترک بات"""
+
+    def __init__(self, db=None, idle_timeout=FSM_IDLE_TIMEOUT, group_timeouts=None,
+                 flush_interval=FSM_FLUSH_INTERVAL, max_cached=FSM_CACHE_SIZE, notify=FSM_EXPIRY_NOTIFY):
+        self.db = db or get_db()
+        self.idle_timeout = idle_timeout
+        self.group_timeouts = FSM_IDLE_TIMEOUTS if group_timeouts is None else group_timeouts
+        self.flush_interval = flush_interval
+        self.max_cached = max_cached
+        self.notify = notify
+        # ترتیب = ترتیب آخرین دسترسی (LRU)
+        self._records: "OrderedDict[str, FSMRecord]" = OrderedDict()
+        self._dirty = set()
+        self._flusher = None
+        self._last_sweep = time.time()
+        self.evictions = 0
+        self.expired = 0
+
+    def idle_timeout_for(self, state: Optional[str]) -> int:
+        group = state.split(':', 1)[0] if state else None
+        return self.group_timeouts.get(group, self.idle_timeout)
+
+    def _is_idle(self, state, updated_at, now):
+        return updated_at < now - self.idle_timeout_for(state)
+
+    async def _load(self, key: StorageKey) -> FSMRecord:
+        key_id = storage_key_id(key)
+        record = self._records.get(key_id)
+        if record is not None:
+            self._records.move_to_end(key_id)
+            return record
+
+        self._start()
+        record = FSMRecord(key.chat_id, key.user_id)
+        row = await self.db.get_fsm_record(key_id)
+        if row is not None and not self._is_idle(row[0], row[2], time.time()):
+            record.state = row[0]
+            record.data = json.loads(row[1]) if row[1] else {}
+            record.updated_at = row[2]
+
+        # ممکن است در زمان خواندن، آپدیت دیگری همین کلید را بارگذاری یا تغییر داده باشد
+        record = self._records.setdefault(key_id, record)
+        self._evict()
+        return record
+
+    def _evict(self):
+        """حذف قدیمی‌ترین کاربران از کش؛ رکوردهای ذخیره‌نشده نگه داشته می‌شوند"""
+        if len(self._records) <= self.max_cached:
+            return
+        for key_id in list(self._records):
+            if len(self._records) <= self.max_cached:
+                break
+            if key_id not in self._dirty:
+                del self._records[key_id]
+                self.evictions += 1
+
+    def _changed(self, key: StorageKey, record: FSMRecord):
+        key_id = storage_key_id(key)
+        record.updated_at = time.time()
+        # رکورد ممکن است بین خواندن و تغییر از کش حذف شده باشد
+        self._records[key_id] = record
+        self._records.move_to_end(key_id)
+        self._dirty.add(key_id)
+        self._start()
+
+    def _start(self):
+        """شروع ذخیره و پاک‌سازی دوره‌ای در پس‌زمینه (با اولین دسترسی در event loop)"""
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        record = await self._load(key)
+        record.state = state.state if isinstance(state, State) else state
+        self._changed(key, record)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return (await self._load(key)).state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        if not isinstance(data, dict):
+            raise DataNotDictLikeError(f"Data must be a dict or dict-like object, got {type(data).__name__}")
+        record = await self._load(key)
+        record.data = data.copy()
+        self._changed(key, record)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        return (await self._load(key)).data.copy()
+
+    async def flush(self):
+        """ذخیره همه تغییرات در یک تراکنش"""
+        if not self._dirty:
+            return
+
+        keys, self._dirty = self._dirty, set()
+        records, deleted = [], []
+        for key_id in keys:
+            record = self._records.get(key_id)
+            if record is None:
+                continue
+            if record.empty:
+                deleted.append(key_id)
+            else:
+                records.append((
+                    key_id, record.chat_id, record.user_id, record.state,
+                    json.dumps(record.data, ensure_ascii=False, default=str), record.updated_at,
+                ))
+
+        try:
+            await self.db.save_fsm_records(records, deleted)
+        except Exception:
+            # دفعه بعد دوباره تلاش می‌شود
+            self._dirty |= keys
+            raise
+
+    async def sweep(self, now=None):
+        """حذف وضعیت‌های رهاشده از کش و دیتابیس؛ تعداد حذف‌شده‌ها را برمی‌گرداند"""
+        now = time.time() if now is None else now
+        expired_keys = []
+        nudges = []  # (chat_id، user_id) کاربرانی که وسط یک مرحله رها کرده‌اند
+
+        # کش از دیتابیس جدیدتر است
+        cached = set(self._records)
+        for key_id, record in list(self._records.items()):
+            if key_id in self._dirty or not self._is_idle(record.state, record.updated_at, now):
+                continue
+            del self._records[key_id]
+            if not record.empty:
+                expired_keys.append(key_id)
+                if record.state:
+                    nudges.append((record.chat_id, record.user_id))
+
+        # ردیف‌هایی که در کش نیستند (قبل از ری‌استارت یا حذف‌شده از کش)
+        shortest = min([self.idle_timeout, *self.group_timeouts.values()])
+        after = 0.0
+        while True:
+            rows = await self.db.get_idle_fsm_records(now - shortest, after, SWEEP_PAGE_SIZE)
+            for key_id, chat_id, user_id, state, updated_at in rows:
+                if key_id in cached or key_id in self._records or not self._is_idle(state, updated_at, now):
+                    continue
+                expired_keys.append(key_id)
+                if state:
+                    nudges.append((chat_id, user_id))
+            if len(rows) < SWEEP_PAGE_SIZE:
+                break
+            after = rows[-1][4]
+
+        if expired_keys:
+            await self.db.save_fsm_records([], expired_keys)
+            self.expired += len(expired_keys)
+        if nudges and self.notify:
+            await self._send_expired_notices(nudges)
+        return len(expired_keys)
+
+    async def _send_expired_notices(self, nudges):
+        languages = await self.db.get_users_languages({user_id for _, user_id in nudges})
+        await outbox.enqueue_many([
+            (chat_id, 'send_message', {'text': get_expired_texts(languages.get(user_id, 'en'))}, outbox.PRIORITY_BULK)
+            for chat_id, user_id in nudges
+        ], db=self.db)
+
+    def stats(self):
+        """وضعیت کش (برای /dbinfo)"""
+        return {
+            'size': len(self._records),
+            'max_size': self.max_cached,
+            'dirty': len(self._dirty),
+            'evictions': self.evictions,
+            'expired': self.expired,
+        }
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+                if time.time() - self._last_sweep >= FSM_SWEEP_INTERVAL:
+                    self._last_sweep = time.time()
+                    expired = await self.sweep()
+                    if expired:
+                        print(f"🧹 FSM: {expired} idle states expired")
+            except Exception as e:
+                print(f"❌ FSM storage flush error: {type(e).__name__}: {e}")
+
+    async def close(self) -> None:
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+        await self.flush()
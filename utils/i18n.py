@@ -0,0 +1,104 @@
+# utils/i18n.py
+"""
+کاتالوگ متن‌های چندزبانه.
+
+متن‌ها یک بار هنگام شروع از locales/<زبان>.json خوانده می‌شوند و در جدول‌های فقط‌خواندنی
+(namespace → کلید → متن) نگه داشته می‌شوند؛ خواندن یک متن فقط یک جستجوی dict است.
+
+- هر متن هنگام بارگذاری parse می‌شود: قالب خراب ({ بسته‌نشده) همان‌جا خطا می‌دهد
+  و متن‌های بدون {…} در render اصلاً format نمی‌شوند
+- بررسی شروع: هر کلید در همه زبان‌ها وجود دارد و فیلدهای قالب در همه زبان‌ها یکی است
+
+استفاده:
+    texts = get_texts('investment', language)
+    texts['details'].format(amount=...)      # یا texts['details'].render(amount=...)
+    t(language, 'session.expired')
+
+بررسی دستی:
+    python -m utils.i18n
+"""
+import json
+import os
+from string import Formatter
+from types import MappingProxyType
+
+LOCALES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'locales')
+LANGUAGES = ('fa', 'en', 'ar')
+DEFAULT_LANGUAGE = 'en'
+
+class CatalogError(ValueError):
+    """کلید یا قالب ناسازگار در فایل‌های locales"""
+
+class Template(str):
+    """متن کاتالوگ؛ مثل str رفتار می‌کند و فیلدهای قالبش هنگام بارگذاری استخراج شده‌اند"""
+    __slots__ = ('fields',)
+
+    def __new__(cls, text):
+        template = super().__new__(cls, text)
+        # Formatter.parse قالب خراب را با ValueError رد می‌کند
+        template.fields = frozenset(
+            field.split('.')[0].split('[')[0]
+            for _, field, _, _ in Formatter().parse(text) if field is not None
+        )
+        return template
+
+    def render(self, **values) -> str:
+        # متن ثابت بدون format (و بدون کپی) برگردانده می‌شود
+        return self.format_map(values) if self.fields else self
+
+def load_catalog(directory=LOCALES_DIR, languages=LANGUAGES):
+    """{زبان: {namespace: جدول فقط‌خواندنی متن‌ها}}"""
+    catalog = {}
+    for language in languages:
+        with open(os.path.join(directory, f'{language}.json'), encoding='utf-8') as f:
+            raw = json.load(f)
+        tables = {}
+        for namespace, entries in raw.items():
+            try:
+                tables[namespace] = MappingProxyType({key: Template(text) for key, text in entries.items()})
+            except ValueError as e:
+                raise CatalogError(f"{language}.json {namespace}: invalid template: {e}") from None
+        catalog[language] = MappingProxyType(tables)
+    return MappingProxyType(catalog)
+
+def check_catalog(catalog, reference=DEFAULT_LANGUAGE):
+    """لیست مشکلات: کلید جاافتاده یا اضافه و فیلدهای قالب متفاوت با زبان مرجع"""
+    problems = []
+    base = catalog[reference]
+    for language, tables in catalog.items():
+        if language == reference:
+            continue
+        for namespace in base.keys() | tables.keys():
+            expected = base.get(namespace, {})
+            actual = tables.get(namespace, {})
+            for key in expected.keys() - actual.keys():
+                problems.append(f"{language}: missing {namespace}.{key}")
+            for key in actual.keys() - expected.keys():
+                problems.append(f"{language}: extra {namespace}.{key} (not in {reference})")
+            for key in expected.keys() & actual.keys():
+                if expected[key].fields != actual[key].fields:
+                    problems.append(
+                        f"{language}: {namespace}.{key} uses {sorted(actual[key].fields)}, "
+                        f"{reference} uses {sorted(expected[key].fields)}"
+                    )
+    return problems
+
+# بارگذاری و بررسی یک باره هنگام import
+CATALOG = load_catalog()
+_problems = check_catalog(CATALOG)
+if _problems:
+    raise CatalogError("Locale catalog is inconsistent:\n  " + "\n  ".join(_problems))
+
+def get_texts(namespace, language):
+    """جدول متن‌های یک بخش برای زبان کاربر (زبان ناشناخته → انگلیسی)"""
+    return CATALOG.get(language, CATALOG[DEFAULT_LANGUAGE])[namespace]
+
+def t(language, key, **values) -> str:
+    """متن یک کلید به شکل namespace.key با جایگذاری مقادیر"""
+    namespace, _, name = key.partition('.')
+    return get_texts(namespace, language)[name].render(**values)
+
+if __name__ == "__main__":
+    for language, tables in CATALOG.items():
+        counts = ', '.join(f"{namespace}: {len(entries)}" for namespace, entries in tables.items())
+        print(f"✅ {language}: {counts}")
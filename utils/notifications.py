@@ -1,18 +1,73 @@
+import asyncio
 import os
+import time
 from datetime import datetime
 from aiogram import Bot
 
+from config import get_config
+from database import get_db
+from utils import outbox
+
+# زبان ادمین‌ها چند دقیقه در حافظه می‌ماند تا هر اعلان به دیتابیس نرود
+ADMIN_LANG_TTL = float(os.getenv("ADMIN_LANG_TTL", "300"))  # ثانیه
+ADMIN_DEFAULT_LANGUAGE = 'fa'
+
+_admin_languages = {}
+_admin_languages_loaded_at = 0.0
+_admin_languages_lock = asyncio.Lock()
+
+def get_admin_ids():
+    return sorted(get_config().admin_ids)
+
+async def get_admin_languages(refresh=False):
+    """{admin_id: language} برای همه ادمین‌ها با یک query و کش TTL"""
+    global _admin_languages, _admin_languages_loaded_at
+    admin_ids = get_admin_ids()
+    
+    async with _admin_languages_lock:
+        expired = time.monotonic() - _admin_languages_loaded_at > ADMIN_LANG_TTL
+        if refresh or expired or set(admin_ids) != set(_admin_languages):
+            languages = await get_db().get_users_languages(admin_ids)
+            _admin_languages = {
+                admin_id: languages.get(admin_id) or ADMIN_DEFAULT_LANGUAGE for admin_id in admin_ids
+            }
+            _admin_languages_loaded_at = time.monotonic()
+        return dict(_admin_languages)
+
+async def fan_out_to_admins(build, method='send_message', priority=outbox.PRIORITY_NOTIFICATION, label='notification'):
+    """
+    ارسال یک اعلان به همه ادمین‌ها از طریق صف پیام‌ها.
+    build(language) پارامترهای پیام آن زبان را برمی‌گرداند (مثلاً {'text': ..., 'parse_mode': ...})
+    و برای هر زبان فقط یک بار صدا زده می‌شود. همه پیام‌ها در یک تراکنش ثبت و توسط workerهای صف
+    به صورت موازی ارسال می‌شوند؛ handler منتظر ارسال نمی‌ماند.
+    خروجی: {admin_id: شناسه پیام در outbox} (وضعیت ارسال هر ادمین در جدول outbox ثبت می‌شود)
+    """
+    languages = await get_admin_languages()
+    if not languages:
+        print(f"⚠️ ADMIN_IDS not set, {label} not sent")
+        return {}
+    
+    params_by_language = {}
+    messages = []
+    for admin_id, language in languages.items():
+        if language not in params_by_language:
+            params_by_language[language] = build(language)
+        messages.append((admin_id, method, params_by_language[language], priority))
+    
+    try:
+        ids = await outbox.enqueue_many(messages)
+    except Exception as e:
+        print(f"❌ Failed to queue {label} for admins: {type(e).__name__}: {e}")
+        return {}
+    
+    results = dict(zip(languages, ids))
+    print(f"📢 {label} queued for {len(results)} admins: " +
+          ", ".join(f"{admin_id}→#{outbox_id}" for admin_id, outbox_id in results.items()))
+    return results
+
 async def notify_admins(bot: Bot, message: str):
     """ارسال اعلان به تمام ادمین‌ها"""
-    admin_ids_str = os.getenv("ADMIN_IDS", "")
-    if admin_ids_str:
-        admin_ids = [int(id_str.strip()) for id_str in admin_ids_str.split(",") if id_str.strip()]
-        
-        for admin_id in admin_ids:
-            try:
-                await bot.send_message(admin_id, message, parse_mode="HTML")
-            except Exception as e:
-                print(f"❌ Failed to notify admin {admin_id}: {e}")
+    return await fan_out_to_admins(lambda _: {'text': message, 'parse_mode': "HTML"})
 
 async def notify_new_user(bot: Bot, user_id: int, full_name: str, username: str, email: str):
     """اعلان ثبت‌نام کاربر جدید"""
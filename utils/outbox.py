@@ -0,0 +1,271 @@
+# utils/outbox.py
+"""
+صف پایدار پیام‌های خروجی.
+
+handlerها به جای bot.send_message پیام را در جدول outbox ثبت می‌کنند و بلافاصله به کاربر جواب می‌دهند؛
+چند worker در پس‌زمینه پیام‌ها را می‌فرستند:
+
+- اولویت: پیام‌های مربوط به درخواست کاربر (TRANSACTIONAL) قبل از اعلان‌ها و ارسال‌های انبوه
+- ترتیب: پیام‌های هر چت به ترتیب ثبت ارسال می‌شوند
+- خطای موقت (شبکه، سرور، RetryAfter) با تاخیر افزایشی دوباره تلاش می‌شود
+- خطای دائمی (مسدود کردن بات، چت ناموجود) یا تمام شدن تلاش‌ها → وضعیت dead برای بررسی دستی؛
+  کاربری که بات را مسدود کرده یا چتش وجود ندارد غیرفعال می‌شود
+- پیام‌های ثبت‌شده با ری‌استارت از بین نمی‌روند (پیامی که هنگام خاموش شدن در حال ارسال بوده ممکن است دوباره برود)
+- ارسال با تاخیر (send_sequence): handler منتظر نمی‌ماند و اگر کاربر پیام یا دکمه جدیدی بفرستد
+  بخش‌های ارسال‌نشده لغو می‌شوند (middlewares/scheduled_sends.py)
+"""
+import asyncio
+import heapq
+import json
+import os
+import time
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramAPIError,
+    TelegramBadRequest,
+    TelegramForbiddenError,
+    TelegramNetworkError,
+    TelegramNotFound,
+    TelegramRetryAfter,
+    TelegramServerError,
+)
+
+from database import get_db
+from utils.rate_limit import get_rate_limiter
+
+OUTBOX_WORKERS = int(os.getenv("OUTBOX_WORKERS", "8"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "6"))
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "1"))  # ثانیه
+OUTBOX_RETENTION_DAYS = int(os.getenv("OUTBOX_RETENTION_DAYS", "7"))
+
+# عدد کمتر = اولویت بیشتر
+PRIORITY_TRANSACTIONAL = 0  # پاسخ به درخواست خود کاربر (تیکت، تایید سرمایه‌گذاری، ...)
+PRIORITY_NOTIFICATION = 1   # اعلان به ادمین‌ها و دعوت‌کننده
+PRIORITY_BULK = 2           # ارسال‌های انبوه
+
+METHODS = ('send_message', 'send_photo', 'send_document', 'copy_message')
+
+async def enqueue_many(messages, db=None):
+    """
+    ثبت چند پیام در یک تراکنش؛ شناسه‌ها را برمی‌گرداند.
+    messages: لیست (chat_id، method، پارامترها، اولویت) و اختیاری زمان ارسال (time.time())
+    """
+    db = db or get_db()
+    rows = []
+    for chat_id, method, params, priority, *send_at in messages:
+        if method not in METHODS:
+            raise ValueError(f"Unsupported outbox method: {method}")
+        rows.append((chat_id, method, json.dumps(params, ensure_ascii=False), priority, send_at[0] if send_at else 0))
+
+    ids = await db.enqueue_outbox(rows)
+    if _sender is not None:
+        for row in rows:
+            _sender.wake(row[4])
+    return ids
+
+async def enqueue(chat_id, method, priority=PRIORITY_TRANSACTIONAL, **params):
+    ids = await enqueue_many([(chat_id, method, params, priority)])
+    return ids[0]
+
+async def send_message(chat_id, text, parse_mode=None, priority=PRIORITY_TRANSACTIONAL, fallback_text=None):
+    """
+    ثبت پیام متنی در صف.
+    fallback_text: اگر تلگرام متن را به خاطر parse_mode نپذیرفت، این متن بدون قالب ارسال می‌شود.
+    """
+    params = {'text': text}
+    if parse_mode:
+        params['parse_mode'] = parse_mode
+    if fallback_text:
+        params['fallback_text'] = fallback_text
+    return await enqueue(chat_id, 'send_message', priority, **params)
+
+# چت‌هایی که پیام زمان‌بندی‌شده قابل لغو دارند: chat_id -> (شناسه‌ها، زمان آخرین پیام)
+_scheduled = {}
+
+async def send_sequence(chat_id, texts, interval, priority=PRIORITY_TRANSACTIONAL, cancellable=True):
+    """
+    ارسال چند پیام متنی با فاصله interval ثانیه (اولی interval ثانیه بعد) بدون منتظر نگه داشتن handler.
+    با cancellable اگر کاربر قبل از ارسال همه بخش‌ها کار دیگری انجام دهد، بقیه ارسال نمی‌شوند.
+    """
+    now = time.time()
+    ids = await enqueue_many([
+        (chat_id, 'send_message', {'text': text}, priority, now + interval * (i + 1))
+        for i, text in enumerate(texts)
+    ])
+    if cancellable and ids:
+        previous_ids, _ = _scheduled.get(chat_id, ([], 0))
+        _scheduled[chat_id] = (previous_ids + ids, now + interval * len(ids))
+    return ids
+
+async def cancel_scheduled(chat_id, db=None):
+    """لغو پیام‌های زمان‌بندی‌شده‌ای از این چت که هنوز ارسال نشده‌اند"""
+    entry = _scheduled.pop(chat_id, None)
+    if entry is None:
+        return 0
+    ids, last_send_at = entry
+    # همه ارسال شده‌اند (یا در حال ارسال‌اند)
+    if last_send_at <= time.time():
+        return 0
+    return await (db or get_db()).cancel_outbox(ids)
+
+async def send_photo(chat_id, photo, caption=None, priority=PRIORITY_TRANSACTIONAL):
+    """photo باید file_id باشد (فایل محلی قابل ذخیره در صف نیست)"""
+    return await enqueue(chat_id, 'send_photo', priority, photo=photo, caption=caption)
+
+async def send_document(chat_id, document, caption=None, priority=PRIORITY_TRANSACTIONAL):
+    return await enqueue(chat_id, 'send_document', priority, document=document, caption=caption)
+
+def _backoff(attempts):
+    return min(5 * 2 ** (attempts - 1), 600)
+
+def _is_parse_error(error):
+    return "can't parse entities" in str(error).lower()
+
+def _is_dead_chat(error):
+    """کاربر بات را مسدود کرده یا چت دیگر وجود ندارد (همان blocked / not_found در utils/broadcast.py)"""
+    if isinstance(error, (TelegramForbiddenError, TelegramNotFound)):
+        return True
+    message = str(error).lower()
+    return isinstance(error, TelegramBadRequest) and ('chat not found' in message or 'user not found' in message)
+
+class OutboxSender:
+    """برداشتن پیام‌ها از جدول outbox و ارسال آن‌ها با چند worker"""
+
+    def __init__(self, bot: Bot, db=None, workers=OUTBOX_WORKERS):
+        self.bot = bot
+        self.db = db or get_db()
+        self.workers = workers
+        self.limiter = get_rate_limiter()
+        self._queue = asyncio.Queue(maxsize=workers * 2)
+        self._wakeup = asyncio.Event()
+        self._due = []  # heap زمان پیام‌های زمان‌بندی‌شده
+        self._tasks = []
+
+    async def start(self, recover=True):
+        if recover:
+            recovered = await self.db.recover_outbox()
+            purged = await self.db.purge_outbox(OUTBOX_RETENTION_DAYS)
+            if recovered or purged:
+                print(f"📮 Outbox: {recovered} messages requeued, {purged} old messages purged")
+
+        self._tasks = [asyncio.create_task(self._dispatch())]
+        self._tasks += [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def wake(self, send_at=0):
+        if send_at > time.time():
+            # پیام زمان‌بندی‌شده: dispatcher درست سر وقت بیدار می‌شود
+            heapq.heappush(self._due, send_at)
+        else:
+            self._wakeup.set()
+
+    def _next_wait(self, claimed_at):
+        # زمان‌هایی که claim قبلی آن‌ها را پوشش داده است
+        while self._due and self._due[0] <= claimed_at:
+            heapq.heappop(self._due)
+        if self._due:
+            return max(0, min(OUTBOX_POLL_INTERVAL, self._due[0] - time.time()))
+        return OUTBOX_POLL_INTERVAL
+
+    async def _dispatch(self):
+        while True:
+            self._wakeup.clear()
+            claimed_at = time.time()
+            free = self._queue.maxsize - self._queue.qsize()
+            claimed = await self.db.claim_outbox(free, claimed_at) if free else []
+            for row in claimed:
+                await self._queue.put(row)
+
+            if claimed:
+                continue
+
+            # منتظر پیام جدید، رسیدن زمان پیام زمان‌بندی‌شده یا تلاش دوباره
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self._next_wait(claimed_at))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _worker(self):
+        while True:
+            row = await self._queue.get()
+            try:
+                await self._deliver(*row)
+            except Exception as e:
+                print(f"❌ Outbox worker error on message #{row[0]}: {type(e).__name__}: {e}")
+            finally:
+                # پیام بعدی همین چت حالا قابل برداشتن است
+                self.wake()
+
+    async def _deliver(self, outbox_id, chat_id, method, payload, attempts):
+        params = json.loads(payload)
+        fallback_text = params.pop('fallback_text', None)
+
+        await self.limiter.acquire()
+        try:
+            try:
+                await getattr(self.bot, method)(chat_id, **params)
+            except TelegramBadRequest as e:
+                if not (_is_parse_error(e) and params.pop('parse_mode', None)):
+                    raise
+                # متن قالب‌بندی‌شده پذیرفته نشد؛ نسخه ساده ارسال می‌شود
+                if fallback_text and 'text' in params:
+                    params['text'] = fallback_text
+                await self.limiter.acquire()
+                await getattr(self.bot, method)(chat_id, **params)
+
+        except TelegramRetryAfter as e:
+            # محدودیت سرعت تلگرام؛ تلاش حساب نمی‌شود
+            self.limiter.pause(e.retry_after)
+            await self.db.reschedule_outbox(outbox_id, attempts, time.time() + e.retry_after, f"RetryAfter {e.retry_after}s")
+            return
+
+        except (TelegramNetworkError, TelegramServerError) as e:
+            await self._retry_or_dead(outbox_id, chat_id, attempts + 1, str(e))
+            return
+
+        except TelegramAPIError as e:
+            # مسدود کردن بات، چت ناموجود، پیام نامعتبر: تکرار فایده‌ای ندارد
+            print(f"❌ Outbox message #{outbox_id} to {chat_id} dropped: {e}")
+            await self.db.dead_letter_outbox(outbox_id, attempts + 1, str(e))
+            if _is_dead_chat(e):
+                # مثل اطلاعیه‌ها کاربر تا /start بعدی غیرفعال می‌شود (کش کاربر هم با همین نوشتن پاک می‌شود)
+                await self.db.set_users_active([chat_id], False)
+            return
+
+        except Exception as e:
+            await self._retry_or_dead(outbox_id, chat_id, attempts + 1, f"{type(e).__name__}: {e}")
+            return
+
+        await self.db.complete_outbox([outbox_id])
+
+    async def _retry_or_dead(self, outbox_id, chat_id, attempts, error):
+        if attempts >= OUTBOX_MAX_ATTEMPTS:
+            print(f"❌ Outbox message #{outbox_id} to {chat_id} failed after {attempts} attempts: {error}")
+            await self.db.dead_letter_outbox(outbox_id, attempts, error)
+        else:
+            await self.db.reschedule_outbox(outbox_id, attempts, time.time() + _backoff(attempts), error)
+
+_sender = None
+
+async def start_outbox(bot: Bot, shard=None):
+    """
+    شروع workerهای صف هنگام بالا آمدن بات.
+    در حالت چند پردازه‌ای (cluster.py) پردازه اصلی قبل از شروع workerها پیام‌های sending را برمی‌گرداند،
+    چون recover در یک worker پیام در حال ارسال worker دیگر را هم دوباره در صف می‌گذارد.
+    """
+    global _sender
+    if _sender is None:
+        _sender = OutboxSender(bot)
+        await _sender.start(recover=shard is None)
+
+async def stop_outbox():
+    global _sender
+    if _sender is not None:
+        await _sender.stop()
+        _sender = None
@@ -0,0 +1,48 @@
+# utils/rate_limit.py
+import asyncio
+import os
+import time
+
+# سقف ارسال پیام بات در ثانیه (محدودیت سراسری تلگرام حدود ۳۰ است)
+SEND_RATE = float(os.getenv("SEND_RATE", os.getenv("BROADCAST_RATE", "30")))
+
+class TokenBucket:
+    """محدودکننده سرعت async؛ pause برای RetryAfter همه ارسال‌ها را متوقف می‌کند"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        # lock باعث می‌شود منتظرها به ترتیب نوبت بگیرند
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+_rate_limiter = None
+
+def get_rate_limiter() -> TokenBucket:
+    """محدودکننده مشترک همه ارسال‌های این پردازه (اطلاعیه‌ها و صف پیام‌ها)"""
+    global _rate_limiter
+    if _rate_limiter is None:
+        _rate_limiter = TokenBucket(SEND_RATE)
+    return _rate_limiter
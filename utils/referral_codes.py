@@ -0,0 +1,66 @@
+import base64
+import hashlib
+import hmac
+import os
+
+# کد رفرال = پیشوند + base32(شناسه کاربر + امضای HMAC کوتاه‌شده)
+# بررسی و استخراج شناسه فقط محاسبه است و به دیتابیس نیازی ندارد
+CODE_PREFIX = "R"
+TAG_BYTES = 5  # ۴۰ بیت امضا
+
+# کدهای قدیمی: RAMO{user_id}{شش کاراکتر تصادفی}
+LEGACY_PREFIX = "RAMO"
+
+_warned_fallback = False
+
+def _secret() -> bytes:
+    """کلید امضا: REFERRAL_SECRET و در نبود آن BOT_TOKEN"""
+    global _warned_fallback
+    secret = os.getenv("REFERRAL_SECRET") or os.getenv("BOT_TOKEN")
+    if not secret:
+        if not _warned_fallback:
+            print("⚠️ REFERRAL_SECRET is not set, referral codes use an insecure development key")
+            _warned_fallback = True
+        secret = "ramo-finance-dev"
+    return secret.encode()
+
+def _tag(payload: bytes) -> bytes:
+    return hmac.new(_secret(), payload, hashlib.sha256).digest()[:TAG_BYTES]
+
+def make_referral_code(user_id: int) -> str:
+    """ساخت کد رفرال ثابت و امضاشده برای کاربر (بدون نیاز به ذخیره یا بررسی تکراری بودن)"""
+    payload = user_id.to_bytes(max(1, (user_id.bit_length() + 7) // 8), 'big')
+    encoded = base64.b32encode(payload + _tag(payload)).decode().rstrip('=')
+    return CODE_PREFIX + encoded
+
+def decode_referral_code(code: str):
+    """شناسه کاربر از روی کد؛ اگر کد معتبر نباشد None"""
+    if not code:
+        return None
+
+    code = code.strip().upper()
+    if not code.startswith(CODE_PREFIX):
+        return None
+
+    body = code[len(CODE_PREFIX):]
+    try:
+        raw = base64.b32decode(body + '=' * (-len(body) % 8))
+    except ValueError:
+        return None
+
+    if len(raw) <= TAG_BYTES:
+        return None
+
+    payload, tag = raw[:-TAG_BYTES], raw[-TAG_BYTES:]
+    if not hmac.compare_digest(tag, _tag(payload)):
+        return None
+
+    # فقط شکل استاندارد کد پذیرفته می‌شود (بیت‌های اضافه آخر base32 یا صفرهای اول شناسه نه)
+    user_id = int.from_bytes(payload, 'big')
+    if make_referral_code(user_id) != code:
+        return None
+
+    return user_id
+
+def is_legacy_code(code: str) -> bool:
+    return bool(code) and code.upper().startswith(LEGACY_PREFIX) and decode_referral_code(code) is None